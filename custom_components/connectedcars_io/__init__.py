@@ -1,11 +1,26 @@
 """Support for connectedcars.io / Min Volkswagen integration."""
 
+import asyncio
+from datetime import timedelta
 import logging
+import os
 
 from homeassistant import config_entries, core
-
-from .const import CONF_HEALTH_SENSITIVITY, DOMAIN
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.util import dt as dt_util
+
+from .accounts import get_accounts
+from .const import (
+    CONF_HEALTH_SENSITIVITY,
+    CONF_LAMP_ENTITIES,
+    CONF_MAX_STALENESS,
+    DEFAULT_MAX_STALENESS,
+    DOMAIN,
+)
+from .coordinator import ConnectedCarsCoordinator
 from .minvw import MinVW
+from .storage import ConnectedCarsStore
 
 _LOGGER = logging.getLogger(__name__)
 PLATFORMS = ["binary_sensor", "device_tracker", "sensor", "button"]
@@ -22,10 +37,76 @@ async def async_setup_entry(
     data["email"] = entry.data["email"]
     data["password"] = entry.data["password"]
     data["namespace"] = entry.data["namespace"]
+    data["store"] = ConnectedCarsStore(hass, entry.entry_id)
+    await data["store"].async_load()
+
+    # Entries of the same account share its access token. Stored access token
+    # is reused, renewed before it expires. Refuel history and daily trip
+    # statistics are kept across restarts.
+    accounts = get_accounts(hass)
+    account = accounts.acquire(entry)
+    entry.async_on_unload(lambda: accounts.release(entry))
     data["connectedcarsclient"] = MinVW(
-        entry.data["email"], entry.data["password"], entry.data["namespace"]
+        entry.data["email"],
+        entry.data["password"],
+        entry.data["namespace"],
+        async_get_clientsession(hass),
+        token_listener=lambda token, expires: _token_updated(data, token, expires),
+        trip_store_path=_trip_store_path(hass, entry),
+        refuel_listener=lambda refuels: data["store"].set("refuels", refuels),
+        trip_statistics_listener=lambda stats: data["store"].set(
+            "trip_statistics", stats
+        ),
+        max_staleness=timedelta(
+            minutes=entry.options.get(CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS)
+        ),
+        auth=account.auth,
+    )
+    # Also when setup fails, so the client does not stay on the shared Auth
+    entry.async_on_unload(data["connectedcarsclient"].close)
+    data["connectedcarsclient"].restore_refuels(data["store"].get("refuels"))
+    data["connectedcarsclient"].restore_trip_statistics(
+        data["store"].get("trip_statistics")
+    )
+    if (token := data["store"].get("token")) is not None:
+        data["connectedcarsclient"].restore_token(
+            token["token"], dt_util.parse_datetime(token["expires"])
+        )
+    account.schedule_renewal()
+
+    data["coordinator"] = ConnectedCarsCoordinator(
+        hass, entry.title, data["connectedcarsclient"], data["store"]
     )
+
+    # Vehicles and their data stored at last run are used right away and
+    # refreshed in the background, starting at the phase of the entry so
+    # entries are spread over the update interval. Without them, vehicles are read and their
+    # capabilities discovered before platforms are set up.
+    data["vehicles"] = data["store"].get("vehicles")
+    restored = data["vehicles"] is not None and data["coordinator"].restore()
+    if not restored:
+        # One fetch per cycle, shared by all entities of this entry
+        await data["coordinator"].async_config_entry_first_refresh()
+    if data["vehicles"] is None:
+        data["vehicles"] = await data["connectedcarsclient"].get_vehicle_instances(
+            True
+        )
+        data["store"].set("vehicles", data["vehicles"])
+    else:
+        entry.async_create_background_task(
+            hass,
+            async_rediscover(
+                hass,
+                entry,
+                data,
+                restored,
+                accounts.scheduler.delay(entry.entry_id).total_seconds(),
+            ),
+            f"{DOMAIN} rediscover {entry.title}",
+        )
+
     data[CONF_HEALTH_SENSITIVITY] = entry.options.get(CONF_HEALTH_SENSITIVITY, "medium")
+    data[CONF_LAMP_ENTITIES] = entry.options.get(CONF_LAMP_ENTITIES, "individual")
 
     # Registers update listener to update config entry when options are updated, and store a reference to the unsubscribe function
     data["unsub_options_update_listener"] = entry.add_update_listener(
@@ -37,9 +118,81 @@ async def async_setup_entry(
     # Forward the setup to the sensor platform.
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    # Sensors are discovered and added, from now on only read what they consume
+    data["connectedcarsclient"].select_registered_fields()
+
     return True
 
 
+@callback
+def _token_updated(data, token, expires):
+    """Store a new access token."""
+    data["store"].set(
+        "token",
+        None if token is None else {"token": token, "expires": expires.isoformat()},
+    )
+
+
+async def async_rediscover(
+    hass: core.HomeAssistant, entry, data, refresh=False, delay=0.0
+):
+    """Probe vehicles again, reload entry when new ones or capabilities appear.
+
+    Starts after delay seconds, so entries restored at startup do not all
+    read from the API at once.
+    """
+    await asyncio.sleep(delay)
+    if refresh:
+        # Replace restored data first
+        await data["coordinator"].async_refresh()
+    try:
+        vehicles = await data["connectedcarsclient"].get_vehicle_instances(
+            True, read_all_fields=True
+        )
+    except Exception as err:  # pylint: disable=broad-except
+        _LOGGER.warning("Failed to rediscover vehicles: %s", err)
+        return
+
+    vehicles, reload = _merge_vehicles(data["vehicles"], vehicles)
+    if vehicles == data["vehicles"]:
+        return
+    data["store"].set("vehicles", vehicles)
+    if reload:
+        _LOGGER.info("Vehicles or their capabilities changed, reloading %s", entry.title)
+        hass.async_create_task(hass.config_entries.async_reload(entry.entry_id))
+
+
+def _merge_vehicles(stored, discovered):
+    """Merge discovered vehicles into stored, returning them and if to reload.
+
+    Reloading is needed when vehicles were added or removed, or a vehicle
+    gained a capability or lamp. A capability no longer reported, e.g. while
+    the vehicle is parked, is kept so its entities are not removed.
+    """
+    stored_by_id = {vehicle["id"]: vehicle for vehicle in stored}
+    if {vehicle["id"] for vehicle in discovered} != stored_by_id.keys():
+        return discovered, True
+
+    reload = False
+    vehicles = []
+    for vehicle in discovered:
+        previous = stored_by_id[vehicle["id"]]
+        merged = dict(vehicle)
+        for key in ("has", "lampStates"):
+            added = [item for item in vehicle[key] if item not in previous[key]]
+            missing = [item for item in previous[key] if item not in vehicle[key]]
+            if missing:
+                _LOGGER.info(
+                    "%s no longer reports %s, keeping them",
+                    vehicle["name"],
+                    ", ".join(missing),
+                )
+            merged[key] = previous[key] + added
+            reload = reload or bool(added)
+        vehicles.append(merged)
+    return vehicles, reload
+
+
 async def async_setup(hass: core.HomeAssistant, config: dict) -> bool:
     """Set up the GitHub Custom component from yaml configuration."""
     hass.data.setdefault(DOMAIN, {})
@@ -74,3 +227,19 @@ async def async_unload_entry(
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
+
+
+async def async_remove_entry(
+    hass: core.HomeAssistant, entry: config_entries.ConfigEntry
+) -> None:
+    """Remove stored data of a deleted config entry."""
+    await ConnectedCarsStore(hass, entry.entry_id).async_remove()
+
+    path = _trip_store_path(hass, entry)
+    if os.path.exists(path):
+        await hass.async_add_executor_job(os.remove, path)
+
+
+def _trip_store_path(hass: core.HomeAssistant, entry: config_entries.ConfigEntry):
+    """Path of the trip database of an entry."""
+    return hass.config.path(f"{DOMAIN}.{entry.entry_id}.trips.db")
@@ -0,0 +1,144 @@
+"""Accounts and refresh schedule shared by all config entries."""
+
+from datetime import timedelta
+import logging
+
+from homeassistant import config_entries, core
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .coordinator import UPDATE_INTERVAL
+from .minvw import Auth
+from .scheduler import RefreshScheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_ACCOUNTS = f"{DOMAIN}_accounts"
+
+# Access token is renewed in the background this long before it expires
+TOKEN_RENEW_BEFORE = timedelta(minutes=5)
+TOKEN_RENEW_RETRY = timedelta(minutes=1)
+
+
+class Account:
+    """Access token of an email in a namespace, used by one or more entries.
+
+    The token is renewed once for all entries using it.
+    """
+
+    def __init__(self, hass: core.HomeAssistant, auth: Auth) -> None:
+        """Initialize."""
+        self.hass = hass
+        self.auth = auth
+        self.entries = set()
+        self._unsub_renewal = None
+        self._unsub_listener = auth.add_listener(
+            lambda token, expires: self.schedule_renewal()
+        )
+
+    @callback
+    def schedule_renewal(self, retry=False):
+        """Schedule renewal of the access token ahead of its expiry."""
+        self.cancel_renewal()
+        if self.auth.expires is None:
+            # Logged in on first request
+            return
+
+        when = self.auth.expires - TOKEN_RENEW_BEFORE
+        if retry:
+            when = max(when, dt_util.utcnow() + TOKEN_RENEW_RETRY)
+
+        async def _async_renew(_now):
+            self._unsub_renewal = None
+            try:
+                await self.auth.renew(TOKEN_RENEW_BEFORE)
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.warning("Failed to renew access token: %s", err)
+            self.schedule_renewal(retry=True)
+
+        self._unsub_renewal = async_track_point_in_utc_time(
+            self.hass, _async_renew, when
+        )
+
+    @callback
+    def cancel_renewal(self):
+        """Cancel scheduled renewal."""
+        if self._unsub_renewal is not None:
+            self._unsub_renewal()
+            self._unsub_renewal = None
+
+    @callback
+    def close(self):
+        """Stop renewing the token, when no longer used."""
+        self.cancel_renewal()
+        self._unsub_listener()
+
+
+class AccountRegistry:
+    """Accounts of all config entries, and the schedule of their refreshes.
+
+    Entries share an account when email, password and namespace match. Tokens
+    are issued for a namespace, entries of different namespaces log in on
+    their own even for the same email. An entry with a changed password does
+    not log in with the password of another entry. All entries use the shared
+    HTTP session.
+    """
+
+    def __init__(self, hass: core.HomeAssistant) -> None:
+        """Initialize."""
+        self._hass = hass
+        self._accounts = {}
+        # Account key per entry, its data may change before it is released
+        self._entry_keys = {}
+        self.scheduler = RefreshScheduler(UPDATE_INTERVAL)
+
+    @staticmethod
+    def _key(entry: config_entries.ConfigEntry):
+        return (
+            entry.data["email"].strip().lower(),
+            entry.data["password"],
+            entry.data["namespace"],
+        )
+
+    @callback
+    def acquire(self, entry: config_entries.ConfigEntry) -> Account:
+        """Get the account of an entry, and schedule refreshes of the entry."""
+        key = self._entry_keys[entry.entry_id] = self._key(entry)
+        account = self._accounts.get(key)
+        if account is None:
+            account = self._accounts[key] = Account(
+                self._hass,
+                Auth(
+                    entry.data["email"],
+                    entry.data["password"],
+                    entry.data["namespace"],
+                    lambda: async_get_clientsession(self._hass),
+                ),
+            )
+        account.entries.add(entry.entry_id)
+        self.scheduler.add(entry.entry_id)
+        return account
+
+    @callback
+    def release(self, entry: config_entries.ConfigEntry):
+        """Release the account of an unloaded entry."""
+        self.scheduler.remove(entry.entry_id)
+        key = self._entry_keys.pop(entry.entry_id, None)
+        account = self._accounts.get(key)
+        if account is None:
+            return
+        account.entries.discard(entry.entry_id)
+        if not account.entries:
+            account.close()
+            del self._accounts[key]
+
+
+@callback
+def get_accounts(hass: core.HomeAssistant) -> AccountRegistry:
+    """Get the account registry of the integration."""
+    if DATA_ACCOUNTS not in hass.data:
+        hass.data[DATA_ACCOUNTS] = AccountRegistry(hass)
+    return hass.data[DATA_ACCOUNTS]
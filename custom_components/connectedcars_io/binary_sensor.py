@@ -1,20 +1,84 @@
 """Support for connectedcars.io / Min Volkswagen integration."""
 
-from datetime import timedelta
 import logging
 import traceback
 
 from homeassistant import config_entries, core
 from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.core import callback
 
 # ,  BinarySensorEntityDescription
 from homeassistant.exceptions import PlatformNotReady
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import CONF_HEALTH_SENSITIVITY, DOMAIN
+from .const import CONF_HEALTH_SENSITIVITY, CONF_LAMP_ENTITIES, DOMAIN
+from .minvw import compile_selector
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(minutes=1)
+# Vehicle data fields consumed per sensor, only fields of enabled sensors are read
+BINARY_SENSOR_FIELDS = {
+    "Ignition": ("ignition",),
+    "Health": ("leads",),
+    "Lamp": ("lampStates",),
+    "Warning lamps": ("lampStates",),
+}
+
+# Sensors read from the lamp states of the snapshot
+LAMP_ITEMS = ("Lamp", "Warning lamps")
+
+# Unique ids of sensors named differently
+UNIQUE_ID_ITEMS = {"Warning lamps": "warning_lamps"}
+
+IGNITION_SELECTORS = {
+    "on": compile_selector(["ignition", "on"]),
+    "time": compile_selector(["ignition", "time"]),
+}
+
+
+class HealthClassifier:
+    """Tell if leads make a vehicle unhealthy, at a sensitivity level."""
+
+    __slots__ = ("_types", "_prefixes", "_any", "_known")
+
+    def __init__(self, types=(), prefixes=(), any_type=False) -> None:
+        """Initialize with lead types and type prefixes to react on."""
+        self._types = frozenset(types)
+        self._prefixes = tuple(prefixes)
+        self._any = any_type
+        self._known = {}
+
+    def is_unhealthy(self, lead_type) -> bool:
+        """Check a single lead type, remembering the result."""
+        ret = self._known.get(lead_type)
+        if ret is None:
+            ret = self._any or (
+                lead_type in self._types or lead_type.startswith(self._prefixes)
+            )
+            self._known[lead_type] = ret
+        return ret
+
+    def __call__(self, leads) -> bool:
+        """Check leads."""
+        return any(
+            self.is_unhealthy(lead["type"])
+            for lead in leads
+            if lead.get("type") is not None
+        )
+
+
+HEALTH_CLASSIFIERS = {
+    "high": HealthClassifier(("error_code_high", "lamp_engine_lamp")),
+    "medium": HealthClassifier(
+        ("error_code_high", "error_code_medium", "poor_battery"), ("lamp_",)
+    ),
+    "low": HealthClassifier(
+        ("error_code_high", "error_code_medium", "error_code", "poor_battery"),
+        ("lamp_",),
+    ),
+    "all": HealthClassifier(any_type=True),
+}
 
 
 async def async_setup_entry(
@@ -25,16 +89,16 @@ async def async_setup_entry(
     """Set up the Connectedcars_io binary_sensor platform."""
     config = hass.data[DOMAIN][config_entry.entry_id]
 
-    _connectedcarsclient = config["connectedcarsclient"]
+    _coordinator = config["coordinator"]
 
     try:
         sensors = []
-        data = await _connectedcarsclient.get_vehicle_instances()
+        data = config["vehicles"]
         for vehicle in data:
             if "Ignition" in vehicle["has"]:
                 sensors.append(
                     CcBinaryEntity(
-                        vehicle, "Ignition", "", "moving", True, _connectedcarsclient
+                        vehicle, "Ignition", "", "moving", True, _coordinator
                     )
                 )
             if "Health" in vehicle["has"]:
@@ -45,30 +109,64 @@ async def async_setup_entry(
                         "",
                         "problem",
                         True,
-                        _connectedcarsclient,
+                        _coordinator,
                         config[CONF_HEALTH_SENSITIVITY],
                     )
                 )
-            for lampState in vehicle["lampStates"]:
+            if (
+                config[CONF_LAMP_ENTITIES] in ("aggregated", "both")
+                and vehicle["lampStates"]
+            ):
                 sensors.append(
                     CcBinaryEntity(
-                        vehicle,
-                        "Lamp",
-                        lampState,
-                        "problem",
-                        False,
-                        _connectedcarsclient,
+                        vehicle, "Warning lamps", "", "problem", True, _coordinator
                     )
                 )
-        async_add_entities(sensors, update_before_add=True)
+            if config[CONF_LAMP_ENTITIES] in ("individual", "both"):
+                for lampState in vehicle["lampStates"]:
+                    sensors.append(
+                        CcBinaryEntity(
+                            vehicle,
+                            "Lamp",
+                            lampState,
+                            "problem",
+                            False,
+                            _coordinator,
+                        )
+                    )
+        async_add_entities(sensors)
 
     except Exception as err:
         _LOGGER.warning("Failed to add sensors: %s", err)
         _LOGGER.debug("%s", traceback.format_exc())
         raise PlatformNotReady from err
 
+    # Remove lamp sensors no longer created, e.g. when only aggregated are chosen
+    lamp_ids = set()
+    for vehicle in data:
+        lamp_ids.add(_unique_id(vehicle, "Warning lamps", ""))
+        for lampState in vehicle["lampStates"]:
+            lamp_ids.add(_unique_id(vehicle, "Lamp", lampState))
+    lamp_ids -= {sensor.unique_id for sensor in sensors}
+    entity_registry = er.async_get(hass)
+    for entity_entry in er.async_entries_for_config_entry(
+        entity_registry, config_entry.entry_id
+    ):
+        if (
+            entity_entry.domain == "binary_sensor"
+            and entity_entry.unique_id in lamp_ids
+        ):
+            _LOGGER.debug("Removing lamp sensor: %s", entity_entry.entity_id)
+            entity_registry.async_remove(entity_entry.entity_id)
+
 
-class CcBinaryEntity(BinarySensorEntity):
+def _unique_id(vehicle, itemName, subitemName):
+    """Unique id of a sensor of a vehicle."""
+    item = UNIQUE_ID_ITEMS.get(itemName, itemName)
+    return f"{DOMAIN}-{vehicle['vin']}-{item}{subitemName.capitalize()}"
+
+
+class CcBinaryEntity(CoordinatorEntity, BinarySensorEntity):
     """Representation of a BinaryEntity."""
 
     def __init__(
@@ -78,20 +176,23 @@ class CcBinaryEntity(BinarySensorEntity):
         subitemName,
         device_class,
         entity_registry_enabled_default,
-        connectedcarsclient,
+        coordinator,
         sensitivity=None,
     ) -> None:
         """Initialize the sensor."""
+        super().__init__(coordinator)
         self._vehicle = vehicle
         self._itemName = itemName
         self._subitemName = subitemName
         # self._icon = "mdi:map"
         self._name = f"{self._vehicle['make']} {self._vehicle['model']} {self._itemName}{self._subitemName.capitalize()}"
-        self._unique_id = f"{DOMAIN}-{self._vehicle['vin']}-{self._itemName}{self._subitemName.capitalize()}"
+        self._unique_id = _unique_id(vehicle, itemName, subitemName)
         self._device_class = device_class
-        self._connectedcarsclient = connectedcarsclient
+        self._connectedcarsclient = coordinator.client
+        self._fields = BINARY_SENSOR_FIELDS[itemName]
         self._sensitivity = sensitivity
         self._is_on = None
+        self._health = None
         self._entity_registry_enabled_default = entity_registry_enabled_default
         self._dict = {}
         self._updated = None
@@ -146,7 +247,7 @@ class CcBinaryEntity(BinarySensorEntity):
     @property
     def available(self):
         """Availability."""
-        return self._is_on is not None
+        return super().available and self._is_on is not None
 
     @property
     def device_class(self):
@@ -162,22 +263,37 @@ class CcBinaryEntity(BinarySensorEntity):
         attributes.update(self._dict)
         return attributes
 
-    async def async_update(self):
-        """Update data."""
+    async def async_added_to_hass(self):
+        """Handle entity which will be added."""
+        self._connectedcarsclient.register_fields(self._fields)
+        await super().async_added_to_hass()
+        self._update_state()
+
+    async def async_will_remove_from_hass(self):
+        """Handle entity which will be removed."""
+        await super().async_will_remove_from_hass()
+        self._connectedcarsclient.unregister_fields(self._fields)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator, if consumed data changed."""
+        if not self.coordinator.fields_changed(self._vehicle["id"], self._fields):
+            return
+        self._update_state()
+        self.async_write_ha_state()
+
+    @callback
+    def _update_state(self):
+        """Update state from vehicle data pushed by the coordinator."""
+        snapshot = self.coordinator.data
         self._is_on = None
+        if snapshot is None:
+            return
         try:
             if self._itemName == "Ignition":
-                self._is_on = (
-                    str(
-                        await self._connectedcarsclient.get_value(
-                            self._vehicle["id"], ["ignition", "on"]
-                        )
-                    ).lower()
-                    == "true"
-                )
-                self._updated = await self._connectedcarsclient.get_value(
-                    self._vehicle["id"], ["ignition", "time"]
-                )
+                values = snapshot.values(self._vehicle["id"], IGNITION_SELECTORS)
+                self._is_on = str(values["on"]).lower() == "true"
+                self._updated = values["time"]
             elif self._itemName == "Health":
                 # self._is_on = (
                 #     str(
@@ -187,52 +303,40 @@ class CcBinaryEntity(BinarySensorEntity):
                 #     ).lower()
                 #     != "true"
                 # )
-                self._dict["Leads"] = await self._connectedcarsclient.get_leads(
-                    self._vehicle["id"]
-                )
-                self._is_on = self.evaluate_health()
+                leads = self._connectedcarsclient.leads(snapshot, self._vehicle["id"])
+                # Leads are the same object while unchanged
+                if leads is not self._dict.get("Leads"):
+                    self._dict["Leads"] = leads
+                    self._health = self.evaluate_health()
+                self._is_on = self._health
 
-            elif self._itemName == "Lamp":
-                enabled, self._updated = await self._connectedcarsclient.get_lampstatus(
-                    self._vehicle["id"], self._subitemName
-                )
-                self._is_on = str(enabled).lower() == "true"
+            elif self._itemName in LAMP_ITEMS:
+                # Lamps are decoded in the snapshot
+                self._update_lamps(snapshot.lamps(self._vehicle["id"]))
 
         except Exception as err:  # pylint: disable=broad-except
             _LOGGER.debug("Unable to get binary state: %s", err)
 
+    def _update_lamps(self, lamps):
+        """Update state from lamp states, (enabled, time) keyed by lamp type."""
+        if self._itemName == "Lamp":
+            enabled, self._updated = lamps.get(self._subitemName, (False, None))
+            self._is_on = enabled
+            return
+
+        self._is_on = any(enabled for enabled, _ in lamps.values())
+        self._updated = max(
+            (time for _, time in lamps.values() if time is not None), default=None
+        )
+        self._dict = {
+            "Enabled": [lamp for lamp, (enabled, _) in lamps.items() if enabled],
+            "Lamps": {
+                lamp: {"enabled": enabled, "updated": time}
+                for lamp, (enabled, time) in lamps.items()
+            },
+        }
+
     def evaluate_health(self):
         """Evaluate health."""
-        ret = False
-        for lead in self._dict["Leads"]:
-            if "type" in lead and lead["type"] is not None:
-                t = lead["type"]
-                if self._sensitivity == "high" and t in (
-                    "error_code_high",
-                    "lamp_engine_lamp",
-                ):
-                    ret = True
-                elif self._sensitivity == "medium" and (
-                    t
-                    in (
-                        "error_code_high",
-                        "error_code_medium",
-                        "poor_battery",
-                    )
-                    or t.startswith("lamp_")
-                ):
-                    ret = True
-                elif self._sensitivity == "low" and (
-                    t
-                    in (
-                        "error_code_high",
-                        "error_code_medium",
-                        "error_code",
-                        "poor_battery",
-                    )
-                    or t.startswith("lamp_")
-                ):
-                    ret = True
-                elif self._sensitivity == "all":
-                    ret = True
-        return ret
+        classifier = HEALTH_CLASSIFIERS.get(self._sensitivity)
+        return classifier is not None and classifier(self._dict["Leads"])
@@ -12,32 +12,32 @@ async def async_setup_entry(
 ):
     """Set up buttons from a config entry."""
     config = hass.data["connectedcars_io"][config_entry.entry_id]
-    _connectedcarsclient = config["connectedcarsclient"]
+    _coordinator = config["coordinator"]
 
     try:
         buttons = []
-        data = await _connectedcarsclient.get_vehicle_instances(True)
+        data = config["vehicles"]
         for vehicle in data:
-            buttons.append(MyCustomButton(vehicle, _connectedcarsclient))
+            buttons.append(MyCustomButton(vehicle, _coordinator))
 
-        async_add_entities(buttons, update_before_add=True)
+        async_add_entities(buttons)
     except Exception as err:
         _LOGGER.warning("Failed to add button: %s", err)
 
 class MyCustomButton(ButtonEntity):
     """Define a custom button for a vehicle."""
 
-    def __init__(self, vehicle, client):
+    def __init__(self, vehicle, coordinator):
         """Initialize the button."""
         self._vehicle = vehicle
-        self._client = client
+        self._coordinator = coordinator
+        self._client = coordinator.client
         self._attr_name = f"{vehicle['vin']} Update Data Button"
         self._attr_unique_id = f"{vehicle['vin']}_update_data_button"
 
     async def async_press(self):
         """Handle button press."""
         _LOGGER.info("Button pressed for vehicle: %s", self._vehicle["vin"])
-        # Call some API action on press
-        # await self._client.get_vehicle_instances(True)
-        self.hass.bus.async_fire("connectedcars_refresh_data", {"vin": self._vehicle["vin"]})
+        # Bypass cached data, all entities of the entry are updated from one fetch
+        await self._coordinator.async_force_refresh()
 
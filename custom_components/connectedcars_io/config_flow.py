@@ -11,7 +11,13 @@ import homeassistant.helpers.selector as selector
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
 
-from .const import DOMAIN, CONF_HEALTH_SENSITIVITY
+from .const import (
+    CONF_HEALTH_SENSITIVITY,
+    CONF_LAMP_ENTITIES,
+    CONF_MAX_STALENESS,
+    DEFAULT_MAX_STALENESS,
+    DOMAIN,
+)
 from .minvw import MinVW
 
 _LOGGER = logging.getLogger(__name__)
@@ -54,6 +60,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     user_input[CONF_EMAIL],
                     user_input[CONF_PASSWORD],
                     user_input["namespace"],
+                    async_get_clientsession(self.hass),
                 )
                 token = await client._get_access_token()
 
@@ -111,6 +118,8 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             if not errors:
                 options = {}
                 options[CONF_HEALTH_SENSITIVITY] = user_input[CONF_HEALTH_SENSITIVITY]
+                options[CONF_LAMP_ENTITIES] = user_input[CONF_LAMP_ENTITIES]
+                options[CONF_MAX_STALENESS] = int(user_input[CONF_MAX_STALENESS])
 
                 return self.async_create_entry(title="", data=options)
 
@@ -133,6 +142,33 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                         translation_key=CONF_HEALTH_SENSITIVITY,
                     ),
                 ),
+                vol.Required(
+                    CONF_LAMP_ENTITIES,
+                    default=self.config_entry.options.get(
+                        CONF_LAMP_ENTITIES, "individual"
+                    ),
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=["individual", "aggregated", "both"],
+                        multiple=False,
+                        mode=selector.SelectSelectorMode.LIST,
+                        translation_key=CONF_LAMP_ENTITIES,
+                    ),
+                ),
+                vol.Required(
+                    CONF_MAX_STALENESS,
+                    default=self.config_entry.options.get(
+                        CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=1440,
+                        step=1,
+                        unit_of_measurement="min",
+                        mode=selector.NumberSelectorMode.BOX,
+                    ),
+                ),
             }
         )
         return self.async_show_form(
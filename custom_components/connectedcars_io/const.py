@@ -2,3 +2,8 @@
 
 DOMAIN = "connectedcars_io"
 CONF_HEALTH_SENSITIVITY = "health_sensitivity"
+CONF_LAMP_ENTITIES = "lamp_entities"
+
+# Minutes vehicle data is served after reads fail, 0 to not serve it at all
+CONF_MAX_STALENESS = "max_staleness"
+DEFAULT_MAX_STALENESS = 30
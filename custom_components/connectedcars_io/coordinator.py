@@ -0,0 +1,170 @@
+"""Support for connectedcars.io / Min Volkswagen integration."""
+
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+import logging
+
+from homeassistant import core
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .const import DOMAIN
+from .minvw import CircuitOpenError, MinVW
+from .storage import ConnectedCarsStore
+
+_LOGGER = logging.getLogger(__name__)
+
+UPDATE_INTERVAL = timedelta(minutes=1)
+MIN_UPDATE_INTERVAL = timedelta(seconds=30)
+
+# Vehicle data is stored for the next startup at most this often
+SNAPSHOT_SAVE_INTERVAL = timedelta(minutes=15)
+
+# Lookups entities can register, run after refreshes: client, snapshot, vehicle id
+LOOKUPS = {
+    "refuels": lambda client, snapshot, vehicle_id: client.update_refuels(
+        snapshot, vehicle_id
+    ),
+    "trip_statistics": lambda client, snapshot, vehicle_id: (
+        client.update_trip_statistics(vehicle_id)
+    ),
+}
+
+
+class ConnectedCarsCoordinator(DataUpdateCoordinator):
+    """Fetch vehicle data once per cycle and push it to all entities of an entry."""
+
+    def __init__(
+        self,
+        hass: core.HomeAssistant,
+        name: str,
+        client: MinVW,
+        store: ConnectedCarsStore,
+    ) -> None:
+        """Initialize."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {name}",
+            update_interval=UPDATE_INTERVAL,
+        )
+        self.client = client
+        self._store = store
+        self._snapshot_saved = None
+        self._changes = None
+        self._lookups = Counter()
+        self._lookups_failed = set()
+        self._lookup_task = None
+
+    async def _async_update_data(self):
+        """Read vehicle data and schedule next refresh when it expires."""
+        try:
+            data = await self.client.get_vehicle_data()
+        except CircuitOpenError as err:
+            # Next attempt when the API is probed again
+            self._changes = None
+            self._schedule(err.retry_after + timedelta(seconds=1))
+            raise UpdateFailed(str(err)) from err
+        except Exception as err:  # pylint: disable=broad-except
+            self._changes = None
+            self._schedule(datetime.now(UTC) + UPDATE_INTERVAL)
+            raise UpdateFailed(f"Unable to read vehicle data: {err}") from err
+
+        # After a failed update all entities write state again, to be available
+        self._changes = data.diff(self.data) if self.last_update_success else None
+
+        # Follow the refresh cadence chosen by the client (fast while driving)
+        expires = self.client.data_expires
+        if expires is not None:
+            self._schedule(expires + timedelta(seconds=1))
+
+        # Started once the refreshed data is set
+        self._request_lookups()
+
+        now = datetime.now(UTC)
+        if (
+            self._snapshot_saved is None
+            or now >= self._snapshot_saved + SNAPSHOT_SAVE_INTERVAL
+        ):
+            self._store.set("snapshot", self.client.export_snapshot())
+            self._snapshot_saved = now
+        return data
+
+    def _schedule(self, earliest):
+        """Set interval until next refresh, at earliest then."""
+        now = datetime.now(UTC)
+        self.update_interval = max(earliest - now, MIN_UPDATE_INTERVAL)
+
+    @callback
+    def register_lookup(self, lookup, vehicle_id):
+        """Register a lookup consumed by an entity, run after each refresh."""
+        self._lookups[(lookup, vehicle_id)] += 1
+
+    @callback
+    def unregister_lookup(self, lookup, vehicle_id):
+        """Unregister a lookup no longer consumed by an entity."""
+        self._lookups[(lookup, vehicle_id)] -= 1
+        self._lookups = +self._lookups
+
+    @callback
+    def _request_lookups(self):
+        """Run registered lookups in the background, unless still running.
+
+        Lookups may read a lot, e.g. the trip history on first run, so they
+        neither delay the refresh nor the setup of the entry.
+        """
+        if self._lookup_task is not None and not self._lookup_task.done():
+            return
+        self._lookup_task = self.hass.async_create_background_task(
+            self._async_run_lookups(), f"{self.name} lookups"
+        )
+
+    async def _async_run_lookups(self):
+        """Run registered lookups, then update the entities consuming them.
+
+        The client retries failed lookups with backoff, a failure is logged
+        once until the lookup succeeds again.
+        """
+        snapshot = self.data
+        if snapshot is None or not self._lookups:
+            return
+        for key in list(self._lookups):
+            lookup, vehicle_id = key
+            try:
+                await LOOKUPS[lookup](self.client, snapshot, vehicle_id)
+            except Exception as err:  # pylint: disable=broad-except
+                log = _LOGGER.debug if key in self._lookups_failed else _LOGGER.warning
+                log("Lookup of %s for %s failed: %s", lookup, vehicle_id, err)
+                self._lookups_failed.add(key)
+            else:
+                self._lookups_failed.discard(key)
+
+        # Vehicle data did not change, entities consuming lookups write state
+        self._changes = {vehicle["id"]: frozenset() for vehicle in snapshot.vehicles}
+        self.async_update_listeners()
+
+    def fields_changed(self, vehicle_id, fields) -> bool:
+        """Check if fields of a vehicle changed in the latest update.
+
+        Entities not declaring their fields are always updated.
+        """
+        if self._changes is None or not fields:
+            return True
+        changes = self._changes.get(vehicle_id)
+        return changes is None or not changes.isdisjoint(fields)
+
+    def restore(self) -> bool:
+        """Serve vehicle data stored at last run, until refreshed."""
+        stored = self._store.get("snapshot")
+        if stored is None:
+            return False
+        snapshot = self.client.restore_snapshot(stored)
+        if snapshot is None:
+            return False
+        self.data = snapshot
+        return True
+
+    async def async_force_refresh(self):
+        """Refresh from the API regardless of cached data."""
+        self.client.expire_data()
+        await self.async_request_refresh()
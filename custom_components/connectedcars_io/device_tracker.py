@@ -1,18 +1,28 @@
 """Support for connectedcars.io / Min Volkswagen integration."""
 
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 import traceback
 
 from homeassistant import config_entries, core
 from homeassistant.components.device_tracker.config_entry import TrackerEntity
+from homeassistant.core import callback
 from homeassistant.exceptions import PlatformNotReady
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
+from .minvw import compile_selector
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(minutes=1)
+# Values read in one call per update
+TRACKER_SELECTORS = {
+    "ignition": compile_selector(["ignition", "on"]),
+    "ignition_time": compile_selector(["ignition", "time"]),
+    "latitude": compile_selector(["position", "latitude"]),
+    "longitude": compile_selector(["position", "longitude"]),
+    "position_time": compile_selector(["position", "time"]),
+}
 
 
 async def async_setup_entry(
@@ -23,39 +33,27 @@ async def async_setup_entry(
     """Set up the Connectedcars_io device_tracker platform."""
     config = hass.data[DOMAIN][config_entry.entry_id]
 
-    _connectedcarsclient = config["connectedcarsclient"]
+    _coordinator = config["coordinator"]
 
     try:
         sensors = []
-        data = await _connectedcarsclient.get_vehicle_instances()
+        data = config["vehicles"]
         for vehicle in data:
             if "GeoLocation" in vehicle["has"]:
-                sensors.append(
-                    CcTrackerEntity(vehicle, "GeoLocation", _connectedcarsclient)
-                )
-        async_add_entities(sensors, update_before_add=True)
-        
+                sensors.append(CcTrackerEntity(vehicle, "GeoLocation", _coordinator))
+        async_add_entities(sensors)
+
     except Exception as err:
         _LOGGER.warning("Failed to add sensors: %s", err)
         _LOGGER.debug("%s", traceback.format_exc())
         raise PlatformNotReady from err
-    
-    async def handle_refresh_data_event(event):
-        """Handle button press event and refresh sensor data."""
-        vin = event.data["vin"]
-        _LOGGER.info("Received refresh event for VIN: %s", vin)
-        # Find and update the relevant sensor
-        for sensor in sensors:
-            if sensor.vehicle["vin"] == vin:
-                await sensor.async_update()
-                _LOGGER.info("Sensor updated for VIN: %s", vin)
-    
-    hass.bus.async_listen("connectedcars_refresh_data", handle_refresh_data_event)
-
-class CcTrackerEntity(TrackerEntity):
+
+
+class CcTrackerEntity(CoordinatorEntity, TrackerEntity):
     """Representation of a Device TrackerEntity."""
 
-    def __init__(self, vehicle, itemName, connectedcarsclient) -> None:
+    def __init__(self, vehicle, itemName, coordinator) -> None:
+        super().__init__(coordinator)
         self._vehicle = vehicle
         self._itemName = itemName
         self._icon = "mdi:map"
@@ -65,7 +63,8 @@ class CcTrackerEntity(TrackerEntity):
         """Initialize."""
         self._unique_id = f"{DOMAIN}-{self._vehicle['vin']}-{self._itemName}"
         self._device_class = None
-        self._connectedcarsclient = connectedcarsclient
+        self._connectedcarsclient = coordinator.client
+        self._fields = ("ignition", "position")
         self._latitude = None
         self._longitude = None
         self._cached_location = None
@@ -128,18 +127,17 @@ class CcTrackerEntity(TrackerEntity):
     @property
     def available(self):
         """Availability."""
-        return self._latitude is not None and self._longitude is not None
+        return (
+            super().available
+            and self._latitude is not None
+            and self._longitude is not None
+        )
 
     @property
     def device_class(self):
         """Device class."""
         return self._device_class
 
-    @property
-    def should_poll(self) -> bool:
-        """No polling for entities that have location pushed."""
-        return True
-
     # @property
     # def state(self):
     #     _LOGGER.debug(f"zone_state...")
@@ -167,38 +165,47 @@ class CcTrackerEntity(TrackerEntity):
             attributes["Updated"] = self._updated
         return attributes
 
-    async def async_update(self):
-        """Update data."""
+    async def async_added_to_hass(self):
+        """Handle entity which will be added."""
+        self._connectedcarsclient.register_fields(self._fields)
+        await super().async_added_to_hass()
+        self._update_state()
+
+    async def async_will_remove_from_hass(self):
+        """Handle entity which will be removed."""
+        await super().async_will_remove_from_hass()
+        self._connectedcarsclient.unregister_fields(self._fields)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator, if consumed data changed."""
+        if not self.coordinator.fields_changed(self._vehicle["id"], self._fields):
+            return
+        self._update_state()
+        self.async_write_ha_state()
+
+    @callback
+    def _update_state(self):
+        """Update state from vehicle data pushed by the coordinator."""
+        snapshot = self.coordinator.data
         self._latitude = None
         self._longitude = None
+        if snapshot is None:
+            return
         try:
-            ignition = (
-                str(
-                    await self._connectedcarsclient.get_value(
-                        self._vehicle["id"], ["ignition", "on"]
-                    )
-                ).lower()
-                == "true"
-            )
+            values = snapshot.values(self._vehicle["id"], TRACKER_SELECTORS)
+            ignition = str(values["ignition"]).lower() == "true"
             ignition_time = None
-            timestamp = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["ignition", "time"]
-            )
+            timestamp = values["ignition_time"]
             if is_date_valid(timestamp):
                 ignition_time = datetime.fromisoformat(
                     str(timestamp).replace("Z", "+00:00")
                 )
             _LOGGER.debug("ignition: %s, time: %s", ignition, ignition_time)
 
-            latitude = await self._connectedcarsclient.get_value_float(
-                self._vehicle["id"], ["position", "latitude"]
-            )
-            longitude = await self._connectedcarsclient.get_value_float(
-                self._vehicle["id"], ["position", "longitude"]
-            )
-            postime = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["position", "time"]
-            )
+            latitude = self._connectedcarsclient.to_float(values["latitude"])
+            longitude = self._connectedcarsclient.to_float(values["longitude"])
+            postime = values["position_time"]
             position = tuple((latitude, longitude))
 
             if ignition:
@@ -0,0 +1,39 @@
+"""Diagnostics support for connectedcars.io."""
+
+from homeassistant import config_entries, core
+from homeassistant.components.diagnostics import async_redact_data
+
+from .const import DOMAIN
+
+TO_REDACT = {"email", "password", "vin", "licensePlate", "latitude", "longitude"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: core.HomeAssistant, entry: config_entries.ConfigEntry
+):
+    """Get diagnostics of a config entry.
+
+    Shows request stats and the circuit breaker of each host, so an API outage
+    and when requests are retried is visible.
+    """
+    data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = data["coordinator"]
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "options": dict(entry.options),
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "last_exception": (
+                None
+                if coordinator.last_exception is None
+                else str(coordinator.last_exception)
+            ),
+            "update_interval": (
+                None
+                if coordinator.update_interval is None
+                else coordinator.update_interval.total_seconds()
+            ),
+        },
+        "client": data["connectedcarsclient"].diagnostics(),
+        "vehicles": async_redact_data(data["vehicles"], TO_REDACT),
+    }
@@ -1,5 +1,9 @@
 """Wrapper for connectedcars.io."""
 
+from .auth import Auth
+from .errors import CircuitOpenError, ConnectedCarsError, ResponseError
 from .minvw import MinVW
+from .selector import Selector, compile_selector
+from .snapshot import VehicleSnapshot
 
 __version__ = '0.1.0'
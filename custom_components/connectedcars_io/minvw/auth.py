@@ -0,0 +1,170 @@
+"""Access token of a connectedcars.io account."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+import logging
+
+import aiohttp
+
+from .errors import ResponseError
+from .throttle import get_throttle, retry_after
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Auth:
+    """Access token of an account in a namespace.
+
+    A token is only valid in the namespace it was issued for, so clients can
+    share an Auth when both email and namespace match. Logins are single-flight
+    across all clients sharing it.
+    """
+
+    def __init__(
+        self,
+        email,
+        password,
+        namespace,
+        get_session,
+        base_url_auth="https://auth-api.connectedcars.io/",
+    ) -> None:
+        """Initialize, get_session() returns the aiohttp ClientSession to use."""
+        self.email = email
+        self.namespace = namespace
+        self._password = password
+        self._get_session = get_session
+        self._base_url_auth = base_url_auth
+        self._token = None
+        self._expires = None
+        self._listeners = []
+        self._lock = asyncio.Lock()
+        self.throttle = get_throttle(base_url_auth)
+
+    @property
+    def expires(self):
+        """Time when the access token must be renewed."""
+        return self._expires
+
+    def add_listener(self, listener):
+        """Call listener(token, expires) when the token changes.
+
+        Returns a function removing the listener again.
+        """
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _notify(self):
+        for listener in list(self._listeners):
+            listener(self._token, self._expires)
+
+    def is_valid(self) -> bool:
+        """Check if access token can be used."""
+        return (
+            self._token is not None
+            and self._expires is not None
+            and datetime.now(UTC) <= self._expires
+        )
+
+    def restore(self, token, expires: datetime):
+        """Use an access token stored earlier, if not expired nor older."""
+        if (
+            token is not None
+            and expires is not None
+            and datetime.now(UTC) <= expires
+            and (self._expires is None or self._expires < expires)
+        ):
+            self._token = token
+            self._expires = expires
+
+    async def get_token(self):
+        """Get access token, logging in when needed."""
+
+        # Valid token is served without waiting on the lock
+        if self.is_valid():
+            return self._token
+
+        # Single-flight, concurrent callers wait for the same login
+        async with self._lock:
+            if not self.is_valid():
+                await self._login()
+
+        return self._token
+
+    async def renew(self, before: timedelta):
+        """Log in again if the access token expires within before.
+
+        Meant to run in the background, ahead of requests needing the token.
+        """
+        async with self._lock:
+            if self.is_valid() and datetime.now(UTC) + before < self._expires:
+                return
+            await self._login()
+
+    def reject(self, token):
+        """Forget an access token rejected by the API."""
+        if token == self._token:
+            self._token = None
+            self._expires = None
+            self._notify()
+
+    async def _login(self):
+        """Log in with email and password."""
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "x-organization-namespace": f"semler:{self.namespace}",
+            "User-Agent": "ConnectedCars/360 CFNetwork/978.0.7 Darwin/18.7.0",
+        }
+        body = {"email": self.email, "password": self._password}
+
+        # Authenticate
+        # Current token stays in use until a new one is received
+        await self.throttle.acquire()
+        try:
+            result_json = None
+
+            _LOGGER.debug("Getting access token...")
+
+            auth_url = self._base_url_auth + "auth/login/email/password"
+            async with self._get_session().post(
+                auth_url, json=body, headers=headers
+            ) as response:
+                if response.status == 429 or response.status >= 500:
+                    error = ResponseError(
+                        f"Authentication failed, HTTP {response.status}",
+                        response.status,
+                    )
+                    self.throttle.failure(error, retry_after(response))
+                    raise error
+                try:
+                    result_json = await response.json(content_type=None)
+                except ValueError as err:
+                    error = ResponseError(
+                        f"Malformed authentication response, HTTP {response.status}",
+                        response.status,
+                    )
+                    self.throttle.failure(error)
+                    raise error from err
+            self.throttle.success()
+
+            if (
+                result_json is not None
+                and "token" in result_json
+                and "expires" in result_json
+            ):
+                self._token = result_json["token"]
+                self._expires = datetime.now(UTC) + timedelta(
+                    seconds=int(result_json["expires"]) - 120
+                )
+                _LOGGER.debug("Got access token: %s...", self._token[:10])
+                self._notify()
+            if (
+                result_json is not None
+                and "error" in result_json
+                and "message" in result_json
+            ):
+                raise Exception(result_json["message"])
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as client_error:
+            self.throttle.failure(client_error)
+            _LOGGER.warning("Authentication failed. %s", client_error)
@@ -0,0 +1,23 @@
+"""Errors raised by the connectedcars.io wrapper."""
+
+
+class ConnectedCarsError(Exception):
+    """Request to connectedcars.io failed."""
+
+
+class ResponseError(ConnectedCarsError):
+    """Unexpected or unreadable response."""
+
+    def __init__(self, message, status=None) -> None:
+        """Initialize."""
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(ConnectedCarsError):
+    """Requests are not sent while the API keeps failing."""
+
+    def __init__(self, retry_after) -> None:
+        """Initialize."""
+        super().__init__(f"API unavailable, retrying after {retry_after.isoformat()}")
+        self.retry_after = retry_after
@@ -1,6 +1,7 @@
 """Wrapper for connectedcars.io."""
 
 import asyncio
+from collections import Counter
 from datetime import UTC, datetime, timedelta
 import json
 import logging
@@ -9,6 +10,44 @@ import traceback
 import aiohttp
 from dateutil.relativedelta import relativedelta
 
+from .query import (
+    DISCOVERY_CHUNK_SIZE,
+    DISCOVERY_CONCURRENCY,
+    HOT_TTL_DRIVING,
+    HOT_TTL_PARKED,
+    ODOMETER_RETRY,
+    ODOMETER_RETRY_MAX,
+    REFUEL_RETRY,
+    REFUEL_RETRY_MAX,
+    REFUEL_SYNC_LIMIT,
+    REQUIRED_FIELDS,
+    STALE_RETRY,
+    TIER_TTL,
+    TIERS,
+    TRIP_HISTORY,
+    TRIP_PAGE_SIZE,
+    TRIP_STATISTICS_CHUNK_DAYS,
+    TRIP_STATISTICS_RETRY,
+    TRIP_STATISTICS_RETRY_MAX,
+    TRIP_STATISTICS_TTL,
+    TRIP_SYNC_INTERVAL,
+    additional_parameter_fields,
+    build_refuels_query,
+    build_trip_statistics_query,
+    build_trips_query,
+    build_vehicle_query,
+    build_vehicles_query,
+)
+from .auth import Auth
+from .errors import CircuitOpenError, ConnectedCarsError, ResponseError
+from .refuel import RefuelHistory, tank_economy
+from .selector import compile_selector
+from .snapshot import VehicleSnapshot
+from .throttle import get_throttle, retry_after
+from .timeline import OdometerTimeline, to_timestamp
+from .tripstats import DayStatistics, TripStatistics, day_start
+from .tripstore import TripStore
+
 # import hashlib
 
 # Test
@@ -16,27 +55,133 @@ from dateutil.relativedelta import relativedelta
 
 _LOGGER = logging.getLogger(__name__)
 
+# Fields not registered by any entity are missing from vehicle data
+LEADS = compile_selector(["leads"])
+LAMP_STATES = compile_selector(["lampStates"])
+
+
+def _isoformat(value):
+    return None if value is None else value.isoformat()
+
 
 class MinVW:
     """Primary exported interface for connectedcars.io API wrapper."""
 
-    def __init__(self, email, password, namespace) -> None:
-        """Initialize."""
-        self._email = email
-        self._password = password
+    def __init__(
+        self,
+        email,
+        password,
+        namespace,
+        session=None,
+        base_url_auth="https://auth-api.connectedcars.io/",
+        base_url_graph="https://api.connectedcars.io/",
+        token_listener=None,
+        trip_store_path=None,
+        refuel_listener=None,
+        trip_statistics_listener=None,
+        max_staleness: timedelta | None = None,
+        auth: Auth | None = None,
+    ) -> None:
+        """Initialize.
+
+        An aiohttp ClientSession can be injected (e.g. Home Assistant's shared
+        session). Otherwise a pooled keep-alive session is created on first use
+        and must be released again with close().
+        Base URLs can be pointed at a local stand-in server for testing.
+        token_listener(token, expires) is called when the access token changes,
+        so it can be persisted and given back with restore_token().
+        With trip_store_path, trips are kept in a local SQLite database and
+        trip lookups are answered from it.
+        refuel_listener(refuels) is called when the refuel history changes, so
+        it can be persisted and given back with restore_refuels().
+        trip_statistics_listener(stats) is called when daily trip statistics
+        were read, so they can be persisted and given back with
+        restore_trip_statistics().
+        With max_staleness, vehicle data is served for up to that long after
+        it was read when reading it again fails.
+        An Auth can be shared by clients of the same email and namespace,
+        otherwise one is created from the credentials.
+        """
         self._namespace = namespace
-        self._base_url_auth = "https://auth-api.connectedcars.io/"
-        self._base_url_graph = "https://api.connectedcars.io/"
-        self._accesstoken = None
-        self._at_expires = None
+        self._base_url_graph = base_url_graph
+        self._auth = auth
+        if auth is None:
+            self._auth = Auth(
+                email, password, namespace, self._get_session, base_url_auth
+            )
+        self._remove_token_listener = (
+            None if token_listener is None else self._auth.add_listener(token_listener)
+        )
         self._data = None
+        self._snapshot = None
+        self._restored = False
         self._data_expires = None
-        self._lock_update = asyncio.Lock()
+        self._data_updated = None
+        self._max_staleness = max_staleness
+        self._tier_data = {tier: {} for tier in TIERS}
+        self._tier_expires = {}
+        self._hot_expires = {}
+        self._vehicle_ids = []
+        self._field_users = Counter()
+        self._select_fields = False
+        self._tier_fields = {tier: dict(fields) for tier, fields in TIERS.items()}
+        # Single-flight snapshot refresh, reads of fresh data take no lock
+        self._lock_snapshot = asyncio.Lock()
+        self._leads = {}
+        self._trip_store = None if trip_store_path is None else TripStore(trip_store_path)
+        self._trips_synced = {}
+        self._odometers = {}
+        self._odometer_retry = {}
+        self._locks_trips = {}
+        self._trip_statistics = {}
+        self._trip_statistics_read = {}
+        self._trip_statistics_retry = {}
+        self._trip_statistics_listener = trip_statistics_listener
+        self._locks_trip_statistics = {}
+        self._refuel_listener = refuel_listener
+        self._refuels = {}
+        self._refuels_retry = {}
+        self._lock_refuels = asyncio.Lock()
+        # Shared with other clients of the same hosts
+        self._throttle = get_throttle(base_url_graph)
+        self._session = session
+        self._session_owned = False
+        self._inflight = {}
+        self._request_stats = {"requests": 0, "coalesced": 0}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get HTTP session, create a pooled one if none was injected."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=4, keepalive_timeout=300, ttl_dns_cache=3600
+                )
+            )
+            self._session_owned = True
+        return self._session
+
+    async def close(self):
+        """Close the trip store, and the HTTP session if owned by this instance."""
+        if self._remove_token_listener is not None:
+            self._remove_token_listener()
+            self._remove_token_listener = None
+        if self._trip_store is not None:
+            await self._trip_store.close()
+        if self._session_owned and self._session is not None:
+            await self._session.close()
+        self._session = None
+        self._session_owned = False
 
     async def get_next_service_data_predicted(self, vehicle_id):
         """Calculate number of days until next service. Prodicted."""
+        return self.next_service_predicted(await self._get_snapshot(), vehicle_id)
+
+    def next_service_predicted(self, snapshot: VehicleSnapshot, vehicle_id):
+        """Get predicted date of next service from vehicle data read."""
         ret = None
-        date_str = await self.get_value(vehicle_id, ["service", "predictedDate"])
+        date_str = self._get_vehicle_value(
+            snapshot.vehicle(vehicle_id), ["service", "predictedDate"]
+        )
 
         if date_str is not None:
             ret = datetime.strptime(date_str, "%Y-%m-%d").date()
@@ -45,174 +190,313 @@ class MinVW:
             #  ret = 0
         return ret
 
-    async def api_request(self, req_param):
-        """Make an API request for data."""
-        ret = None
+    @property
+    def request_stats(self):
+        """Number of requests sent, and saved by coalescing identical requests."""
+        return dict(self._request_stats)
+
+    def diagnostics(self):
+        """State of the client and the hosts it uses, without credentials."""
+        throttles = [self._throttle]
+        if self._auth.throttle is not self._throttle:
+            throttles.append(self._auth.throttle)
+        return {
+            "requests": self.request_stats,
+            "hosts": [throttle.diagnostics() for throttle in throttles],
+            "token_expires": _isoformat(self._auth.expires),
+            "data_updated": _isoformat(self._data_updated),
+            "data_expires": _isoformat(self._data_expires),
+            "restored": self._restored,
+            "vehicles": len(self._vehicle_ids),
+        }
 
-        try:
-            async with self._lock_update:
-                headers = {
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                    "x-organization-namespace": f"semler:{self._namespace}",
-                    "User-Agent": "ConnectedCars/360 CFNetwork/978.0.7 Darwin/18.7.0",
-                    "Authorization": f"Bearer {await self._get_access_token()}",
-                }
+    async def api_request(self, req_param, variables=None):
+        """Make an API request for data.
+
+        Requests are not serialized, secondary queries may run concurrently.
+        Identical queries in flight at the same time share one request.
+        """
+        key = (" ".join(req_param.split()), json.dumps(variables, sort_keys=True))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._api_request(req_param, variables))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self._request_stats["requests"] += 1
+        else:
+            self._request_stats["coalesced"] += 1
+            _LOGGER.debug(
+                "Coalesced request, %s saved so far", self._request_stats["coalesced"]
+            )
+        # A cancelled caller must not cancel the request shared with others
+        return await asyncio.shield(task)
 
-                req_body = {"query": req_param}
-                req_url = self._base_url_graph + "graphql"
+    async def _api_request(self, req_param, variables):
+        """Send a GraphQL request."""
+        ret = None
 
-                async with (
-                    aiohttp.ClientSession() as session,
-                    session.post(req_url, json=req_body, headers=headers) as response,
-                ):
-                    if response.ok:
-                        ret = await response.json()
-                    else:
-                        _LOGGER.warning(
-                            "Unexpected response: %s", await response.read()
-                        )
-
-                # async with aiohttp.ClientSession() as session:
-                #     async with session.post(
-                #         req_url, json=req_body, headers=headers
-                #     ) as response:
-                #         if response.ok:
-                #             ret = await response.json()
-                #         else:
-                #             _LOGGER.warning(
-                #                 "Unexpected response: %s", await response.read()
-                #             )
-
-        except aiohttp.ClientConnectionError as err:
-            _LOGGER.warning("Connection error: %s", str(err))
+        try:
+            req_body = {"query": req_param}
+            if variables is not None:
+                req_body["variables"] = variables
+            ret = await self._request_json(req_body)
+
+        except CircuitOpenError as err:
+            _LOGGER.debug("Request not sent: %s", err)
+        except (ConnectedCarsError, aiohttp.ClientError, asyncio.TimeoutError) as err:
+            _LOGGER.warning("Request failed: %s", str(err) or type(err).__name__)
             _LOGGER.debug("%s", traceback.format_exc())
 
         return ret
 
     async def get_latest_years_mileage(self, vehicle_id, latest_month):
         """Get mileage for latest year or month."""
-        ret = None
-        att = {}
+        await self.update_trip_statistics(vehicle_id)
+        return self.latest_years_mileage(vehicle_id, latest_month)
 
-        req_param = """query YearlyMileage {
-  vehicle(id: %s) {
+    def latest_years_mileage(self, vehicle_id, latest_month):
+        """Get mileage for latest year or month from daily trip statistics read.
 
-    totalTripStatistics(period: {first: "%s", last: "%s"} ) {mileageInKm, driveDurationInMinutes, numberTrips, longestMileageInKm}
-  }
-}
+        The statistics are not read, see update_trip_statistics().
         """
+        ret = None
+        att = {}
 
-        date = datetime.now(UTC)  # datetime.utcnow()
-        time_delta = relativedelta(years=-1)
-        if latest_month:
-            time_delta = relativedelta(months=-1)
-
-        req_param = req_param % (
+        stats = self.trip_statistics(
             vehicle_id,
-            (date + time_delta)
-            .isoformat(timespec="milliseconds")
-            .replace("+00:00", "Z"),
-            date.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
-        )
-
-        vehicle_data = await self.api_request(req_param)
-        ret = self._get_vehicle_value(
-            vehicle_data, ["data", "vehicle", "totalTripStatistics", "mileageInKm"]
+            relativedelta(months=1) if latest_month else relativedelta(years=1),
         )
-        if ret is not None:
-            ret = round(ret, 1)
-
-        value = self._get_vehicle_value(
-            vehicle_data,
-            ["data", "vehicle", "totalTripStatistics", "driveDurationInMinutes"],
-        )
-        if value is not None:
-            value = round(value)
-        att["Duration in minutes"] = value
-
-        att["Trips"] = self._get_vehicle_value(
-            vehicle_data, ["data", "vehicle", "totalTripStatistics", "numberTrips"]
-        )
-
-        value = self._get_vehicle_value(
-            vehicle_data,
-            ["data", "vehicle", "totalTripStatistics", "longestMileageInKm"],
-        )
-        if value is not None:
-            value = round(value, 1)
-        att["Longest trip in km"] = value
+        if stats is not None:
+            ret = round(stats.mileage, 1)
+        att["Duration in minutes"] = None if stats is None else round(stats.duration)
+        att["Trips"] = None if stats is None else stats.trips
+        att["Longest trip in km"] = None if stats is None else round(stats.longest, 1)
 
         return ret, att
 
-    #     async def get_mileage_since_refuel(self, vehicle_id):
-    #         """Calculate distance since last refuel event."""
-    #         _LOGGER.warning("get_mileage_since_refuel...")
-    #         ret = None
-    #         att = dict()
+    async def get_trip_statistics(self, vehicle_id, period):
+        """Get trip statistics of a rolling window, e.g. relativedelta(days=7)."""
+        await self.update_trip_statistics(vehicle_id)
+        return self.trip_statistics(vehicle_id, period)
 
-    #         req_param = """query fuel {
-    #   vehicle(id: %s) {
-    #     refuelEvents(limit: 1) {
-    #       time
-    #     }
-    #     serverCalcGpsOdometers(limit: 1, order: DESC){odometer time}
-    #   }
-    # }
-    #         """
-    #         req_param = req_param % (vehicle_id)
+    def trip_statistics(self, vehicle_id, period):
+        """Get trip statistics of a rolling window from daily statistics read.
 
-    #         vehicle_data = await self.api_request(req_param)
+        The window is the days (UTC) within period up to and including today.
+        Statistics are summed from daily buckets, any window of the latest
+        year costs no extra requests. Returns None while days are missing,
+        see update_trip_statistics().
+        """
+        stats = self._trip_statistics.get(vehicle_id)
+        if stats is None:
+            return None
+        today = datetime.now(UTC).date()
+        return stats.window(today - period + timedelta(days=1), today)
+
+    async def update_trip_statistics(self, vehicle_id) -> TripStatistics:
+        """Get daily trip statistics, reading days not final yet."""
+        now = datetime.now(UTC)
+        read = self._trip_statistics_read.get(vehicle_id)
+        if read is not None and now < read + TRIP_STATISTICS_TTL:
+            return self._trip_statistics[vehicle_id]
+
+        # Vehicles are read independently of each other
+        lock = self._locks_trip_statistics.setdefault(vehicle_id, asyncio.Lock())
+        async with lock:
+            stats = self._trip_statistics.setdefault(vehicle_id, TripStatistics())
+            read = self._trip_statistics_read.get(vehicle_id)
+            if read is not None and now < read + TRIP_STATISTICS_TTL:
+                return stats
+            failures, retry = self._trip_statistics_retry.get(vehicle_id, (0, None))
+            if retry is not None and now < retry:
+                return stats
+
+            days = stats.missing_days(now)
+            complete = True
+            updated = False
+            for index in range(0, len(days), TRIP_STATISTICS_CHUNK_DAYS):
+                chunk = days[index : index + TRIP_STATISTICS_CHUNK_DAYS]
+                vehicle_data = await self.api_request(
+                    build_trip_statistics_query(
+                        vehicle_id,
+                        [
+                            (
+                                self._format_time(day_start(day)),
+                                self._format_time(day_start(day + timedelta(days=1))),
+                            )
+                            for day in chunk
+                        ],
+                    )
+                )
+                vehicle = self._get_vehicle_value(vehicle_data, ["data", "vehicle"])
+                if vehicle is None:
+                    # Remaining days are read after backoff
+                    complete = False
+                    break
+                updated = True
+                for day_index, day in enumerate(chunk):
+                    day_data = vehicle.get(f"d{day_index}") or {}
+                    stats.update(
+                        day,
+                        DayStatistics(
+                            day_data.get("mileageInKm") or 0.0,
+                            day_data.get("driveDurationInMinutes") or 0.0,
+                            day_data.get("numberTrips") or 0,
+                            day_data.get("longestMileageInKm") or 0.0,
+                        ),
+                        now,
+                    )
 
-    #         fuelevent = self._get_vehicle_value(
-    #             vehicle_data, ["data", "vehicle", "refuelEvents"]
-    #         )
-    #         odometers = self._get_vehicle_value(
-    #             vehicle_data, ["data", "vehicle", "serverCalcGpsOdometers"]
-    #         )
+            if updated and self._trip_statistics_listener is not None:
+                self._trip_statistics_listener(self.export_trip_statistics())
+            if complete:
+                self._trip_statistics_read[vehicle_id] = now
+                self._trip_statistics_retry.pop(vehicle_id, None)
+            else:
+                self._trip_statistics_retry[vehicle_id] = (
+                    failures + 1,
+                    now
+                    + min(
+                        TRIP_STATISTICS_RETRY * 2**failures, TRIP_STATISTICS_RETRY_MAX
+                    ),
+                )
+            return stats
 
-    #         if (
-    #             fuelevent is not None
-    #             and len(fuelevent) == 1
-    #             and fuelevent[0]["time"] is not None
-    #             and odometers is not None
-    #             and len(odometers) == 1
-    #             and odometers[0]["odometer"] is not None
-    #         ):
+    def export_trip_statistics(self):
+        """Export daily trip statistics for restore_trip_statistics()."""
+        return {
+            vehicle_id: stats.export()
+            for vehicle_id, stats in self._trip_statistics.items()
+        }
 
-    #             odometer_current = odometers[0]["odometer"]
-    #             fuel_time = fuelevent[0]["time"]
-    #             att["Refueled at"] = fuel_time
+    def restore_trip_statistics(self, stored):
+        """Restore daily trip statistics exported earlier.
 
-    #             odometer_fuel_time = await self.get_odometer_at_time(vehicle_id, fuel_time)
-    #             if odometer_fuel_time is not None:
-    #                 ret = odometer_current - odometer_fuel_time
-    #             else:
-    #                 ret = 0
+        Only days not final when exported are read again.
+        """
+        for vehicle_id, days in (stored or {}).items():
+            self._trip_statistics[vehicle_id] = TripStatistics(days)
 
-    #         return ret, att
+    @staticmethod
+    def _format_time(value: datetime) -> str:
+        """Format time for the API."""
+        return value.isoformat(timespec="milliseconds").replace("+00:00", "Z")
 
     async def get_trip_at_time(self, vehicle_id, isotime):
-        """Get trip at a specific time."""
+        """Get trip at a specific time, the first trip starting from then."""
         trip = None
+        if self._trip_store is not None:
+            try:
+                trip = await self._trip_store.trip_at_time(vehicle_id, isotime)
+                if trip is None:
+                    # Not stored yet, unless synced since
+                    await self.sync_trips(vehicle_id)
+                    trip = await self._trip_store.trip_at_time(vehicle_id, isotime)
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.warning("Failed to read trip store: %s", err)
+            else:
+                if trip is not None:
+                    self._timeline(vehicle_id).add_trip(trip)
+                return trip
 
-        req_param = """query fuel {
-  vehicle(id: %s) {
-    trips(fromTime: "%s", first: 1 ){items{mileage, gpsMileage, odometerMileage, startOdometer, endOdometer, startTime, endTime, time}}
-  }}
-        """
-        req_param = req_param % (vehicle_id, isotime)
-        # _LOGGER.warning("req_param: %s", req_param)
-
-        vehicle_data = await self.api_request(req_param)
-        # _LOGGER.warning("vehicle_data: %s", vehicle_data)
-
+        vehicle_data = await self.api_request(
+            build_trips_query(vehicle_id, isotime, 1)
+        )
         trip = self._get_vehicle_value(
             vehicle_data, ["data", "vehicle", "trips", "items", 0]
         )
-
+        if trip is not None:
+            self._timeline(vehicle_id).add_trip(trip)
         return trip
 
+    async def get_odometer_at_time(self, vehicle_id, isotime):
+        """Get odometer at a specific time.
+
+        Answered from the odometer timeline, fed by vehicle data and trips
+        read. Gaps are filled from the first trip starting from the time,
+        failed lookups are retried with backoff.
+        """
+        timeline = self._timeline(vehicle_id)
+        odometer = timeline.at(isotime)
+        if odometer is not None:
+            return odometer
+
+        now = datetime.now(UTC)
+        key = (vehicle_id, isotime)
+        failures, retry = self._odometer_retry.get(key, (0, None))
+        if retry is not None and now < retry:
+            return None
+
+        trip = await self.get_trip_at_time(vehicle_id, isotime)
+        odometer = self._get_vehicle_value(trip, ["startOdometer"])
+        if odometer is None:
+            self._odometer_retry[key] = (
+                failures + 1,
+                now + min(ODOMETER_RETRY * 2**failures, ODOMETER_RETRY_MAX),
+            )
+            return None
+
+        # No trip started in between, the car stood at the trip's start odometer
+        self._odometer_retry.pop(key, None)
+        timeline.add(isotime, odometer)
+        return float(odometer)
+
+    def _timeline(self, vehicle_id) -> OdometerTimeline:
+        """Get odometer timeline of a vehicle."""
+        timeline = self._odometers.get(vehicle_id)
+        if timeline is None:
+            timeline = self._odometers[vehicle_id] = OdometerTimeline()
+        return timeline
+
+    async def iter_trips(self, vehicle_id, from_time, page_size=TRIP_PAGE_SIZE):
+        """Read trips starting from a time, oldest first, a page at a time."""
+        seen = set()
+        while True:
+            vehicle_data = await self.api_request(
+                build_trips_query(vehicle_id, from_time, page_size)
+            )
+            items = self._get_vehicle_value(
+                vehicle_data, ["data", "vehicle", "trips", "items"]
+            )
+            if items is None:
+                raise ValueError(f"Unable to read trips of {vehicle_id}")
+
+            # Next page starts at the last trip read, it is skipped then
+            page = [trip for trip in items if trip["startTime"] not in seen]
+            if page:
+                timeline = self._timeline(vehicle_id)
+                for trip in page:
+                    timeline.add_trip(trip)
+                yield page
+            if len(items) < page_size or not page:
+                return
+            from_time = page[-1]["startTime"]
+            seen = {trip["startTime"] for trip in items if trip["startTime"] == from_time}
+
+    async def sync_trips(self, vehicle_id):
+        """Read trips newer than the latest stored one into the trip store.
+
+        At most every TRIP_SYNC_INTERVAL, the first sync reads TRIP_HISTORY.
+        """
+        if self._trip_store is None:
+            return
+        lock = self._locks_trips.setdefault(vehicle_id, asyncio.Lock())
+        async with lock:
+            now = datetime.now(UTC)
+            synced = self._trips_synced.get(vehicle_id)
+            if synced is not None and now < synced + TRIP_SYNC_INTERVAL:
+                return
+
+            from_time = await self._trip_store.last_start_time(vehicle_id)
+            if from_time is None:
+                from_time = self._format_time(now - TRIP_HISTORY)
+            count = 0
+            async for page in self.iter_trips(vehicle_id, from_time):
+                await self._trip_store.add_trips(vehicle_id, page)
+                count += len(page)
+            _LOGGER.debug("Synced %s trips of %s from %s", count, vehicle_id, from_time)
+            self._trips_synced[vehicle_id] = now
+
     #     async def get_odometer_at_time(self, vehicle_id, isotime):
     #         """Get calculated odometer value at a specific time"""
     #         odometer = None
@@ -242,69 +526,141 @@ class MinVW:
 
     #         return odometer
 
-    #     async def get_fuel_economy(self, vehicle_id):
-    #         """Calculate distance driven per liter of fuel."""
-    #         ret = None
-    #         att = dict()
+    async def get_refuels(self, vehicle_id) -> RefuelHistory:
+        """Get refuel history of a vehicle, updated from current vehicle data."""
+        return await self.update_refuels(await self._get_snapshot(), vehicle_id)
 
-    #         req_param = """query fuel {
-    #   vehicle(id: %s) {
-    #     refuelEvents(limit: 2, order: DESC) {
-    #       litersAfter
-    #       litersBefore
-    #       time
-    #     }
-    #     fuelLevel {
-    #       time
-    #       liter
-    #     }
-    #   }
-    # }
-    #         """
-    #         req_param = req_param % (vehicle_id)
+    async def update_refuels(self, snapshot: VehicleSnapshot, vehicle_id):
+        """Update refuel history of a vehicle from vehicle data read.
 
-    #         vehicle_data = await self.api_request(req_param)
-
-    #         fuelevents = self._get_vehicle_value(
-    #             vehicle_data, ["data", "vehicle", "refuelEvents"]
-    #         )
-    #         fuellevel = self._get_vehicle_value(
-    #             vehicle_data, ["data", "vehicle", "fuelLevel"]
-    #         )
+        Synced when vehicle data reports a refuel event not in the history,
+        odometer at each event is looked up once. Failed syncs are retried with
+        backoff.
+        """
+        async with self._lock_refuels:
+            history = self._refuels.get(vehicle_id)
+            if history is None:
+                history = self._refuels[vehicle_id] = RefuelHistory()
+            changed = False
+
+            latest = self._get_vehicle_value(
+                snapshot.vehicle(vehicle_id), ["refuelEvents", 0]
+            )
+            if latest is not None and not history.has(latest.get("time")):
+                changed = await self._sync_refuels(vehicle_id, history)
+
+            # Odometer of events outside trip history will not be found
+            since = (datetime.now(UTC) - TRIP_HISTORY).timestamp()
+            for event in history.events:
+                if event["odometer"] is None and to_timestamp(event["time"]) > since:
+                    odometer = await self.get_odometer_at_time(vehicle_id, event["time"])
+                    if odometer is not None:
+                        event["odometer"] = odometer
+                        changed = True
+
+            if changed and self._refuel_listener is not None:
+                self._refuel_listener(self.export_refuels())
+            return history
+
+    async def _sync_refuels(self, vehicle_id, history) -> bool:
+        """Read latest refuel events into the history, True if any added."""
+        now = datetime.now(UTC)
+        failures, retry = self._refuels_retry.get(vehicle_id, (0, None))
+        if retry is not None and now < retry:
+            return False
+
+        vehicle_data = await self.api_request(
+            build_refuels_query(vehicle_id, REFUEL_SYNC_LIMIT)
+        )
+        events = self._get_vehicle_value(
+            vehicle_data, ["data", "vehicle", "refuelEvents"]
+        )
+        if events is None:
+            self._refuels_retry[vehicle_id] = (
+                failures + 1,
+                now + min(REFUEL_RETRY * 2**failures, REFUEL_RETRY_MAX),
+            )
+            return False
+
+        self._refuels_retry.pop(vehicle_id, None)
+        added = sum(history.add(event) for event in events)
+        _LOGGER.debug("Synced %s refuel events of %s", added, vehicle_id)
+        return added > 0
+
+    def export_refuels(self):
+        """Export refuel histories for restore_refuels(), JSON serializable."""
+        return {
+            vehicle_id: history.events
+            for vehicle_id, history in self._refuels.items()
+            if len(history)
+        }
 
-    #         if fuelevents is not None and len(fuelevents) >= 2 and fuellevel is not None:
+    def restore_refuels(self, stored):
+        """Restore refuel histories exported earlier."""
+        for vehicle_id, events in (stored or {}).items():
+            history = RefuelHistory(events)
+            self._refuels[vehicle_id] = history
+            for event in history.events:
+                self._timeline(vehicle_id).add(event["time"], event["odometer"])
 
-    #             fuel_used = 0
-    #             fuel_used += fuelevents[1]["litersAfter"] - fuelevents[0]["litersBefore"]
-    #             fuel_used += fuelevents[0]["litersAfter"] - fuellevel["liter"]
-    #             att["Fuel used"] = fuel_used
+    async def get_distance_since_refuel(self, vehicle_id):
+        """Get distance driven since the latest refuel event."""
+        await self.get_refuels(vehicle_id)
+        return self.distance_since_refuel(self._snapshot, vehicle_id)
 
-    #             # Request distance
-    #             time_start = fuelevents[1]["time"]
-    #             time_end = fuellevel["time"]
+    def distance_since_refuel(self, snapshot: VehicleSnapshot, vehicle_id):
+        """Get distance driven since the latest refuel event in the history.
 
-    #             req_param = """query fuelDistance {
-    #   vehicle(id: %s) {
-    #     totalTripStatistics(period: {first: "%s", last: "%s"} ) { mileageInKm }
-    #   }
-    # }
-    #             """
-    #             req_param = req_param % (
-    #                 vehicle_id,
-    #                 time_start,
-    #                 time_end,
-    #             )
+        The history is not updated, see update_refuels().
+        """
+        ret = None
+        att = {}
+        history = self._refuels.get(vehicle_id)
+        latest = None if history is None else history.latest
+        if latest is not None:
+            att["Refueled at"] = latest["time"]
+            att["Odometer"] = latest["odometer"]
+            odometer = self._get_vehicle_value(
+                snapshot.vehicle(vehicle_id), ["odometer", "odometer"]
+            )
+            if odometer is not None and latest["odometer"] is not None:
+                distance = odometer - latest["odometer"]
+                if distance >= 0:
+                    ret = distance
+        return ret, att
 
-    #             vehicle_data = await self.api_request(req_param)
-    #             distance = self._get_vehicle_value(
-    #                 vehicle_data, ["data", "vehicle", "totalTripStatistics", "mileageInKm"]
-    #             )
+    async def get_fuel_economy(self, vehicle_id):
+        """Get distance driven per liter of fuel, from the refuel history."""
+        await self.get_refuels(vehicle_id)
+        return self.fuel_economy(self._snapshot, vehicle_id)
 
-    #             if distance is not None:
-    #                 att["distance"] = distance
-    #                 ret = round(distance / fuel_used, 1)
+    def fuel_economy(self, snapshot: VehicleSnapshot, vehicle_id):
+        """Get distance driven per liter of fuel, from the refuel history.
 
-    #         return ret, att
+        The latest complete tank decides the value, consumption of the tank
+        currently used and each tank in the history are attributes. The
+        history is not updated, see update_refuels().
+        """
+        ret = None
+        att = {}
+        history = self._refuels.get(vehicle_id)
+        if history is None:
+            return ret, att
+        tanks = history.tanks()
+        if tanks:
+            ret = tanks[-1]["km/l"]
+            att["Tanks"] = tanks
+
+        latest = history.latest
+        if latest is not None:
+            vehicle = snapshot.vehicle(vehicle_id)
+            fuel_level = self._get_vehicle_value(vehicle, ["fuelLevel"])
+            odometer = self._get_vehicle_value(vehicle, ["odometer", "odometer"])
+            if fuel_level is not None:
+                att["Current tank"] = tank_economy(
+                    latest, fuel_level.get("time"), fuel_level.get("liter"), odometer
+                )
+        return ret, att
 
     def has_value(self, obj, key) -> bool:
         """Check if object has key."""
@@ -320,155 +676,176 @@ class MinVW:
         return obj_dst
 
     async def get_leads(self, vehicle_id):
-        """Find vehicle."""
-        ret = []
-        data = await self._get_vehicle_data()
-        for item in data["data"]["viewer"]["vehicles"]:
-            vehicle = item["vehicle"]
-            if vehicle["id"] == vehicle_id:
-                # j = 0
-                for lead in vehicle["leads"]:
-                    try:
-                        # Basic info
-                        element = {
-                            "type": lead["type"],
-                            "createdTime": lead["createdTime"],
-                        }
-                        # Optional info
-                        element = self.obj_copy_attributes(
-                            lead,
-                            element,
-                            [
-                                "updatedTime",
-                                "bookingTime",
-                                "lastContactedTime",
-                                "severityScore",
-                            ],
-                        )
-                        # Value
-                        if self.has_value(lead, "value"):
-                            element["value"] = (
-                                f"{lead['value']['amount']} {lead['value']['currency']}"
-                            )
+        """Get open leads of a vehicle, normalized."""
+        return self.leads(await self._get_snapshot(), vehicle_id)
+
+    def leads(self, snapshot: VehicleSnapshot, vehicle_id):
+        """Get open leads of a vehicle from vehicle data read, normalized.
+
+        The list is cached and returned as is while the leads do not change,
+        callers must not modify it.
+        """
+        vehicle = snapshot.vehicle(vehicle_id)
+        if vehicle is None:
+            return []
 
-                        # Context - Type specific info
-                        if self.has_value(lead, "context"):
-                            # Type: service_reminder
-                            if lead["type"] == "service_reminder":
-                                element["context"] = self.obj_copy_attributes(
-                                    lead["context"],
-                                    {},
-                                    ["serviceDate", "oilEstimateUncertain"],
-                                )
-                                if lead["context"]["sourceData"] is not None:
-                                    for data in lead["context"]["sourceData"]:
-                                        if (
-                                            data is not None
-                                            and data["type"] is not None
-                                            and data["value"] is not None
-                                        ):
-                                            element["context"][data["type"]] = data[
-                                                "value"
-                                            ]
-                            else:
-                                if self.has_value(lead, "context"):
-                                    element["context"] = lead["context"]
-
-                            # Remove emply values in context
-                            remove_keys = []
-                            if element["context"] is not None:
-                                for key in element["context"]:
-                                    if element["context"][key] is None:
-                                        _LOGGER.debug("Key to remove: %s", key)
-                                        remove_keys.append(key)
-                            for key in remove_keys:
-                                element["context"].pop(key)
-
-                        ret.append(element)
-
-                        # j = j + 1
-                        # if j >= 5:
-                        #     break
-
-                    except Exception as err:  # pylint: disable=broad-except
-                        _LOGGER.error("Failed to handle lead: %s\n%s", lead, err)
+        raw = LEADS(vehicle) or []
+        cached = self._leads.get(vehicle_id)
+        if cached is not None and cached[0] is raw:
+            return cached[1]
 
+        # Leads are normalized again only when new or updated
+        known = {} if cached is None else cached[2]
+        ret = []
+        elements = {}
+        for lead in raw:
+            key = (lead.get("type"), lead.get("createdTime"), lead.get("updatedTime"))
+            element = known.get(key)
+            if element is None:
+                element = self._normalize_lead(lead)
+            if element is not None:
+                ret.append(element)
+                elements[key] = element
+
+        if cached is not None and ret == cached[1]:
+            ret = cached[1]
+        self._leads[vehicle_id] = (raw, ret, elements)
         return ret
 
-    async def get_value_float(self, vehicle_id, selector):
-        """Extract a float value from read data."""
+    def _normalize_lead(self, lead):
+        """Normalize a lead, None if it cannot be handled."""
+        try:
+            # Basic info
+            element = {
+                "type": lead["type"],
+                "createdTime": lead["createdTime"],
+            }
+            # Optional info
+            element = self.obj_copy_attributes(
+                lead,
+                element,
+                [
+                    "updatedTime",
+                    "bookingTime",
+                    "lastContactedTime",
+                    "severityScore",
+                ],
+            )
+            # Value
+            if self.has_value(lead, "value"):
+                element["value"] = (
+                    f"{lead['value']['amount']} {lead['value']['currency']}"
+                )
+
+            # Context - Type specific info
+            if self.has_value(lead, "context"):
+                # Type: service_reminder
+                if lead["type"] == "service_reminder":
+                    element["context"] = self.obj_copy_attributes(
+                        lead["context"],
+                        {},
+                        ["serviceDate", "oilEstimateUncertain"],
+                    )
+                    if lead["context"]["sourceData"] is not None:
+                        for data in lead["context"]["sourceData"]:
+                            if (
+                                data is not None
+                                and data["type"] is not None
+                                and data["value"] is not None
+                            ):
+                                element["context"][data["type"]] = data["value"]
+                else:
+                    element["context"] = lead["context"]
+
+                # Remove emply values in context
+                element["context"] = {
+                    key: value
+                    for key, value in element["context"].items()
+                    if value is not None
+                }
+
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error("Failed to handle lead: %s\n%s", lead, err)
+            return None
+
+        return element
+
+    @staticmethod
+    def to_float(data):
+        """Convert a read value to float, None if not numeric."""
         ret = None
-        data = await self.get_value(vehicle_id, selector)
         if isinstance(data, str):  # type(data) == str
             ret = float(data)
         if isinstance(data, (float, int)):
             ret = data
         return ret
 
+    async def get_value_float(self, vehicle_id, selector):
+        """Extract a float value from read data."""
+        return self.to_float(await self.get_value(vehicle_id, selector))
+
     async def get_value(self, vehicle_id, selector):
         """Find vehicle."""
         ret = None
-        data = await self._get_vehicle_data()
-        # vehicles = []
-        for item in data["data"]["viewer"]["vehicles"]:
-            vehicle = item["vehicle"]
-            if vehicle["id"] == vehicle_id:
-                ret = self._get_vehicle_value(vehicle, selector)
+        vehicle = (await self._get_snapshot()).vehicle(vehicle_id)
+        if vehicle is not None:
+            ret = self._get_vehicle_value(vehicle, selector)
         return ret
 
+    async def get_many(self, vehicle_id, selectors):
+        """Read several values of a vehicle at once.
+
+        Selectors are given as {name: selector}, values are returned as {name: value}.
+        """
+        return (await self._get_snapshot()).values(vehicle_id, selectors)
+
     def _get_vehicle_value(self, vehicle, selector):
         """Get selected attribures in vehicle data."""
-        obj = vehicle
-        for sel in selector:
-            if (obj is not None) and (
-                sel in obj or (isinstance(obj, list) and sel < len(obj))
-            ):
-                # print(obj)
-                # print(sel)
-                obj = obj[sel]
-            else:
-                # Object does not have specified selector(s)
-                obj = None
-                break
-        return obj
+        return compile_selector(selector)(vehicle)
 
-    async def get_lampstatus(self, vehicle_id, lamptype) -> tuple[str, str]:
+    async def get_lampstatus(self, vehicle_id, lamptype) -> tuple[bool, str]:
         """Get status of warning lamps."""
         ret = None
         time = None
-        data = await self._get_vehicle_data()
-        # vehicles = []
-        for item in data["data"]["viewer"]["vehicles"]:
-            vehicle = item["vehicle"]
-            if vehicle["id"] == vehicle_id:
-                obj = vehicle
-                for lamp in obj["lampStates"]:
-                    # print(lamp)
-                    if lamp["type"] == lamptype:
-                        ret = lamp["enabled"]
-                        time = lamp["time"]
-                        break
+        lamp = (await self._get_snapshot()).lamp(vehicle_id, lamptype)
+        if lamp is not None:
+            ret, time = lamp
         return ret, time
 
-    async def _get_voltage(self, vehicle_id):
-        ret = None
-        data = await self._get_vehicle_data()
-        for item in data["data"]["viewer"]["vehicles"]:
-            vehicle = item["vehicle"]
-            if vehicle["id"] == vehicle_id:
-                ret = vehicle["latestBatteryVoltage"]["voltage"]
-        return ret
+    async def get_lamps(self, vehicle_id):
+        """Get states of all warning lamps, (enabled, time) keyed by lamp type."""
+        return (await self._get_snapshot()).lamps(vehicle_id)
+
+    async def get_vehicle_instances(
+        self, include_additional_parameters=False, read_all_fields=False
+    ):
+        """Get vehicle instances and sensor data available.
+
+        Cached data may lack fields not consumed by any entity, read_all_fields
+        reads all of them for the discovery.
+        """
+        if read_all_fields:
+            snapshot = VehicleSnapshot(
+                await self._graphql_request(
+                    build_vehicles_query(
+                        [field for fields in TIERS.values() for field in fields.values()]
+                    )
+                )
+            )
+        else:
+            snapshot = await self._get_snapshot()
+        additional_parameters = {}
+        if include_additional_parameters:
+            additional_parameters = await self._get_additional_parameters(
+                [vehicle["id"] for vehicle in snapshot.vehicles]
+            )
 
-    async def get_vehicle_instances(self, include_additional_parameters=False):
-        """Get vehicle instances and sensor data available."""
-        data = await self._get_vehicle_data()
         vehicles = []
-        for item in data["data"]["viewer"]["vehicles"]:
-            vehicle = item["vehicle"]
+        for vehicle in snapshot.vehicles:
             vehicle_id = vehicle["id"]
 
             # Find lamps for this vehicle
-            lampstates = [lamp["type"] for lamp in vehicle["lampStates"]]
+            lampstates = [lamp["type"] for lamp in LAMP_STATES(vehicle) or []]
             # for lamp in vehicle["lampStates"]:
             #    lampstates.append(lamp["type"])
 
@@ -495,7 +872,10 @@ class MinVW:
                 has.append("fuelEconomy")
             if self._get_vehicle_value(vehicle, ["odometer", "odometer"]) is not None:
                 has.append("odometer")
-            if await self.get_next_service_data_predicted(vehicle_id) is not None:
+            if (
+                self._get_vehicle_value(vehicle, ["service", "predictedDate"])
+                is not None
+            ):
                 has.append("NextServicePredicted")
             if (
                 self._get_vehicle_value(vehicle, ["chargePercentage", "pct"])
@@ -533,32 +913,12 @@ class MinVW:
             ):
                 has.append("refuelEvents")
 
-            # Request additional parameters
+            # Additional parameters
             if include_additional_parameters:
-                req_param = """query AdditionalParameters {
-vehicle(id: %s) {
-    totalTripStatistics(period: {first: "%s", last: "%s"}) {mileageInKm, driveDurationInMinutes, numberTrips, longestMileageInKm}
-    serverCalcGpsOdometers(limit: 1, order: DESC){odometer, time}
-    trips(last: 1){items{mileage, gpsMileage, odometerMileage, startOdometer, endOdometer, startTime, endTime, time}}
-}}
-                """
-                #     refuelEvents(limit: 1) {time, litersAfter, litersBefore}
-
-                date = datetime.now(UTC)  # datetime.utcnow()
-
-                req_param = req_param % (
-                    vehicle_id,
-                    (date + relativedelta(months=-2))
-                    .isoformat(timespec="milliseconds")
-                    .replace("+00:00", "Z"),
-                    date.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
-                )
-
-                vehicle_data = await self.api_request(req_param)
+                vehicle_data = additional_parameters.get(vehicle_id)
                 if (
                     self._get_vehicle_value(
-                        vehicle_data,
-                        ["data", "vehicle", "totalTripStatistics", "mileageInKm"],
+                        vehicle_data, ["totalTripStatistics", "mileageInKm"]
                     )
                     is not None
                 ):
@@ -566,17 +926,14 @@ vehicle(id: %s) {
 
                 if (
                     self._get_vehicle_value(
-                        vehicle_data,
-                        ["data", "vehicle", "serverCalcGpsOdometers", 0, "odometer"],
+                        vehicle_data, ["serverCalcGpsOdometers", 0, "odometer"]
                     )
                     is not None
                 ):
                     has.append("serverCalcGpsOdometers")
 
                 if (
-                    self._get_vehicle_value(
-                        vehicle_data, ["data", "vehicle", "trips", "items", 0, "time"]
-                    )
+                    self._get_vehicle_value(vehicle_data, ["trips", "items", 0, "time"])
                     is not None
                 ):
                     has.append("trips")
@@ -597,268 +954,409 @@ vehicle(id: %s) {
 
         return vehicles
 
-    async def _get_vehicle_data(self):
-        """Read data from API."""
+    async def _get_additional_parameters(self, vehicle_ids):
+        """Probe trip and odometer history of vehicles.
 
-        async with self._lock_update:
-            if (
-                self._data_expires is None
-                or self._data is None
-                or datetime.now(UTC) > self._data_expires
-            ):
-                self._data_expires = None
-                self._data = None
-
-                req_param = """query User {
-  viewer {
-    vehicles {
-      primary
-      vehicle {
-        odometer {
-          odometer
-          time
-        }
-        odometerOffset
-        id
-        vin
-        licensePlate
-        name
-        brand
-        make
-        model
-        year
-        engineSize
-        avgCO2EmissionKm
-        fuelEconomy
-        fuelType
-        fuelLevel {
-          time
-          liter
-        }
-        refuelEvents(limit: 1) {
-          litersAfter
-          time
-        }
-        fuelTankSize(limit: 1)
-        fuelPercentage {
-          percent
-          time
-        }
-        adblueRemainingKm(limit: 1) {
-          km
-        }
-        chargePercentage {
-          pct
-          time
-        }
-        highVoltageBatteryTemperature {
-          celsius
-          time
-        }
-        rangeTotalKm { km time }
-        ignition {
-          time
-          on
-        }
-        lampStates {
-          type
-          time
-          enabled
-          lampDetails {
-            title
-            subtitle
-          }
-        }
-        outdoorTemperatures(limit: 1) {
-          celsius
-          time
-        }
-        position {
-          latitude
-          longitude
-          speed
-          direction
-          time
-        }
-        service {
-          predictedDate
-        }
-        latestBatteryVoltage {
-          voltage
-          time
-        }
-        health { ok }
-        leads(statuses: [open], orderBy: {field: created_at, direction: DESC}) {
-          type
-          status
-          interactions{time, channel}
-          severityScore
-          value{amount, currency}
-          createdTime
-          updatedTime
-          lastActivityTime
-          bookingTime
-          lastContactedTime
-          context {
-            ... on LeadErrorCodeContext {
-                errorCode, ecu, provider, errorCodeCount, description, severity, firstErrorCodeTime, lastErrorCodeTime
-            }
-            ... on LeadLowBatteryVoltageContext {
-                sourceMedianVoltage { voltage }
-            }
-            ... on LeadServiceReminderContext {
-                serviceDate, oilEstimateUncertain, sourceData { type, value }
-            }
-            ... on  LeadConnectivityIssueContext{
-                latestVehiclePositionRecordTime
-            }
-            ... on  LeadEngineLampContext{
-                lamps { type, color, title, subtitle, recommendationText, descriptionTitle, descriptionText }
-            }
-            ... on LeadMainPowerDisconnectContext{
-                disconnectionEventTime, disconnectionLatitude, disconnectionLongitude, disconnectionPositionTime, unitConnectionState, lastConnectionEventTime, incidentCount
-            }
-            ... on LeadDefaultContext{
-              context
-            }
-            ... on LeadRapidBatteryDischargeContext{
-               time, durationHours, minVoltage, maxVoltage, voltageDrop
-            }
-            ... on LeadQuoteContext{
-				quote{workshop{name},title,price{amount, currency},expirationDate,status}
+        Vehicles are aliased into few requests, sent concurrently.
+        """
+        date = datetime.now(UTC).replace(second=0, microsecond=0)
+        fields = additional_parameter_fields(
+            (date + relativedelta(months=-2))
+            .isoformat(timespec="milliseconds")
+            .replace("+00:00", "Z"),
+            date.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+        )
+        semaphore = asyncio.Semaphore(DISCOVERY_CONCURRENCY)
+
+        async def probe(chunk):
+            async with semaphore:
+                data = await self.api_request(build_vehicle_query(chunk, fields))
+            return {
+                vehicle_id: self._get_vehicle_value(data, ["data", f"v{index}"])
+                for index, vehicle_id in enumerate(chunk)
             }
-            ... on UserReportedLampLeadContext{
-				type, color, frequency, source
+
+        ret = {}
+        for result in await asyncio.gather(
+            *(
+                probe(vehicle_ids[index : index + DISCOVERY_CHUNK_SIZE])
+                for index in range(0, len(vehicle_ids), DISCOVERY_CHUNK_SIZE)
+            )
+        ):
+            ret.update(result)
+        return ret
+
+    @property
+    def data_expires(self):
+        """Time when the cached vehicle data expires."""
+        return self._data_expires
+
+    @property
+    def data_updated(self):
+        """Time of the latest successful read of vehicle data."""
+        return self._data_updated
+
+    def register_fields(self, fields):
+        """Register vehicle data fields consumed by an entity."""
+        self._field_users.update(fields)
+        self._update_tier_fields()
+
+    def unregister_fields(self, fields):
+        """Unregister vehicle data fields no longer consumed by an entity."""
+        self._field_users.subtract(fields)
+        self._field_users = +self._field_users
+        self._update_tier_fields()
+
+    def select_registered_fields(self):
+        """Read only fields registered by entities from now on.
+
+        Until then all known fields are read, as needed to discover which
+        sensors each vehicle supports.
+        """
+        self._select_fields = True
+        self._update_tier_fields()
+
+    def _update_tier_fields(self):
+        """Build the selection of fields per tier, read new fields with next refresh."""
+        for tier, fields in TIERS.items():
+            selected = {
+                key: field
+                for key, field in fields.items()
+                if not self._select_fields
+                or key in REQUIRED_FIELDS
+                or key in self._field_users
             }
-          }
-        }
+            if not selected.keys() <= self._tier_fields[tier].keys():
+                if tier == "hot":
+                    self._hot_expires = {}
+                else:
+                    self._tier_expires.pop(tier, None)
+                self._data_expires = None
+            self._tier_fields[tier] = selected
+
+    def expire_data(self):
+        """Mark cached vehicle data as expired, next read will hit the API."""
+        self._tier_expires = {}
+        self._hot_expires = {}
+        self._data_expires = None
 
-      }
-    }
-  }
-}
-          """
-                req_body = {"query": req_param}
-
-                headers = {
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                    "x-organization-namespace": f"semler:{self._namespace}",
-                    "User-Agent": "ConnectedCars/360 CFNetwork/978.0.7 Darwin/18.7.0",
-                    "Authorization": f"Bearer {await self._get_access_token()}",
+    async def get_vehicle_data(self) -> VehicleSnapshot:
+        """Read data for all vehicles, from cache when still fresh."""
+        await self._get_vehicle_data()
+        return self._snapshot
+
+    def export_snapshot(self):
+        """Export vehicle data for restore_snapshot(), JSON serializable."""
+        if self._snapshot is None:
+            return None
+        return {
+            "time": self._snapshot.time.isoformat(),
+            "vehicles": {
+                vehicle_id: {
+                    key: value
+                    for tier in TIERS
+                    for key, value in self._tier_data[tier].get(vehicle_id, {}).items()
+                    if value is not None
                 }
+                for vehicle_id in self._vehicle_ids
+            },
+        }
 
-                req_url = self._base_url_graph + "graphql"
+    def restore_snapshot(self, stored) -> VehicleSnapshot:
+        """Restore vehicle data exported earlier.
 
-                # async with aiohttp.ClientSession() as session:
-                #     async with session.post(
-                #         req_url, json=req_body, headers=headers
-                #     ) as response:
-                async with (
-                    aiohttp.ClientSession() as session,
-                    session.post(req_url, json=req_body, headers=headers) as response,
-                ):
-                    self._data = await response.json()
-                    # self._data = json.loads('')
-                    _LOGGER.debug("Got vehicle data: %s", json.dumps(self._data))
-
-                    # Does any car have ignition?
-                    expire_time = 4.75
-                    for item in self._data["data"]["viewer"]["vehicles"]:
-                        vehicle = item["vehicle"]
-                        # id = vehicle["id"]
-                        ignition = self._get_vehicle_value(
-                            vehicle, ["ignition", "on"]
-                        )  # Preferred to check this only, but it seems to be delayed
-                        speed = self._get_vehicle_value(vehicle, ["position", "speed"])
-                        speed = speed if speed is not None else 0
-                        if bool(ignition) is True or speed > 0:  # ignition == True
-                            expire_time = 0.75  # At least one car has ignition/moving
-                            break
-                    self._data_expires = datetime.now(UTC) + timedelta(
-                        minutes=expire_time
-                    )
+        It is served as is until the next read from the API succeeds, reads of
+        single values do not wait on the API meanwhile.
+        """
+        try:
+            time = datetime.fromisoformat(stored["time"])
+            vehicles = stored["vehicles"]
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.debug("Stored snapshot not usable: %s", err)
+            return None
+
+        self._tier_data = {tier: {} for tier in TIERS}
+        for vehicle_id, vehicle in vehicles.items():
+            for tier, fields in TIERS.items():
+                self._tier_data[tier][vehicle_id] = {
+                    key: vehicle.get(key) for key in fields
+                }
+        self._vehicle_ids = list(vehicles)
+        self.expire_data()
+        self._merge_tiers(time)
+        self._restored = True
+        return self._snapshot
+
+    async def _get_snapshot(self) -> VehicleSnapshot:
+        """Read data indexed by vehicle."""
+        if not self._restored:
+            await self._get_vehicle_data()
+        return self._snapshot
+
+    def _is_data_fresh(self) -> bool:
+        """Check if cached vehicle data can be used."""
+        return (
+            self._data is not None
+            and self._data_expires is not None
+            and datetime.now(UTC) <= self._data_expires
+        )
 
-                # result = requests.post(req_url, json = req_body, headers = headers)
-                # print(result)
-                # result_json = result.json()
-                # print(result_json['data']['viewer']['vehicles'])
+    async def _get_vehicle_data(self):
+        """Read data from API."""
 
-                # for item in self._data['data']['viewer']['vehicles']:
-                #   vehicle = item['vehicle']
-                #   print(f"Primary: {item['primary']}")
-                #   print(f"Name:    {vehicle['name']}")
-                #   print(f"LicPlat: {vehicle['licensePlate']}")
+        # Fresh data is served without waiting on the lock
+        if self._is_data_fresh():
+            return self._data
+
+        async with self._lock_snapshot:
+            if self._is_data_fresh():
+                # Refreshed by a concurrent caller while waiting
+                self._request_stats["coalesced"] += 1
+            else:
+                try:
+                    await self._refresh_vehicle_data()
+                except Exception as err:  # pylint: disable=broad-except
+                    if not self._serve_stale(err):
+                        raise
 
         return self._data
 
-    async def _get_access_token(self):
-        """Authenticate to get access token."""
+    def _serve_stale(self, err) -> bool:
+        """Keep serving the latest snapshot after a failed read, if recent enough.
 
-        if (
-            self._accesstoken is None
-            or self._at_expires is None
-            or datetime.now(UTC) > self._at_expires
-        ):
+        Reads are answered from it without going to the API until it is
+        revalidated, after STALE_RETRY or when the circuit lets requests through.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or self._max_staleness is None:
+            return False
+        now = datetime.now(UTC)
+        if now - snapshot.time > self._max_staleness:
+            return False
+
+        retry = now + STALE_RETRY
+        if isinstance(err, CircuitOpenError):
+            retry = max(retry, err.retry_after)
+        self._data_expires = retry
+        if not snapshot.stale:
+            _LOGGER.warning(
+                "Unable to read vehicle data, serving data from %s: %s",
+                snapshot.time.isoformat(),
+                err,
+            )
+        snapshot.stale = True
+        return True
+
+    async def _refresh_vehicle_data(self):
+        """Read expired data, merge with cached data and build a new snapshot.
+
+        Slow tiers are read for all vehicles at once. Fast changing data is kept
+        per vehicle, so a driving car is read on its own without re-reading the
+        parked ones.
+        """
+        now = datetime.now(UTC)
+        tiers = [
+            tier
+            for tier in TIER_TTL
+            if self._tier_expires.get(tier) is None or now > self._tier_expires[tier]
+        ]
+        due = [
+            vehicle_id
+            for vehicle_id in self._vehicle_ids
+            if self._hot_expires.get(vehicle_id) is None
+            or now > self._hot_expires[vehicle_id]
+        ]
+
+        # Slow tiers without any consumed fields are not read
+        for tier in [tier for tier in tiers if not self._tier_fields[tier]]:
+            tiers.remove(tier)
+            self._tier_data[tier] = {}
+            self._tier_expires[tier] = now + TIER_TTL[tier]
+
+        if self._vehicle_ids and not tiers and not due:
+            # Only tiers without consumed fields expired, nothing to read
+            self._merge_tiers()
+            return
+
+        if not self._vehicle_ids or tiers or len(due) == len(self._vehicle_ids):
+            if due or not self._vehicle_ids:
+                tiers.insert(0, "hot")
+            await self._read_all_vehicles(tiers)
+        else:
+            await self._read_vehicles(due)
+
+        if not set(self._vehicle_ids).issubset(self._tier_data["cold"]):
+            # New vehicle on the account, read its static data as well
+            await self._read_all_vehicles(["cold"])
+
+        self._merge_tiers()
+        self._restored = False
+
+    async def _read_all_vehicles(self, tiers):
+        """Read fields of the given tiers for all vehicles in one request."""
+        fields = [
+            field for tier in tiers for field in self._tier_fields[tier].values()
+        ]
+        data = await self._graphql_request(build_vehicles_query(fields))
+        _LOGGER.debug("Got vehicle data %s: %s", tiers, json.dumps(data))
+
+        now = datetime.now(UTC)
+        vehicle_ids = []
+        for tier in tiers:
+            self._tier_data[tier] = {}
+        for item in data["data"]["viewer"]["vehicles"]:
+            vehicle = item["vehicle"]
+            vehicle_ids.append(vehicle["id"])
+            for tier in tiers:
+                self._tier_data[tier][vehicle["id"]] = {
+                    key: vehicle.get(key) for key in self._tier_fields[tier]
+                }
+            if "hot" in tiers:
+                self._hot_expires[vehicle["id"]] = now + self._hot_ttl(vehicle)
+                self._add_odometer(vehicle["id"], vehicle)
+        self._vehicle_ids = vehicle_ids
+        for tier in tiers:
+            if tier in TIER_TTL:
+                self._tier_expires[tier] = now + TIER_TTL[tier]
+
+    async def _read_vehicles(self, vehicle_ids):
+        """Read fast changing data of the given vehicles in one request."""
+        if not vehicle_ids:
+            raise ValueError("No vehicles to read")
+        data = await self._graphql_request(
+            build_vehicle_query(vehicle_ids, self._tier_fields["hot"].values())
+        )
+        _LOGGER.debug("Got vehicle data %s: %s", vehicle_ids, json.dumps(data))
+
+        now = datetime.now(UTC)
+        for index, vehicle_id in enumerate(vehicle_ids):
+            vehicle = data["data"].get(f"v{index}")
+            if vehicle is None:
+                continue
+            self._tier_data["hot"][vehicle_id] = {
+                key: vehicle.get(key) for key in self._tier_fields["hot"]
+            }
+            self._hot_expires[vehicle_id] = now + self._hot_ttl(vehicle)
+            self._add_odometer(vehicle_id, vehicle)
+
+    async def _graphql_request(self, req_param):
+        """Send a request for vehicle data, errors are raised."""
+        self._request_stats["requests"] += 1
+        data = await self._request_json({"query": req_param})
+        if data.get("data") is None:
+            errors = data.get("errors") or [{}]
+            raise ResponseError(
+                f"No data in response: {errors[0].get('message', data)}"
+            )
+        return data
+
+    async def _request_json(self, req_body):
+        """Post a GraphQL request and read its JSON response, errors are raised.
+
+        Server errors, rate limiting, connection errors and unreadable bodies
+        count as failures of the host, opening its circuit when repeated.
+        """
+        try:
+            async with await self._post_graphql(req_body) as response:
+                if response.status == 429 or response.status >= 500:
+                    error = ResponseError(
+                        f"HTTP {response.status}: {(await response.text())[:200]}",
+                        response.status,
+                    )
+                    self._throttle.failure(error, retry_after(response))
+                    raise error
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError:
+                    data = None
+                if not isinstance(data, dict):
+                    error = ResponseError(
+                        f"Malformed response, HTTP {response.status}", response.status
+                    )
+                    self._throttle.failure(error)
+                    raise error
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            self._throttle.failure(err)
+            raise
+        self._throttle.success()
+
+        if not response.ok:
+            # The host is up, the request was not accepted
+            raise ResponseError(f"HTTP {response.status}: {data}", response.status)
+        return data
+
+    async def _post_graphql(self, req_body) -> aiohttp.ClientResponse:
+        """Post a GraphQL request, logging in again if the token is rejected."""
+        req_url = self._base_url_graph + "graphql"
+        for attempt in range(2):
+            await self._throttle.acquire()
+            token = await self._get_access_token()
             headers = {
                 "Content-Type": "application/json",
                 "Accept": "application/json",
                 "x-organization-namespace": f"semler:{self._namespace}",
                 "User-Agent": "ConnectedCars/360 CFNetwork/978.0.7 Darwin/18.7.0",
+                "Authorization": f"Bearer {token}",
             }
-            body = {"email": self._email, "password": self._password}
+            response = await self._get_session().post(
+                req_url, json=req_body, headers=headers
+            )
+            if response.status != 401 or attempt:
+                return response
+            response.release()
+            _LOGGER.debug("Access token rejected")
+            self._auth.reject(token)
+
+    def _merge_tiers(self, time=None):
+        """Merge tiers into one snapshot, hottest data last."""
+        vehicles = [
+            {
+                "vehicle": {
+                    "id": vehicle_id,
+                    **self._tier_data["cold"].get(vehicle_id, {}),
+                    **self._tier_data["warm"].get(vehicle_id, {}),
+                    **self._tier_data["hot"].get(vehicle_id, {}),
+                }
+            }
+            for vehicle_id in self._vehicle_ids
+        ]
+        merged = {"data": {"viewer": {"vehicles": vehicles}}}
+        snapshot = VehicleSnapshot(merged, time)
+
+        self._data = merged
+        self._snapshot = snapshot
+        self._data_updated = snapshot.time
+        self._data_expires = min(
+            [*self._tier_expires.values(), *self._hot_expires.values()],
+            default=snapshot.time,
+        )
 
-            # Authenticate
+    def _add_odometer(self, vehicle_id, vehicle):
+        """Add odometer reading of vehicle data to the timeline."""
+        odometer = vehicle.get("odometer")
+        if odometer:
             try:
-                self._accesstoken = None
-                self._at_expires = None
-                result_json = None
-
-                _LOGGER.debug("Getting access token...")
-
-                auth_url = self._base_url_auth + "auth/login/email/password"
-
-                # async with aiohttp.ClientSession() as session:
-                #     async with session.post(
-                #         auth_url, json=body, headers=headers
-                #     ) as response:
-                #         result_json = await response.json()
-                async with (
-                    aiohttp.ClientSession() as session,
-                    session.post(auth_url, json=body, headers=headers) as response,
-                ):
-                    result_json = await response.json()
-
-                # result = await requests.post(auth_url, json = body, headers = headers)
-                # result_json = result.json()
-                # print(result_json)
-
-                if (
-                    result_json is not None
-                    and "token" in result_json
-                    and "expires" in result_json
-                ):
-                    self._accesstoken = result_json["token"]
-                    self._at_expires = datetime.now(UTC) + timedelta(
-                        seconds=int(result_json["expires"]) - 120
-                    )
-                    _LOGGER.debug("Got access token: %s...", self._accesstoken[:10])
-                if (
-                    result_json is not None
-                    and "error" in result_json
-                    and "message" in result_json
-                ):
-                    raise Exception(result_json["message"])
-
-            except aiohttp.ClientError as client_error:
-                _LOGGER.warning("Authentication failed. %s", client_error)
-            # except requests.exceptions.Timeout:
-            #     _LOGGER.warn("Authentication failed. Timeout")
-            # except requests.exceptions.HTTPError as e:
-            #     _LOGGER.warn(f"Authentication failed. HTTP error: {e}.")
-            # except requests.exceptions.RequestException as e:
-            #     _LOGGER.warn(f"Authentication failed: {e}.")
-
-        # print(self._at_expires)
+                self._timeline(vehicle_id).add(
+                    odometer.get("time"), self.to_float(odometer.get("odometer"))
+                )
+            except (TypeError, ValueError) as err:
+                _LOGGER.debug("Odometer reading not usable: %s", err)
+
+    def _hot_ttl(self, vehicle):
+        """Get expiry of fast changing data, short while the car is driving."""
+        ignition = self._get_vehicle_value(
+            vehicle, ["ignition", "on"]
+        )  # Preferred to check this only, but it seems to be delayed
+        speed = self._get_vehicle_value(vehicle, ["position", "speed"])
+        speed = speed if speed is not None else 0
+        if bool(ignition) is True or speed > 0:  # ignition == True
+            return HOT_TTL_DRIVING
+        return HOT_TTL_PARKED
+
+    def restore_token(self, token, expires: datetime):
+        """Use an access token stored earlier, if not expired."""
+        self._auth.restore(token, expires)
 
-        return self._accesstoken
+    async def _get_access_token(self):
+        """Authenticate to get access token."""
+        return await self._auth.get_token()
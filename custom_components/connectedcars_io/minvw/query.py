@@ -0,0 +1,208 @@
+"""GraphQL queries for connectedcars.io vehicle data."""
+
+from datetime import timedelta
+
+LEADS_FIELD = """leads(statuses: [open], orderBy: {field: created_at, direction: DESC}) {
+          type
+          severityScore
+          value{amount, currency}
+          createdTime
+          updatedTime
+          bookingTime
+          lastContactedTime
+          context {
+            ... on LeadErrorCodeContext {
+                errorCode, ecu, provider, errorCodeCount, description, severity, firstErrorCodeTime, lastErrorCodeTime
+            }
+            ... on LeadLowBatteryVoltageContext {
+                sourceMedianVoltage { voltage }
+            }
+            ... on LeadServiceReminderContext {
+                serviceDate, oilEstimateUncertain, sourceData { type, value }
+            }
+            ... on  LeadConnectivityIssueContext{
+                latestVehiclePositionRecordTime
+            }
+            ... on  LeadEngineLampContext{
+                lamps { type, color, title, subtitle, recommendationText, descriptionTitle, descriptionText }
+            }
+            ... on LeadMainPowerDisconnectContext{
+                disconnectionEventTime, disconnectionLatitude, disconnectionLongitude, disconnectionPositionTime, unitConnectionState, lastConnectionEventTime, incidentCount
+            }
+            ... on LeadDefaultContext{
+              context
+            }
+            ... on LeadRapidBatteryDischargeContext{
+               time, durationHours, minVoltage, maxVoltage, voltageDrop
+            }
+            ... on LeadQuoteContext{
+              quote{workshop{name},title,price{amount, currency},expirationDate,status}
+            }
+            ... on UserReportedLampLeadContext{
+              type, color, frequency, source
+            }
+          }
+        }"""
+
+# Vehicle fields per tier, keyed by field name in the response.
+# Hot fields change while driving, warm fields within hours, cold fields rarely.
+TIERS = {
+    "hot": {
+        "odometer": "odometer { odometer time }",
+        "ignition": "ignition { time on }",
+        "position": "position { latitude longitude speed direction time }",
+        "fuelLevel": "fuelLevel { time liter }",
+        "fuelPercentage": "fuelPercentage { percent time }",
+        "chargePercentage": "chargePercentage { pct time }",
+        "rangeTotalKm": "rangeTotalKm { km time }",
+    },
+    "warm": {
+        "lampStates": "lampStates { type time enabled }",
+        "health": "health { ok }",
+        "latestBatteryVoltage": "latestBatteryVoltage { voltage time }",
+        "outdoorTemperatures": "outdoorTemperatures(limit: 1) { celsius time }",
+        "highVoltageBatteryTemperature": "highVoltageBatteryTemperature { celsius time }",
+        "fuelEconomy": "fuelEconomy",
+        "refuelEvents": "refuelEvents(limit: 1) { litersAfter time }",
+    },
+    "cold": {
+        "vin": "vin",
+        "licensePlate": "licensePlate",
+        "name": "name",
+        "make": "make",
+        "model": "model",
+        "service": "service { predictedDate }",
+        "leads": LEADS_FIELD,
+    },
+}
+
+# Fields always read: identity of the vehicle and data deciding refresh cadence
+REQUIRED_FIELDS = frozenset(
+    ("vin", "licensePlate", "name", "make", "model", "ignition", "position")
+)
+
+# Expiry of slow tiers, hot tier expires per vehicle depending on it driving
+TIER_TTL = {
+    "warm": timedelta(minutes=15),
+    "cold": timedelta(hours=1),
+}
+HOT_TTL_PARKED = timedelta(minutes=4.75)
+HOT_TTL_DRIVING = timedelta(minutes=0.75)
+
+# Days of trip statistics per request, and refresh interval of the current day
+TRIP_STATISTICS_CHUNK_DAYS = 62
+TRIP_STATISTICS_TTL = timedelta(hours=1)
+
+# Backoff after a failed read of trip statistics, doubling up to max
+TRIP_STATISTICS_RETRY = timedelta(minutes=5)
+TRIP_STATISTICS_RETRY_MAX = timedelta(hours=6)
+
+# Vehicle data read again this often while a stale snapshot is served
+STALE_RETRY = timedelta(minutes=1)
+
+# Trips read per page, how far back trips are first synced and how often
+TRIP_FIELDS = (
+    "mileage, gpsMileage, odometerMileage, startOdometer, endOdometer, "
+    "startTime, endTime, time"
+)
+TRIP_PAGE_SIZE = 100
+TRIP_HISTORY = timedelta(days=400)
+TRIP_SYNC_INTERVAL = timedelta(minutes=15)
+
+# Backoff of odometer lookups not answered, doubled per failure up to max
+ODOMETER_RETRY = timedelta(minutes=1)
+ODOMETER_RETRY_MAX = timedelta(hours=1)
+
+# Refuel events read when the history is behind the latest refuel event
+REFUEL_FIELDS = "litersBefore litersAfter time"
+REFUEL_SYNC_LIMIT = 10
+
+# Backoff after a failed read of refuel events, doubling up to max
+REFUEL_RETRY = timedelta(minutes=5)
+REFUEL_RETRY_MAX = timedelta(hours=2)
+
+# Vehicles probed per discovery request and discovery requests in flight
+DISCOVERY_CHUNK_SIZE = 25
+DISCOVERY_CONCURRENCY = 4
+
+
+def additional_parameter_fields(first: str, last: str):
+    """Fields probing availability of trip and odometer history."""
+    return (
+        f'totalTripStatistics(period: {{first: "{first}", last: "{last}"}}) '
+        "{mileageInKm, driveDurationInMinutes, numberTrips, longestMileageInKm}",
+        "serverCalcGpsOdometers(limit: 1, order: DESC){odometer, time}",
+        "trips(last: 1){items{mileage, gpsMileage, odometerMileage, startOdometer, "
+        "endOdometer, startTime, endTime, time}}",
+    )
+
+
+def build_vehicles_query(fields) -> str:
+    """Build query reading the given fields for all vehicles of the user."""
+    selection = "\n        ".join(fields)
+    return f"""query User {{
+  viewer {{
+    vehicles {{
+      vehicle {{
+        id
+        {selection}
+      }}
+    }}
+  }}
+}}"""
+
+
+def build_vehicle_query(vehicle_ids, fields) -> str:
+    """Build query reading the given fields for some vehicles.
+
+    Vehicles are aliased by position in vehicle_ids: v0, v1, ...
+    """
+    if not vehicle_ids:
+        raise ValueError("A vehicle query needs at least one vehicle")
+    selection = "\n    ".join(fields)
+    vehicles = "\n".join(
+        f"""  v{index}: vehicle(id: {vehicle_id}) {{
+    id
+    {selection}
+  }}"""
+        for index, vehicle_id in enumerate(vehicle_ids)
+    )
+    return f"""query Vehicles {{
+{vehicles}
+}}"""
+
+
+def build_trip_statistics_query(vehicle_id, periods) -> str:
+    """Build query reading trip statistics of a vehicle for some periods.
+
+    Periods are (first, last) pairs, aliased by position: d0, d1, ...
+    """
+    statistics = "\n".join(
+        f"""    d{index}: totalTripStatistics(period: {{first: "{first}", last: "{last}"}}) {{
+      mileageInKm, driveDurationInMinutes, numberTrips, longestMileageInKm
+    }}"""
+        for index, (first, last) in enumerate(periods)
+    )
+    return f"""query TripStatistics {{
+  vehicle(id: {vehicle_id}) {{
+{statistics}
+  }}
+}}"""
+
+
+def build_trips_query(vehicle_id, from_time, first) -> str:
+    """Build query reading the first trips of a vehicle starting from a time."""
+    return f"""query Trips {{
+  vehicle(id: {vehicle_id}) {{
+    trips(fromTime: "{from_time}", first: {first}) {{items{{{TRIP_FIELDS}}}}}
+  }}
+}}"""
+
+
+def build_refuels_query(vehicle_id, limit) -> str:
+    """Build query reading the latest refuel events of a vehicle."""
+    return f"""query Refuels {{
+  vehicle(id: {vehicle_id}) {{
+    refuelEvents(limit: {limit}, order: DESC) {{{REFUEL_FIELDS}}}
+  }}
+}}"""
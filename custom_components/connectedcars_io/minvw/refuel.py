@@ -0,0 +1,84 @@
+"""Refuel events of a vehicle and the fuel economy of each tank."""
+
+from .timeline import to_timestamp
+
+# Refuel events kept per vehicle
+MAX_REFUELS = 50
+
+
+class RefuelHistory:
+    """Refuel events of a vehicle, oldest first.
+
+    Events are dicts with time, litersBefore and litersAfter as read, and
+    odometer at the time of the event once it is known.
+    """
+
+    __slots__ = ("_events",)
+
+    def __init__(self, events=()) -> None:
+        """Initialize, e.g. from events stored earlier."""
+        self._events = []
+        for event in events:
+            self.add(event)
+
+    def __len__(self) -> int:
+        """Number of events."""
+        return len(self._events)
+
+    @property
+    def events(self):
+        """Events, oldest first."""
+        return self._events
+
+    @property
+    def latest(self):
+        """Latest event, None without events."""
+        return self._events[-1] if self._events else None
+
+    def has(self, time) -> bool:
+        """Check if the event at a time is known."""
+        return any(event["time"] == time for event in self._events)
+
+    def add(self, event) -> bool:
+        """Add an event unless known, True if added."""
+        if (
+            event is None
+            or event.get("time") is None
+            or event.get("litersAfter") is None
+            or self.has(event["time"])
+        ):
+            return False
+        self._events.append(
+            {
+                "time": event["time"],
+                "litersBefore": event.get("litersBefore"),
+                "litersAfter": event["litersAfter"],
+                "odometer": event.get("odometer"),
+            }
+        )
+        self._events.sort(key=lambda event: to_timestamp(event["time"]))
+        del self._events[:-MAX_REFUELS]
+        return True
+
+    def tanks(self):
+        """Fuel economy of each tank between two refuels, oldest first."""
+        ret = []
+        for start, end in zip(self._events, self._events[1:]):
+            ret.append(
+                tank_economy(
+                    start, end["time"], end["litersBefore"], end["odometer"]
+                )
+            )
+        return ret
+
+
+def tank_economy(refuel, time, liters, odometer):
+    """Fuel economy from a refuel until a time with liters and odometer then."""
+    tank = {"from": refuel["time"], "to": time, "liters": None, "km": None, "km/l": None}
+    if liters is not None and refuel["litersAfter"] is not None:
+        tank["liters"] = round(refuel["litersAfter"] - liters, 1)
+    if odometer is not None and refuel["odometer"] is not None:
+        tank["km"] = round(odometer - refuel["odometer"], 1)
+    if tank["liters"] and tank["km"] is not None and tank["liters"] > 0:
+        tank["km/l"] = round(tank["km"] / tank["liters"], 1)
+    return tank
@@ -0,0 +1,42 @@
+"""Compiled selectors for reading values in vehicle data."""
+
+from functools import lru_cache
+
+
+class Selector:
+    """Getter for a path of keys and list indexes.
+
+    E.g. ["outdoorTemperatures", 0, "celsius"]. Missing keys, short lists and
+    None values along the path all read as None.
+    """
+
+    __slots__ = ("path",)
+
+    def __init__(self, path) -> None:
+        """Initialize."""
+        self.path = tuple(path)
+
+    def __call__(self, obj):
+        """Get the selected value from obj."""
+        for key in self.path:
+            try:
+                obj = obj[key]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return obj
+
+    def __repr__(self) -> str:
+        """Representation."""
+        return f"Selector({list(self.path)})"
+
+
+@lru_cache(maxsize=1024)
+def _compile(path) -> Selector:
+    return Selector(path)
+
+
+def compile_selector(selector) -> Selector:
+    """Compile a selector list, compiled selectors are shared per path."""
+    if isinstance(selector, Selector):
+        return selector
+    return _compile(tuple(selector))
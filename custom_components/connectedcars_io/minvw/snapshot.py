@@ -0,0 +1,89 @@
+"""Indexed view of vehicle data read from connectedcars.io."""
+
+from datetime import UTC, datetime
+
+from .selector import compile_selector
+
+
+class VehicleSnapshot:
+    """Vehicle data indexed by vehicle id, and lamp states by lamp type.
+
+    Built once per fetch, so reads by entities are constant time regardless of
+    the number of vehicles and lamps on the account. Marked stale when served
+    after reading newer data failed.
+    """
+
+    def __init__(self, data, time=None) -> None:
+        """Initialize from a 'viewer.vehicles' response."""
+        self.data = data
+        self.time = time if time is not None else datetime.now(UTC)
+        # Served after reading newer data failed
+        self.stale = False
+        self._vehicles = {}
+        self._lamps = {}
+        for item in data["data"]["viewer"]["vehicles"]:
+            vehicle = item["vehicle"]
+            self._vehicles[vehicle["id"]] = vehicle
+            # Lamps decoded once: type -> (enabled, time of change)
+            lamps = {}
+            for lamp in vehicle.get("lampStates") or []:
+                lamps.setdefault(
+                    lamp["type"],
+                    (str(lamp.get("enabled")).lower() == "true", lamp.get("time")),
+                )
+            self._lamps[vehicle["id"]] = lamps
+
+    @property
+    def age(self):
+        """Time since the data was read."""
+        return datetime.now(UTC) - self.time
+
+    @property
+    def vehicles(self):
+        """All vehicles, in the order reported by the API."""
+        return self._vehicles.values()
+
+    def vehicle(self, vehicle_id):
+        """Get vehicle data, None if the vehicle is unknown."""
+        return self._vehicles.get(vehicle_id)
+
+    def values(self, vehicle_id, selectors):
+        """Read several values of a vehicle, {name: selector} to {name: value}.
+
+        Values of an unknown vehicle are all None.
+        """
+        vehicle = self._vehicles.get(vehicle_id)
+        return {
+            name: compile_selector(selector)(vehicle)
+            for name, selector in selectors.items()
+        }
+
+    def lamps(self, vehicle_id):
+        """Get lamp states of a vehicle, (enabled, time) keyed by lamp type."""
+        return self._lamps.get(vehicle_id, {})
+
+    def lamp(self, vehicle_id, lamptype):
+        """Get (enabled, time) of a single lamp, None if not reported."""
+        return self._lamps.get(vehicle_id, {}).get(lamptype)
+
+    def diff(self, previous):
+        """Get fields changed per vehicle since a previous snapshot.
+
+        Values and their timestamps are compared. All fields of vehicles new
+        since previous are changed.
+        """
+        changes = {}
+        for vehicle_id, vehicle in self._vehicles.items():
+            old = None if previous is None else previous.vehicle(vehicle_id)
+            if old is None:
+                changes[vehicle_id] = frozenset(vehicle)
+            elif old is vehicle:
+                changes[vehicle_id] = frozenset()
+            else:
+                changes[vehicle_id] = frozenset(
+                    key
+                    for key in vehicle.keys() | old.keys()
+                    if vehicle.get(key) is not old.get(key)
+                    and vehicle.get(key) != old.get(key)
+                )
+        return changes
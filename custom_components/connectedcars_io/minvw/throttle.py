@@ -0,0 +1,177 @@
+"""Rate limiting and circuit breaking of requests to a host."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+import random
+import time
+from urllib.parse import urlsplit
+
+from .errors import CircuitOpenError
+
+# Requests per second to a host, and requests allowed in a burst
+RATE_LIMIT = 2.0
+RATE_BURST = 20
+
+# Consecutive failures opening the circuit, and backoff while it is open.
+# Backoff doubles per failure up to max, with jitter so clients do not retry in
+# lockstep. A single probe is let through when it ends.
+BREAKER_THRESHOLD = 3
+BREAKER_BACKOFF = timedelta(seconds=30)
+BREAKER_BACKOFF_MAX = timedelta(minutes=30)
+BREAKER_PROBE_TIMEOUT = timedelta(minutes=1)
+
+
+class TokenBucket:
+    """Token bucket, refilled at rate tokens per second up to burst."""
+
+    __slots__ = ("rate", "burst", "_tokens", "_time")
+
+    def __init__(self, rate, burst) -> None:
+        """Initialize full, rate None is unlimited."""
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._time = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._time) * self.rate)
+        self._time = now
+
+    async def acquire(self) -> float:
+        """Take a token, waiting for one if needed. Returns seconds waited."""
+        if self.rate is None:
+            return 0.0
+        waited = 0.0
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return waited
+            delay = (1 - self._tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """Circuit breaker, opened by consecutive failures.
+
+    Closed: requests pass. Open: requests are rejected until retry_after.
+    Half open: after retry_after one probe passes, its outcome closes or opens
+    the circuit again.
+    """
+
+    __slots__ = ("threshold", "failures", "retry_after", "last_failure")
+
+    def __init__(self, threshold=BREAKER_THRESHOLD) -> None:
+        """Initialize closed."""
+        self.threshold = threshold
+        self.failures = 0
+        self.retry_after = None
+        self.last_failure = None
+
+    @property
+    def state(self) -> str:
+        """State of the circuit: closed, open or half_open."""
+        if self.retry_after is None:
+            return "closed"
+        if datetime.now(UTC) < self.retry_after:
+            return "open"
+        return "half_open"
+
+    def check(self):
+        """Raise CircuitOpenError unless a request may pass."""
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(self.retry_after)
+        if state == "half_open":
+            # Others are rejected while the probe is out, or until it times out
+            self.retry_after = datetime.now(UTC) + BREAKER_PROBE_TIMEOUT
+
+    def success(self):
+        """Record a successful request, closing the circuit."""
+        self.failures = 0
+        self.retry_after = None
+
+    def failure(self, error, retry_after: timedelta | None = None):
+        """Record a failed request, retry_after as requested by the server."""
+        self.failures += 1
+        self.last_failure = str(error) or type(error).__name__
+        delay = timedelta(0)
+        if self.failures >= self.threshold:
+            backoff = min(
+                BREAKER_BACKOFF * 2 ** (self.failures - self.threshold),
+                BREAKER_BACKOFF_MAX,
+            )
+            delay = backoff * random.uniform(0.5, 1.0)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if delay:
+            self.retry_after = datetime.now(UTC) + delay
+
+
+class HostThrottle:
+    """Rate limiter and circuit breaker shared by all requests to a host."""
+
+    def __init__(self, host, rate=RATE_LIMIT, burst=RATE_BURST) -> None:
+        """Initialize."""
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+        self.stats = {"requests": 0, "rejected": 0, "failures": 0, "waited": 0.0}
+
+    async def acquire(self):
+        """Wait for a request slot, CircuitOpenError is raised while open."""
+        try:
+            self.breaker.check()
+        except CircuitOpenError:
+            self.stats["rejected"] += 1
+            raise
+        self.stats["waited"] += await self.bucket.acquire()
+        self.stats["requests"] += 1
+
+    def success(self):
+        """Record a successful request."""
+        self.breaker.success()
+
+    def failure(self, error, retry_after: timedelta | None = None):
+        """Record a failed request."""
+        self.stats["failures"] += 1
+        self.breaker.failure(error, retry_after)
+
+    def diagnostics(self):
+        """State of the throttle, JSON serializable."""
+        breaker = self.breaker
+        return {
+            "host": self.host,
+            "state": breaker.state,
+            "consecutive_failures": breaker.failures,
+            "retry_after": (
+                None if breaker.retry_after is None else breaker.retry_after.isoformat()
+            ),
+            "last_failure": breaker.last_failure,
+            "rate_limit": self.bucket.rate,
+            "burst": self.bucket.burst,
+            **self.stats,
+            "waited": round(self.stats["waited"], 3),
+        }
+
+
+def retry_after(response) -> timedelta | None:
+    """Get delay requested by a Retry-After header in seconds, if any."""
+    try:
+        return timedelta(seconds=int(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
+
+
+_THROTTLES: dict[str, HostThrottle] = {}
+
+
+def get_throttle(url, rate=RATE_LIMIT, burst=RATE_BURST) -> HostThrottle:
+    """Get the throttle of the host of a URL, created on first use."""
+    host = urlsplit(url).netloc
+    throttle = _THROTTLES.get(host)
+    if throttle is None:
+        throttle = _THROTTLES[host] = HostThrottle(host, rate, burst)
+    return throttle
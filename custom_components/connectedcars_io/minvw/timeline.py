@@ -0,0 +1,92 @@
+"""Odometer readings of a vehicle over time."""
+
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+# Readings further apart than this are a gap, unless the car did not move
+MAX_INTERPOLATION_GAP = timedelta(hours=2)
+
+# Readings kept per vehicle, oldest are dropped
+MAX_READINGS = 10000
+
+
+def to_timestamp(value) -> float:
+    """Convert an API time to a POSIX timestamp."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value.timestamp()
+
+
+class OdometerTimeline:
+    """Time sorted odometer readings in compact arrays.
+
+    Odometer at a time is interpolated between the surrounding readings, and
+    unknown (None) where the timeline has a gap.
+    """
+
+    __slots__ = ("_times", "_odometers")
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._times = array("d")
+        self._odometers = array("d")
+
+    def __len__(self) -> int:
+        """Number of readings."""
+        return len(self._times)
+
+    def add(self, time, odometer):
+        """Add a reading, times may come in any order."""
+        if time is None or odometer is None:
+            return
+        timestamp = to_timestamp(time)
+        odometer = float(odometer)
+        times = self._times
+        index = bisect_left(times, timestamp)
+
+        if index < len(times) and times[index] == timestamp:
+            self._odometers[index] = odometer
+            return
+
+        # A parked car repeats its reading, extend the flat end instead
+        if (
+            index == len(times)
+            and index >= 2
+            and self._odometers[-1] == odometer
+            and self._odometers[-2] == odometer
+        ):
+            times[-1] = timestamp
+            return
+
+        times.insert(index, timestamp)
+        self._odometers.insert(index, odometer)
+        if len(times) > MAX_READINGS:
+            del times[0]
+            del self._odometers[0]
+
+    def add_trip(self, trip):
+        """Add start and end readings of a trip."""
+        self.add(trip.get("startTime"), trip.get("startOdometer"))
+        self.add(trip.get("endTime"), trip.get("endOdometer"))
+
+    def at(self, time):
+        """Get odometer at a time, None when not covered by readings."""
+        timestamp = to_timestamp(time)
+        times = self._times
+        index = bisect_left(times, timestamp)
+        if index < len(times) and times[index] == timestamp:
+            return self._odometers[index]
+        if index == 0 or index == len(times):
+            return None
+
+        before, after = times[index - 1], times[index]
+        odometer_before = self._odometers[index - 1]
+        odometer_after = self._odometers[index]
+        if odometer_before == odometer_after:
+            return odometer_before
+        if after - before > MAX_INTERPOLATION_GAP.total_seconds():
+            return None
+        return odometer_before + (odometer_after - odometer_before) * (
+            timestamp - before
+        ) / (after - before)
@@ -0,0 +1,97 @@
+"""Trip statistics of a vehicle in daily buckets."""
+
+from datetime import UTC, date, datetime, time, timedelta
+
+# Days of history kept, enough for a rolling year
+HISTORY_DAYS = 367
+
+# A day is final when read this long after it ended, late trips are included
+SETTLE_TIME = timedelta(hours=6)
+
+
+class DayStatistics:
+    """Trip statistics of one day (UTC)."""
+
+    __slots__ = ("mileage", "duration", "trips", "longest")
+
+    def __init__(self, mileage=0.0, duration=0.0, trips=0, longest=0.0) -> None:
+        """Initialize."""
+        self.mileage = mileage
+        self.duration = duration
+        self.trips = trips
+        self.longest = longest
+
+
+def day_start(day: date) -> datetime:
+    """Start of a day."""
+    return datetime.combine(day, time(), UTC)
+
+
+class TripStatistics:
+    """Daily trip statistics of a vehicle, summed locally over any window.
+
+    History is read once, after that only days not final yet are read.
+    """
+
+    def __init__(self, stored=None) -> None:
+        """Initialize, e.g. from days exported earlier."""
+        self._days = {}
+        self._final = set()
+        for day, values in (stored or {}).items():
+            day = date.fromisoformat(day)
+            *stats, final = values
+            self._days[day] = DayStatistics(*stats)
+            if final:
+                self._final.add(day)
+
+    def export(self):
+        """Days by ISO date, as mileage, duration, trips, longest and final."""
+        return {
+            day.isoformat(): [
+                stats.mileage,
+                stats.duration,
+                stats.trips,
+                stats.longest,
+                day in self._final,
+            ]
+            for day, stats in self._days.items()
+        }
+
+    def missing_days(self, now: datetime):
+        """Days to read, oldest first."""
+        today = now.date()
+        return [
+            today - timedelta(days=offset)
+            for offset in range(HISTORY_DAYS - 1, -1, -1)
+            if today - timedelta(days=offset) not in self._final
+        ]
+
+    def update(self, day: date, stats: DayStatistics, now: datetime):
+        """Store statistics of a day read at now."""
+        self._days[day] = stats
+        if now >= day_start(day) + timedelta(days=1) + SETTLE_TIME:
+            self._final.add(day)
+
+        # Forget days out of history
+        oldest = now.date() - timedelta(days=HISTORY_DAYS)
+        for old in [old for old in self._days if old < oldest]:
+            del self._days[old]
+            self._final.discard(old)
+
+    def window(self, first: date, last: date):
+        """Statistics summed over the days from first to last, both included.
+
+        Returns None when a day of the window has not been read.
+        """
+        total = DayStatistics()
+        day = first
+        while day <= last:
+            stats = self._days.get(day)
+            if stats is None:
+                return None
+            total.mileage += stats.mileage
+            total.duration += stats.duration
+            total.trips += stats.trips
+            total.longest = max(total.longest, stats.longest)
+            day += timedelta(days=1)
+        return total
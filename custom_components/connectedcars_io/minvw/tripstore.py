@@ -0,0 +1,116 @@
+"""Local store of vehicle trips in SQLite."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+import json
+import logging
+import sqlite3
+
+_LOGGER = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trips (
+    vehicle_id TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT,
+    start_odometer REAL,
+    end_odometer REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (vehicle_id, start_time)
+) WITHOUT ROWID;
+"""
+
+
+def format_time(value) -> str:
+    """Format a time as stored, sortable as text."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return (
+        value.astimezone(UTC).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+    )
+
+
+class TripStore:
+    """Trips of vehicles, indexed by start time.
+
+    SQLite is used from a single worker thread, the event loop never waits on
+    the disk.
+    """
+
+    def __init__(self, path) -> None:
+        """Initialize, the database is opened on first use."""
+        self._path = path
+        self._connection = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trips")
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, func, *args
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    async def add_trips(self, vehicle_id, trips):
+        """Add or replace trips of a vehicle."""
+        rows = [
+            (
+                str(vehicle_id),
+                format_time(trip["startTime"]),
+                trip.get("endTime"),
+                trip.get("startOdometer"),
+                trip.get("endOdometer"),
+                json.dumps(trip),
+            )
+            for trip in trips
+            if trip.get("startTime") is not None
+        ]
+        await self._run(self._add_trips, rows)
+
+    def _add_trips(self, rows):
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO trips VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+    async def last_start_time(self, vehicle_id):
+        """Start time of the latest stored trip, None without trips."""
+        return await self._run(
+            self._scalar,
+            "SELECT MAX(start_time) FROM trips WHERE vehicle_id = ?",
+            (str(vehicle_id),),
+        )
+
+    async def trip_at_time(self, vehicle_id, time):
+        """First trip starting at or after time."""
+        trips = await self._run(
+            self._trips,
+            "WHERE vehicle_id = ? AND start_time >= ? ORDER BY start_time LIMIT 1",
+            (str(vehicle_id), format_time(time)),
+        )
+        return trips[0] if trips else None
+
+    def _scalar(self, sql, params):
+        return self._connect().execute(sql, params).fetchone()[0]
+
+    def _trips(self, where, params):
+        return [
+            json.loads(data)
+            for (data,) in self._connect().execute(
+                f"SELECT data FROM trips {where}", params
+            )
+        ]
+
+    async def close(self):
+        """Close the database."""
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,57 @@
+"""Refresh phases of config entries, spread over the update interval."""
+
+from datetime import UTC, datetime, timedelta
+import random
+
+# Random offset added to each slot, so entries do not line up across restarts
+SLOT_JITTER = timedelta(seconds=5)
+
+
+class RefreshScheduler:
+    """Phase of each config entry within a period.
+
+    Entries start refreshing at their own phase, spread evenly over the
+    period, so requests to the API and the entity updates following them do
+    not all run at once. From then on each entry follows the cadence of its
+    data, e.g. faster while a car is driving, without snapping to its phase.
+    """
+
+    def __init__(self, period: timedelta) -> None:
+        """Initialize."""
+        self._period = period.total_seconds()
+        self._keys = []
+        self._phases = {}
+
+    def add(self, key):
+        """Add an entry, phases of all entries are spread again."""
+        if key not in self._keys:
+            self._keys.append(key)
+            self._spread()
+
+    def remove(self, key):
+        """Remove an entry."""
+        if key in self._keys:
+            self._keys.remove(key)
+            self._phases.pop(key, None)
+            self._spread()
+
+    def _spread(self):
+        slot = self._period / len(self._keys) if self._keys else self._period
+        jitter = min(SLOT_JITTER.total_seconds(), slot)
+        self._phases = {
+            key: index * slot + random.uniform(0, jitter)
+            for index, key in enumerate(self._keys)
+        }
+
+    def next_slot(self, key, earliest: datetime) -> datetime:
+        """First time at or after earliest in the phase of an entry."""
+        timestamp = earliest.timestamp()
+        phase = self._phases.get(key, 0.0)
+        return datetime.fromtimestamp(
+            timestamp + (phase - timestamp) % self._period, UTC
+        )
+
+    def delay(self, key) -> timedelta:
+        """Time until the next slot of an entry."""
+        now = datetime.now(UTC)
+        return self.next_slot(key, now) - now
@@ -1,6 +1,5 @@
 """Support for connectedcars.io / Min Volkswagen integration."""
 
-from datetime import UTC, datetime, timedelta, timezone
 import logging
 import traceback
 
@@ -22,16 +21,79 @@ from homeassistant.const import (
     UnitOfTemperature,
     UnitOfVolume,
 )
+from homeassistant.core import callback
 
 # from homeassistant.helpers.entity import Entity
 from homeassistant.exceptions import PlatformNotReady
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
+from .minvw import compile_selector
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(minutes=1)
+
+def _value_selectors(value, updated, **extra):
+    """Compile selectors for a sensor value and the time it was updated."""
+    selectors = {"state": value, "updated": updated, **extra}
+    return {name: compile_selector(sel) for name, sel in selectors.items()}
+
+
+# Vehicle data fields consumed per sensor, only fields of enabled sensors are read
+SENSOR_FIELDS = {
+    "outdoorTemperature": ("outdoorTemperatures",),
+    "BatteryVoltage": ("latestBatteryVoltage",),
+    "odometer": ("odometer",),
+    "fuelPercentage": ("fuelPercentage",),
+    "fuelLevel": ("fuelLevel",),
+    "fuel economy": ("fuelEconomy", "refuelEvents", "fuelLevel", "odometer"),
+    "NextServicePredicted": ("service",),
+    "EVchargePercentage": ("chargePercentage",),
+    "EVHVBattTemp": ("highVoltageBatteryTemperature",),
+    "Range": ("rangeTotalKm",),
+    "Speed": ("position",),
+    "mileage since refuel": ("refuelEvents", "odometer"),
+}
+
+# Sensors reading values directly from vehicle data, read in one call per update
+VALUE_SELECTORS = {
+    "outdoorTemperature": _value_selectors(
+        ["outdoorTemperatures", 0, "celsius"], ["outdoorTemperatures", 0, "time"]
+    ),
+    "BatteryVoltage": _value_selectors(
+        ["latestBatteryVoltage", "voltage"], ["latestBatteryVoltage", "time"]
+    ),
+    "fuelPercentage": _value_selectors(
+        ["fuelPercentage", "percent"], ["fuelPercentage", "time"]
+    ),
+    "fuelLevel": _value_selectors(["fuelLevel", "liter"], ["fuelLevel", "time"]),
+    "odometer": _value_selectors(["odometer", "odometer"], ["odometer", "time"]),
+    "Speed": _value_selectors(
+        ["position", "speed"],
+        ["position", "time"],
+        direction=["position", "direction"],
+    ),
+    "EVchargePercentage": _value_selectors(
+        ["chargePercentage", "pct"], ["chargePercentage", "time"]
+    ),
+    "EVHVBattTemp": _value_selectors(
+        ["highVoltageBatteryTemperature", "celsius"],
+        ["highVoltageBatteryTemperature", "time"],
+    ),
+    "Range": _value_selectors(["rangeTotalKm", "km"], ["rangeTotalKm", "time"]),
+}
+
+# Fuel economy reported by the API
+FUEL_ECONOMY_SELECTORS = {"state": compile_selector(["fuelEconomy"])}
+
+# Lookups run by the coordinator per sensor, sensors render their results
+SENSOR_LOOKUPS = {
+    "mileage latest year": "trip_statistics",
+    "mileage latest month": "trip_statistics",
+    "mileage since refuel": "refuels",
+    "fuel economy": "refuels",
+}
 
 
 async def async_setup_entry(
@@ -42,109 +104,71 @@ async def async_setup_entry(
     """Set up the Connectedcars_io sensor platform."""
     config = hass.data[DOMAIN][config_entry.entry_id]
 
-    _connectedcarsclient = config["connectedcarsclient"]
+    _coordinator = config["coordinator"]
 
     try:
         sensors = []
-        sensors_update_later = []
-        data = await _connectedcarsclient.get_vehicle_instances(True)
+        data = config["vehicles"]
         for vehicle in data:
             if "outdoorTemperature" in vehicle["has"]:
                 sensors.append(
-                    MinVwEntity(
-                        vehicle, "outdoorTemperature", True, _connectedcarsclient
-                    )
+                    MinVwEntity(vehicle, "outdoorTemperature", True, _coordinator)
                 )
             if "BatteryVoltage" in vehicle["has"]:
                 sensors.append(
-                    MinVwEntity(vehicle, "BatteryVoltage", True, _connectedcarsclient)
+                    MinVwEntity(vehicle, "BatteryVoltage", True, _coordinator)
                 )
             if "odometer" in vehicle["has"]:
-                sensors.append(
-                    MinVwEntity(vehicle, "odometer", True, _connectedcarsclient)
-                )
+                sensors.append(MinVwEntity(vehicle, "odometer", True, _coordinator))
             if "fuelPercentage" in vehicle["has"]:
                 sensors.append(
-                    MinVwEntity(vehicle, "fuelPercentage", True, _connectedcarsclient)
+                    MinVwEntity(vehicle, "fuelPercentage", True, _coordinator)
                 )
             if "fuelLevel" in vehicle["has"]:
+                sensors.append(MinVwEntity(vehicle, "fuelLevel", True, _coordinator))
+            if "fuelEconomy" in vehicle["has"] or "refuelEvents" in vehicle["has"]:
                 sensors.append(
-                    MinVwEntity(vehicle, "fuelLevel", True, _connectedcarsclient)
-                )
-            if "fuelEconomy" in vehicle["has"]:
-                sensors.append(
-                    MinVwEntity(vehicle, "fuel economy", False, _connectedcarsclient)
+                    MinVwEntity(vehicle, "fuel economy", False, _coordinator)
                 )
             if "NextServicePredicted" in vehicle["has"]:
                 sensors.append(
-                    MinVwEntity(
-                        vehicle, "NextServicePredicted", False, _connectedcarsclient
-                    )
+                    MinVwEntity(vehicle, "NextServicePredicted", False, _coordinator)
                 )
             if "EVchargePercentage" in vehicle["has"]:
                 sensors.append(
-                    MinVwEntity(
-                        vehicle, "EVchargePercentage", True, _connectedcarsclient
-                    )
+                    MinVwEntity(vehicle, "EVchargePercentage", True, _coordinator)
                 )
             if "EVHVBattTemp" in vehicle["has"]:
-                sensors.append(
-                    MinVwEntity(vehicle, "EVHVBattTemp", True, _connectedcarsclient)
-                )
+                sensors.append(MinVwEntity(vehicle, "EVHVBattTemp", True, _coordinator))
             if "RangeTotal" in vehicle["has"]:
-                sensors.append(
-                    MinVwEntity(vehicle, "Range", False, _connectedcarsclient)
-                )
+                sensors.append(MinVwEntity(vehicle, "Range", False, _coordinator))
             if "Speed" in vehicle["has"]:
-                sensors.append(
-                    MinVwEntity(vehicle, "Speed", True, _connectedcarsclient)
-                )
+                sensors.append(MinVwEntity(vehicle, "Speed", True, _coordinator))
             if "totalTripStatistics" in vehicle["has"]:
                 sensors.append(
-                    MinVwEntity(
-                        vehicle, "mileage latest year", False, _connectedcarsclient
-                    )
+                    MinVwEntity(vehicle, "mileage latest year", False, _coordinator)
                 )
                 sensors.append(
-                    MinVwEntity(
-                        vehicle, "mileage latest month", False, _connectedcarsclient
-                    )
-                )            
+                    MinVwEntity(vehicle, "mileage latest month", False, _coordinator)
+                )
             if (
                 "refuelEvents" in vehicle["has"]
                 and "trips" in vehicle["has"]
                 and "odometer" in vehicle["has"]
             ):
-                sensors_update_later.append(
+                sensors.append(
                     MinVwEntityRestore(
-                        vehicle, "mileage since refuel", False, _connectedcarsclient
+                        vehicle, "mileage since refuel", False, _coordinator
                     )
                 )
-            sensors.append(
-                    MinVwEntity(
-                        vehicle, "latest refresh", True, _connectedcarsclient
-                    )
-                )
-            
-        async_add_entities(sensors, update_before_add=True)
-        async_add_entities(sensors_update_later, update_before_add=False)
+            sensors.append(MinVwEntity(vehicle, "latest refresh", True, _coordinator))
+
+        async_add_entities(sensors)
 
     except Exception as err:
         _LOGGER.warning("Failed to add sensors: %s", err)
         _LOGGER.debug("%s", traceback.format_exc())
         raise PlatformNotReady from err
-    
-    async def handle_refresh_data_event(event):
-        """Handle button press event and refresh sensor data."""
-        vin = event.data["vin"]
-        _LOGGER.info("Received refresh event for VIN: %s", vin)
-        # Find and update the relevant sensor
-        for sensor in sensors:
-            if sensor.vehicle["vin"] == vin:
-                await sensor.async_update()
-                _LOGGER.info("Sensor updated for VIN: %s", vin)
-    
-    hass.bus.async_listen("connectedcars_refresh_data", handle_refresh_data_event)
 
     # Build array with devices to keep
     devices = [(DOMAIN, vehicle["vin"]) for vehicle in data]
@@ -163,15 +187,15 @@ async def async_setup_entry(
                 device_registry.async_remove_device(device_entry.id)
 
 
-class MinVwEntity(SensorEntity):
+class MinVwEntity(CoordinatorEntity, SensorEntity):
     """Representation of a Sensor."""
 
     def __init__(
-        self, vehicle, itemName, entity_registry_enabled_default, connectedcarsclient
+        self, vehicle, itemName, entity_registry_enabled_default, coordinator
     ) -> None:
         """Initialize the sensor."""
+        super().__init__(coordinator)
         self._state = None
-        self._data_date = None
         self._unit = None
         self._vehicle = vehicle
         self._itemName = itemName
@@ -182,7 +206,9 @@ class MinVwEntity(SensorEntity):
         )
         self._unique_id = f"{DOMAIN}-{self._vehicle['vin']}-{self._itemName}"
         self._device_class = None
-        self._connectedcarsclient = connectedcarsclient
+        self._connectedcarsclient = coordinator.client
+        self._fields = SENSOR_FIELDS.get(itemName, ())
+        self._lookup = SENSOR_LOOKUPS.get(itemName)
         self._entity_registry_enabled_default = entity_registry_enabled_default
         self._dict = {}
         self._updated = None
@@ -245,7 +271,7 @@ class MinVwEntity(SensorEntity):
             self._icon = "mdi:gas-station-outline"
             self._suggested_display_precision = 1
         elif self._itemName == "latest refresh":
-            self._device_class = SensorDeviceClass.DATE
+            self._device_class = SensorDeviceClass.TIMESTAMP
             self._icon = "mdi:clock"
         _LOGGER.debug("Adding sensor: %s", self._unique_id)
 
@@ -296,7 +322,7 @@ class MinVwEntity(SensorEntity):
     @property
     def available(self):
         """Availability."""
-        return self._state is not None
+        return super().available and self._state is not None
 
     @property
     def device_class(self):
@@ -327,189 +353,100 @@ class MinVwEntity(SensorEntity):
         """Return the suggested_display_precision."""
         return self._suggested_display_precision
 
-    async def async_update(self):
-        """Fetch new state data for the sensor.
+    async def async_added_to_hass(self):
+        """Handle entity which will be added."""
+        self._connectedcarsclient.register_fields(self._fields)
+        if self._lookup is not None:
+            # Run after each refresh, earlier results are shown until then
+            self.coordinator.register_lookup(self._lookup, self._vehicle["id"])
+        await super().async_added_to_hass()
+        self._update_state()
+
+    async def async_will_remove_from_hass(self):
+        """Handle entity which will be removed."""
+        await super().async_will_remove_from_hass()
+        self._connectedcarsclient.unregister_fields(self._fields)
+        if self._lookup is not None:
+            self.coordinator.unregister_lookup(self._lookup, self._vehicle["id"])
 
-        This is the only method that should fetch new data for Home Assistant.
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator, if consumed data changed.
+
+        Sensors of coordinator lookups are updated with every update, also
+        when only the lookups ran, as the lookups are retried then.
         """
-        # _LOGGER.debug(f"Setting status for {self._name}")
+        if self._lookup is None and not self.coordinator.fields_changed(
+            self._vehicle["id"], self._fields
+        ):
+            return
+        self._update_state()
+        self.async_write_ha_state()
 
-        if self._itemName == "outdoorTemperature":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["outdoorTemperatures", 0, "celsius"]
-            )
-            self._updated = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["outdoorTemperatures", 0, "time"]
-            )
-        if self._itemName == "BatteryVoltage":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["latestBatteryVoltage", "voltage"]
-            )
-            self._updated = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["latestBatteryVoltage", "time"]
-            )
-        if self._itemName == "fuelPercentage":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["fuelPercentage", "percent"]
-            )
-            self._updated = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["fuelPercentage", "time"]
-            )
-        if self._itemName == "fuelLevel":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["fuelLevel", "liter"]
-            )
-            self._updated = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["fuelLevel", "time"]
-            )
-        if self._itemName == "odometer":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["odometer", "odometer"]
-            )
-            self._updated = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["odometer", "time"]
+    @callback
+    def _update_state(self):
+        """Update state from vehicle data pushed by the coordinator."""
+        snapshot = self.coordinator.data
+        if snapshot is None:
+            return
+
+        if self._itemName in VALUE_SELECTORS:
+            values = snapshot.values(
+                self._vehicle["id"], VALUE_SELECTORS[self._itemName]
             )
+            self._state = values["state"]
+            self._updated = values["updated"]
+            if "direction" in values:
+                self._dict["Direction"] = values["direction"]
         if self._itemName == "NextServicePredicted":
-            self._state = (
-                await self._connectedcarsclient.get_next_service_data_predicted(
-                    self._vehicle["id"]
-                )
-            )
-        if self._itemName == "Speed":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["position", "speed"]
+            self._state = self._connectedcarsclient.next_service_predicted(
+                snapshot, self._vehicle["id"]
             )
-            self._dict["Direction"] = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["position", "direction"]
-            )
-            self._updated = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["position", "time"]
-            )
-        if self._itemName == "mileage latest year" and (
-            self._data_date is None
-            or datetime.now(UTC) >= self._data_date + timedelta(hours=1)
-        ):
+
+        if self._itemName == "mileage latest year":
             (
                 self._state,
                 self._dict,
-            ) = await self._connectedcarsclient.get_latest_years_mileage(
+            ) = self._connectedcarsclient.latest_years_mileage(
                 self._vehicle["id"], False
             )
-            if self._state is not None:
-                self._data_date = datetime.now(UTC)
-        if self._itemName == "mileage latest month" and (
-            self._data_date is None
-            or datetime.now(UTC) >= self._data_date + timedelta(hours=1)
-        ):
+        if self._itemName == "mileage latest month":
             (
                 self._state,
                 self._dict,
-            ) = await self._connectedcarsclient.get_latest_years_mileage(
+            ) = self._connectedcarsclient.latest_years_mileage(
                 self._vehicle["id"], True
             )
-            if self._state is not None:
-                self._data_date = datetime.now(UTC)
-        if self._itemName == "mileage since refuel":
-            self._state = None
 
-            refuel_event_time = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["refuelEvents", 0, "time"]
+        if self._itemName == "mileage since refuel":
+            (
+                self._state,
+                self._dict,
+            ) = self._connectedcarsclient.distance_since_refuel(
+                snapshot, self._vehicle["id"]
             )
-            valid_date = is_date_valid(refuel_event_time)
-            if valid_date:
-                # Has refuel timestamp changed?
-                if (
-                    "Refueled at" not in self._dict
-                    or self._dict["Refueled at"] is None
-                    or refuel_event_time != self._dict["Refueled at"]
-                ):
-                    _LOGGER.debug("Refuel event detected")
-                    self._dict["Refueled at"] = refuel_event_time
-                    self._dict["Odometer"] = None
-
-                # Do we have odometer value corresponding to refuel timestamp?
-                if "Odometer" not in self._dict or self._dict["Odometer"] is None:
-                    trip = await self._connectedcarsclient.get_trip_at_time(
-                        self._vehicle["id"], refuel_event_time
-                    )
-                    if (
-                        trip is not None
-                        and "startOdometer" in trip
-                        and trip["startOdometer"] is not None
-                    ):
-                        _LOGGER.debug(
-                            "Got odometer value at refuel event: %s",
-                            trip["startOdometer"],
-                        )
-                        self._dict["Odometer"] = trip["startOdometer"]
-
-            # Subtract refuel odometer from current odometer
-            if "Odometer" in self._dict and self._dict["Odometer"] is not None:
-                odometer_current = await self._connectedcarsclient.get_value(
-                    self._vehicle["id"], ["odometer", "odometer"]
-                )
-                if odometer_current is not None:
-                    distance_since_refuel = odometer_current - self._dict["Odometer"]
-                    if distance_since_refuel >= 0:
-                        self._state = distance_since_refuel
-
-            # ignition = (
-            #     str(
-            #         await self._connectedcarsclient.get_value(
-            #             self._vehicle["id"], ["ignition", "on"]
-            #         )
-            #     ).lower()
-            #     == "true"
-            # )
-            # try:
-            #     ignition_time = datetime.fromisoformat(
-            #         str(
-            #             await self._connectedcarsclient.get_value(
-            #                 self._vehicle["id"], ["ignition", "time"]
-            #             )
-            #         ).replace("Z", "+00:00")
-            #     )
-            # except Exception as err:  # pylint: disable=broad-except
-            #     _LOGGER.warning("Unable to parse ignition timestamp. Err: %s", err)
-            # _LOGGER.debug("ignition: %s, time: %s", ignition, ignition_time)
-
-            # if (
-            #     self._data_date is None
-            #     or datetime.utcnow() >= self._data_date + timedelta(hours=1)
-            #     or (
-            #         not ignition
-            #         and ignition_time > self._data_date.replace(tzinfo=timezone.utc)
-            #     )
-            # ):
-            #     (
-            #         self._state,
-            #         self._dict,
-            #     ) = await self._connectedcarsclient.get_mileage_since_refuel(
-            #         self._vehicle["id"]
-            #     )
-            #     _LOGGER.debug("5")
-            #     if self._state is not None:
-            #         self._data_date = datetime.utcnow()
 
         if self._itemName == "fuel economy":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["fuelEconomy"]
-            )
-            # if fuelEconomy is not None:
-            #     fuelEconomy = round(fuelEconomy, 1)
-            # self._state = fuelEconomy
+            (
+                self._state,
+                self._dict,
+            ) = self._connectedcarsclient.fuel_economy(snapshot, self._vehicle["id"])
+            if self._state is None:
+                # Reported by the API, until the refuel history covers a tank
+                self._state = snapshot.values(
+                    self._vehicle["id"], FUEL_ECONOMY_SELECTORS
+                )["state"]
+
+        if self._itemName == "latest refresh":
+            data_updated = self._connectedcarsclient.data_updated
+            self._state = data_updated.isoformat() if data_updated is not None else None
+            # Latest data is still served while reading it fails
+            self._dict["Stale"] = snapshot.stale
+            # Seconds since the data was read, when rendered
+            self._dict["Age"] = round(snapshot.age.total_seconds())
 
         # EV
-        if self._itemName = "latest refresh":
-            self._state = datetime.datetime.now();
-        if self._itemName == "EVchargePercentage":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["chargePercentage", "pct"]
-            )
-            self._updated = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["chargePercentage", "time"]
-            )
-
+        if self._itemName == "EVchargePercentage" and self._state is not None:
             batlevel = round(self._state / 10) * 10
             if batlevel == 100:
                 self._icon = "mdi:battery"
@@ -517,34 +454,6 @@ class MinVwEntity(SensorEntity):
                 self._icon = "mdi:battery-outline"
             else:
                 self._icon = f"mdi:battery-{batlevel}"
-        if self._itemName == "EVHVBattTemp":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["highVoltageBatteryTemperature", "celsius"]
-            )
-            self._updated = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["highVoltageBatteryTemperature", "time"]
-            )
-        if self._itemName == "Range":
-            self._state = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["rangeTotalKm", "km"]
-            )
-            self._updated = await self._connectedcarsclient.get_value(
-                self._vehicle["id"], ["rangeTotalKm", "time"]
-            )
-
-
-def is_date_valid(date) -> bool:
-    """Check date validity."""
-    valid_date = True
-    try:
-        valid_date = (
-            False
-            if (date is None)
-            else bool(datetime.strptime(date, "%Y-%m-%dT%H:%M:%S.%f%z"))
-        )
-    except ValueError:
-        valid_date = False
-    return valid_date
 
 
 class MinVwEntityRestore(MinVwEntity, RestoreSensor):
@@ -560,8 +469,6 @@ class MinVwEntityRestore(MinVwEntity, RestoreSensor):
 
     async def async_added_to_hass(self):
         """Handle entity which will be added."""
-        await super().async_added_to_hass()
-
         if (
             (last_state := await self.async_get_last_state()) is not None
             # and (extra_data := await self.async_get_last_sensor_data()) is not None
@@ -586,8 +493,8 @@ class MinVwEntityRestore(MinVwEntity, RestoreSensor):
                     self._dict[key] = last_state.attributes[key]
             _LOGGER.debug("State: %s, Attributes: %s", last_state.state, self._dict)
 
-        await MinVwEntity.async_update(self)
-        self.async_write_ha_state()
+        # Update from restored attributes
+        await super().async_added_to_hass()
 
     # async def async_get_last_sensor_data(self):
     #     """Restore Utility Meter Sensor Extra Stored Data."""
@@ -0,0 +1,44 @@
+"""Support for connectedcars.io / Min Volkswagen integration."""
+
+import logging
+
+from homeassistant import core
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+
+class ConnectedCarsStore:
+    """Data of a config entry kept across restarts, in named sections."""
+
+    def __init__(self, hass: core.HomeAssistant, entry_id: str) -> None:
+        """Initialize."""
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+        self._data = {}
+
+    async def async_load(self):
+        """Load stored data."""
+        try:
+            self._data = await self._store.async_load() or {}
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.warning("Failed to load stored data: %s", err)
+            self._data = {}
+
+    def get(self, section, default=None):
+        """Get a section of stored data."""
+        return self._data.get(section, default)
+
+    def set(self, section, value):
+        """Set a section of stored data, saved shortly after."""
+        self._data[section] = value
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+    async def async_remove(self):
+        """Remove stored data."""
+        self._data = {}
+        await self._store.async_remove()
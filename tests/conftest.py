@@ -0,0 +1,70 @@
+"""Fixtures for tests against the connectedcars.io stand-in."""
+
+import contextlib
+import json
+from pathlib import Path
+import sys
+
+from aiohttp import web
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tools"))
+
+import standin  # noqa: E402
+
+from custom_components.connectedcars_io.minvw import MinVW  # noqa: E402
+from custom_components.connectedcars_io.minvw.throttle import (  # noqa: E402
+    get_throttle,
+)
+
+FIXTURES = ROOT / "tools" / "fixtures"
+
+
+def load_fixture(name):
+    """Load a fixture of tools/fixtures, times shifted to end now."""
+    return standin.Fixture(json.loads((FIXTURES / name).read_text()))
+
+
+@contextlib.asynccontextmanager
+async def serve(fixture="ice.json", **faults):
+    """Run the stand-in on a free port, yielding it and its URL.
+
+    fixture is a file in tools/fixtures or a standin.Fixture, the latter to
+    serve the same times from several servers.
+    """
+    if not isinstance(fixture, standin.Fixture):
+        fixture = load_fixture(fixture)
+    server = standin.StandIn(fixture, faults=faults)
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield server, f"http://127.0.0.1:{port}/"
+    finally:
+        await runner.cleanup()
+
+
+@contextlib.asynccontextmanager
+async def client(fixture="ice.json", rate=None, **kwargs):
+    """Run the stand-in, yielding it and a MinVW pointed at it.
+
+    Each stand-in has its own port, so its own throttle. Rate limiting is off
+    unless a rate is given.
+    """
+    async with serve(fixture) as (server, url):
+        get_throttle(url, rate=rate)
+        minvw = MinVW(
+            "test@example.com",
+            "secret",
+            "minvolkswagen",
+            base_url_auth=url,
+            base_url_graph=url,
+            **kwargs,
+        )
+        try:
+            yield server, minvw
+        finally:
+            await minvw.close()
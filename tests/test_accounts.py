@@ -0,0 +1,34 @@
+"""Tests of accounts shared by config entries."""
+
+import asyncio
+from types import SimpleNamespace
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.connectedcars_io.accounts import AccountRegistry
+
+
+def _entry(entry_id, password="secret", email="test@example.com"):
+    return SimpleNamespace(
+        entry_id=entry_id,
+        data={"email": email, "password": password, "namespace": "minvolkswagen"},
+    )
+
+
+def test_accounts_keyed_on_credentials(tmp_path):
+    async def test():
+        hass = HomeAssistant(str(tmp_path))
+        accounts = AccountRegistry(hass)
+        first, second = _entry("1"), _entry("2", email=" Test@Example.com")
+        changed = _entry("3", password="changed")
+        assert accounts.acquire(first) is accounts.acquire(second)
+        assert accounts.acquire(changed) is not accounts.acquire(first)
+
+        # Released by the key it was acquired with, also after its data changed
+        changed.data = {**changed.data, "password": "again"}
+        for entry in (first, second, changed):
+            accounts.release(entry)
+        assert not accounts._accounts
+        await hass.async_stop(force=True)
+
+    asyncio.run(test())
@@ -0,0 +1,72 @@
+"""Tests of the coordinator refreshing vehicle data and running lookups."""
+
+import asyncio
+from datetime import timedelta
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.connectedcars_io.coordinator import ConnectedCarsCoordinator
+from custom_components.connectedcars_io.minvw.query import HOT_TTL_DRIVING
+
+from .conftest import client, load_fixture
+
+
+class _Store:
+    """Entry store kept in memory."""
+
+    def __init__(self) -> None:
+        self.sections = {}
+
+    def get(self, section):
+        return self.sections.get(section)
+
+    def set(self, section, value):
+        self.sections[section] = value
+
+
+def test_lookups_run_after_refresh(tmp_path):
+    async def test():
+        hass = HomeAssistant(str(tmp_path))
+        async with client(trip_store_path=str(tmp_path / "trips.db")) as (
+            server,
+            minvw,
+        ):
+            coordinator = ConnectedCarsCoordinator(hass, "test", minvw, _Store())
+            updates = []
+            coordinator.async_add_listener(lambda: updates.append(coordinator.data))
+
+            vehicle_id = next(iter((await minvw.get_vehicle_data()).vehicles))["id"]
+            coordinator.register_lookup("refuels", vehicle_id)
+            coordinator.register_lookup("trip_statistics", vehicle_id)
+            minvw.expire_data()
+            requests = server.stats["graphql"]
+
+            await coordinator.async_refresh()
+            # Only the vehicle data was read, lookups follow in the background
+            assert server.stats["graphql"] == requests + 1
+            assert minvw.fuel_economy(coordinator.data, vehicle_id)[0] is None
+            assert minvw.latest_years_mileage(vehicle_id, False)[0] is None
+            await coordinator._lookup_task
+            assert minvw.fuel_economy(coordinator.data, vehicle_id)[0] is not None
+            assert minvw.latest_years_mileage(vehicle_id, False)[0] is not None
+            # Entities were updated after the refresh, and after the lookups
+            assert len(updates) == 2
+            assert not coordinator.fields_changed(vehicle_id, ("refuelEvents",))
+        await hass.async_stop(force=True)
+
+    asyncio.run(test())
+
+
+def test_refresh_follows_driving_cadence(tmp_path):
+    async def test():
+        hass = HomeAssistant(str(tmp_path))
+        fixture = load_fixture("ice.json")
+        for vehicle in fixture.vehicles.values():
+            vehicle["ignition"] = {**vehicle["ignition"], "on": True}
+        async with client(fixture) as (server, minvw):
+            coordinator = ConnectedCarsCoordinator(hass, "test", minvw, _Store())
+            await coordinator.async_refresh()
+            assert coordinator.update_interval <= HOT_TTL_DRIVING + timedelta(seconds=1)
+        await hass.async_stop(force=True)
+
+    asyncio.run(test())
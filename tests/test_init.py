@@ -0,0 +1,87 @@
+"""Tests of the config entry setup helpers."""
+
+import asyncio
+from datetime import datetime
+import logging
+
+from custom_components.connectedcars_io import _merge_vehicles, _token_updated
+
+from .conftest import client
+
+
+class _Store:
+    """Entry store recording what is set."""
+
+    def __init__(self) -> None:
+        self.sections = {}
+
+    def set(self, section, value):
+        self.sections[section] = value
+
+
+def _vehicle(vehicle_id, has, lamps=()):
+    return {
+        "id": vehicle_id,
+        "vin": f"VIN{vehicle_id}",
+        "name": f"Car {vehicle_id}",
+        "make": "Volkswagen",
+        "model": "Golf",
+        "licensePlate": "XX12345",
+        "lampStates": list(lamps),
+        "has": list(has),
+    }
+
+
+def test_merge_unchanged():
+    stored = [_vehicle("1", ["odometer", "GeoLocation"], ["OilLamp"])]
+    vehicles, reload = _merge_vehicles(stored, [dict(stored[0])])
+    assert vehicles == stored
+    assert not reload
+
+
+def test_merge_vehicle_added_or_removed():
+    stored = [_vehicle("1", ["odometer"])]
+    discovered = [_vehicle("1", ["odometer"]), _vehicle("2", ["odometer"])]
+    assert _merge_vehicles(stored, discovered) == (discovered, True)
+    assert _merge_vehicles(discovered, stored) == (stored, True)
+
+
+def test_merge_capability_appears():
+    stored = [_vehicle("1", ["odometer"])]
+    vehicles, reload = _merge_vehicles(stored, [_vehicle("1", ["odometer", "Speed"])])
+    assert vehicles[0]["has"] == ["odometer", "Speed"]
+    assert reload
+
+    vehicles, reload = _merge_vehicles(stored, [_vehicle("1", ["odometer"], ["Abs"])])
+    assert vehicles[0]["lampStates"] == ["Abs"]
+    assert reload
+
+
+def test_merge_capability_disappears_is_kept(caplog):
+    caplog.set_level(logging.INFO)
+    stored = [_vehicle("1", ["odometer", "Speed"], ["Abs"])]
+    discovered = [_vehicle("1", ["odometer"])]
+    discovered[0]["name"] = "Renamed"
+    vehicles, reload = _merge_vehicles(stored, discovered)
+    assert vehicles[0]["has"] == ["odometer", "Speed"]
+    assert vehicles[0]["lampStates"] == ["Abs"]
+    assert vehicles[0]["name"] == "Renamed"
+    assert not reload
+    assert "no longer reports Speed" in caplog.text
+
+
+def test_login_stores_token():
+    async def test():
+        data = {"store": _Store()}
+        async with client(
+            token_listener=lambda token, expires: _token_updated(data, token, expires)
+        ) as (server, minvw):
+            await minvw.get_vehicle_data()
+            stored = data["store"].sections["token"]
+            assert stored["token"] in server.tokens
+            assert datetime.fromisoformat(stored["expires"]) == minvw._auth.expires
+
+            minvw._auth.reject(stored["token"])
+            assert data["store"].sections["token"] is None
+
+    asyncio.run(test())
@@ -0,0 +1,264 @@
+"""Tests of MinVW against the stand-in."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from custom_components.connectedcars_io.minvw import CircuitOpenError, ResponseError
+from custom_components.connectedcars_io.minvw.snapshot import VehicleSnapshot
+from custom_components.connectedcars_io.minvw.throttle import BREAKER_THRESHOLD
+
+from .conftest import client, load_fixture
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_vehicle_data_read_once_while_fresh():
+    async def test():
+        async with client("multi.json") as (server, minvw):
+            snapshot = await minvw.get_vehicle_data()
+            assert [v["id"] for v in snapshot.vehicles] == ["4001", "4002", "4003"]
+            assert server.stats["graphql"] == 1
+
+            await asyncio.gather(*(minvw.get_vehicle_data() for _ in range(10)))
+            for vehicle_id in ("4001", "4002", "4003"):
+                await minvw.get_value(vehicle_id, ["odometer", "odometer"])
+            assert server.stats["graphql"] == 1
+            assert server.stats["auth"] == 1
+
+    run(test())
+
+
+def test_concurrent_refresh_is_single_flight():
+    async def test():
+        async with client("multi.json") as (server, minvw):
+            await minvw.get_vehicle_data()
+            minvw.expire_data()
+            await asyncio.gather(*(minvw.get_vehicle_data() for _ in range(10)))
+            assert server.stats["graphql"] == 2
+
+    run(test())
+
+
+def test_rejected_token_logs_in_again():
+    async def test():
+        tokens = []
+        async with client(token_listener=lambda token, _: tokens.append(token)) as (
+            server,
+            minvw,
+        ):
+            await minvw.get_vehicle_data()
+            server.tokens.clear()
+            minvw.expire_data()
+            await minvw.get_vehicle_data()
+            assert server.stats["unauthorized"] == 1
+            assert server.stats["auth"] == 2
+            # Logged in, rejected, logged in again
+            assert len(tokens) == 3 and tokens[1] is None
+
+    run(test())
+
+
+def test_unconsumed_tier_expiry_sends_no_query():
+    async def test():
+        async with client("multi.json") as (server, minvw):
+            await minvw.get_vehicle_data()
+            minvw.register_fields(["odometer"])
+            minvw.select_registered_fields()
+            await minvw.get_vehicle_data()
+            requests = server.stats["graphql"]
+
+            # Only the warm tier expired, no warm field is consumed
+            minvw._tier_expires["warm"] = datetime.now(UTC) - timedelta(seconds=1)
+            minvw._data_expires = None
+            await minvw.get_vehicle_data()
+            assert server.stats["graphql"] == requests
+
+    run(test())
+
+
+def test_stale_snapshot_served_during_outage():
+    async def test():
+        async with client(max_staleness=timedelta(minutes=30)) as (server, minvw):
+            fresh = await minvw.get_vehicle_data()
+            vehicle_id = next(iter(fresh.vehicles))["id"]
+            minvw.expire_data()
+            server.faults.update(status=500, status_rate=1.0)
+
+            stale = await minvw.get_vehicle_data()
+            assert stale is fresh
+            assert stale.stale
+            requests = server.stats["graphql"]
+            for _ in range(10):
+                await minvw.get_value(vehicle_id, ["odometer", "odometer"])
+            assert server.stats["graphql"] == requests
+
+            server.faults.update(status=None, status_rate=0.0)
+            minvw.expire_data()
+            assert not (await minvw.get_vehicle_data()).stale
+
+    run(test())
+
+
+def test_without_staleness_errors_are_raised():
+    async def test():
+        async with client() as (server, minvw):
+            await minvw.get_vehicle_data()
+            minvw.expire_data()
+            server.faults.update(status=500, status_rate=1.0)
+            with pytest.raises(ResponseError):
+                await minvw.get_vehicle_data()
+
+    run(test())
+
+
+def test_breaker_opens_on_malformed_responses():
+    async def test():
+        async with client() as (server, minvw):
+            await minvw.get_vehicle_data()
+            server.faults.update(malformed_rate=1.0)
+            for _ in range(BREAKER_THRESHOLD):
+                minvw.expire_data()
+                with pytest.raises(ResponseError, match="Malformed"):
+                    await minvw.get_vehicle_data()
+
+            requests = server.stats["graphql"]
+            minvw.expire_data()
+            with pytest.raises(CircuitOpenError):
+                await minvw.get_vehicle_data()
+            assert await minvw.api_request("query { viewer { id } }") is None
+            assert server.stats["graphql"] == requests
+            assert minvw.diagnostics()["hosts"][0]["state"] == "open"
+
+    run(test())
+
+
+def test_fuel_economy_from_refuel_history(tmp_path):
+    async def test():
+        stored = {}
+        fixture = load_fixture("ice.json")
+        async with client(
+            fixture,
+            trip_store_path=str(tmp_path / "trips.db"),
+            refuel_listener=stored.update,
+        ) as (server, minvw):
+            vehicle_id = next(iter((await minvw.get_vehicle_data()).vehicles))["id"]
+            economy, attributes = await minvw.get_fuel_economy(vehicle_id)
+            assert economy == attributes["Tanks"][-1]["km/l"]
+            assert economy is not None
+            assert attributes["Current tank"]["km"] is not None
+            distance, attributes = await minvw.get_distance_since_refuel(vehicle_id)
+            odometer = await minvw.get_value(vehicle_id, ["odometer", "odometer"])
+            assert distance == odometer - attributes["Odometer"]
+
+            requests = server.stats["graphql"]
+            await minvw.get_fuel_economy(vehicle_id)
+            assert server.stats["graphql"] == requests
+
+        async with client(fixture) as (server, minvw):
+            minvw.restore_refuels(stored)
+            snapshot = await minvw.get_vehicle_data()
+            # Answered from the restored history, without updating it
+            assert minvw.fuel_economy(snapshot, vehicle_id)[0] == economy
+            assert (await minvw.get_fuel_economy(vehicle_id))[0] == economy
+            assert server.stats["graphql"] == 1
+
+    run(test())
+
+
+def test_trips_synced_into_store(tmp_path):
+    async def test():
+        fixture = load_fixture("ice.json")
+        async with client(fixture, trip_store_path=str(tmp_path / "trips.db")) as (
+            server,
+            minvw,
+        ):
+            vehicle_id = next(iter(fixture.vehicles))
+            trips = sorted(
+                fixture.vehicles[vehicle_id]["trips"]["items"],
+                key=lambda trip: trip["startTime"],
+            )
+            await minvw.get_vehicle_data()
+            trip = await minvw.get_trip_at_time(vehicle_id, trips[0]["startTime"])
+            assert trip["startTime"] == trips[0]["startTime"]
+
+            # Answered from the store once synced
+            requests = server.stats["graphql"]
+            trip = trips[len(trips) // 2]
+            stored = await minvw.get_trip_at_time(vehicle_id, trip["startTime"])
+            assert stored["startOdometer"] == trip["startOdometer"]
+            odometer = await minvw.get_odometer_at_time(vehicle_id, trip["startTime"])
+            assert odometer == trip["startOdometer"]
+            assert server.stats["graphql"] == requests
+
+    run(test())
+
+
+def test_discovery_in_one_request():
+    async def test():
+        async with client("multi.json") as (server, minvw):
+            vehicles = await minvw.get_vehicle_instances(True)
+            assert [vehicle["id"] for vehicle in vehicles] == ["4001", "4002", "4003"]
+            assert all(vehicle["has"] for vehicle in vehicles)
+            assert server.stats["graphql"] <= 3
+
+    run(test())
+
+
+def test_unregistered_fields_read_as_missing():
+    async def test():
+        async with client() as (server, minvw):
+            snapshot = VehicleSnapshot(
+                {"data": {"viewer": {"vehicles": [{"vehicle": {"id": "1"}}]}}}
+            )
+            # Leads and lamp states only read while an entity uses them
+            assert minvw.leads(snapshot, "1") == []
+            assert snapshot.lamps("1") == {}
+
+    run(test())
+
+
+def test_trip_statistics_restored_and_backed_off():
+    async def test():
+        stored = {}
+        fixture = load_fixture("ice.json")
+        async with client(
+            fixture,
+            trip_statistics_listener=lambda stats: stored.update(stats=stats),
+        ) as (server, minvw):
+            vehicle_id = next(iter(fixture.vehicles))
+            await minvw.get_vehicle_data()
+            requests = server.stats["graphql"]
+            year, attributes = await minvw.get_latest_years_mileage(vehicle_id, False)
+            assert year is not None
+            # A year of days in chunks
+            assert server.stats["graphql"] - requests > 1
+            assert vehicle_id in stored["stats"]
+
+        async with client(fixture) as (server, minvw):
+            minvw.restore_trip_statistics(stored["stats"])
+            await minvw.get_vehicle_data()
+            requests = server.stats["graphql"]
+            # Answered from the restored days, without reading them
+            assert minvw.latest_years_mileage(vehicle_id, False)[0] == year
+            assert server.stats["graphql"] == requests
+            assert await minvw.get_latest_years_mileage(vehicle_id, False) == (
+                year,
+                attributes,
+            )
+            # Only days not final yet
+            assert server.stats["graphql"] - requests == 1
+
+        async with client(fixture) as (server, minvw):
+            await minvw.get_vehicle_data()
+            server.faults.update(status=500, status_rate=1.0)
+            requests = server.stats["graphql"]
+            assert await minvw.get_trip_statistics(vehicle_id, timedelta(days=7)) is None
+            assert await minvw.get_trip_statistics(vehicle_id, timedelta(days=7)) is None
+            # Stopped at the first failed chunk, not retried until backoff ends
+            assert server.stats["graphql"] - requests == 1
+
+    run(test())
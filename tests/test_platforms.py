@@ -0,0 +1,77 @@
+"""Tests of entities rendering vehicle data pushed by the coordinator."""
+
+import asyncio
+from types import SimpleNamespace
+
+from custom_components.connectedcars_io.binary_sensor import CcBinaryEntity
+from custom_components.connectedcars_io.device_tracker import CcTrackerEntity
+from custom_components.connectedcars_io.sensor import MinVwEntity
+
+from .conftest import client
+
+
+def _entities(vehicle, coordinator):
+    return [
+        MinVwEntity(vehicle, "odometer", True, coordinator),
+        MinVwEntity(vehicle, "NextServicePredicted", False, coordinator),
+        MinVwEntity(vehicle, "latest refresh", True, coordinator),
+        MinVwEntity(vehicle, "fuel economy", False, coordinator),
+        CcBinaryEntity(vehicle, "Ignition", "", "moving", True, coordinator),
+        CcBinaryEntity(vehicle, "Health", "", "problem", True, coordinator, "all"),
+        CcBinaryEntity(vehicle, "Warning lamps", "", "problem", True, coordinator),
+        CcTrackerEntity(vehicle, "GeoLocation", coordinator),
+    ]
+
+
+def test_entities_render_without_requests():
+    async def test():
+        async with client() as (server, minvw):
+            snapshot = await minvw.get_vehicle_data()
+            vehicle = next(iter(snapshot.vehicles))
+            coordinator = SimpleNamespace(client=minvw, data=snapshot)
+            # Reading again would fail, entities only use the pushed snapshot
+            server.faults.update(status=500, status_rate=1.0)
+            minvw.expire_data()
+            requests = server.stats["graphql"]
+
+            entities = _entities({**vehicle, "name": "Golf", "vin": "VIN"}, coordinator)
+            for entity in entities:
+                entity._update_state()
+            sensor, service, refresh, economy, ignition, health, lamps, tracker = (
+                entities
+            )
+
+            assert sensor.state == vehicle["odometer"]["odometer"]
+            assert service.state is not None
+            assert refresh.state == minvw.data_updated.isoformat()
+            assert refresh.extra_state_attributes["Age"] >= 0
+            # Refuel history not read yet
+            assert economy.state == vehicle["fuelEconomy"]
+            assert ignition.is_on == vehicle["ignition"]["on"]
+            assert health.is_on == bool(vehicle["leads"])
+            assert lamps.is_on is not None
+            assert lamps.unique_id == "connectedcars_io-VIN-warning_lamps"
+            assert tracker.latitude == vehicle["position"]["latitude"]
+            assert server.stats["graphql"] == requests
+
+    asyncio.run(test())
+
+
+def test_lookup_sensor_updated_without_changes():
+    vehicle = {"id": "1", "make": "VW", "model": "Golf", "vin": "VIN"}
+    distances = iter([(None, {}), (12.5, {"Odometer": 1000.0})])
+    coordinator = SimpleNamespace(
+        client=SimpleNamespace(
+            distance_since_refuel=lambda snapshot, vehicle_id: next(distances)
+        ),
+        data=SimpleNamespace(),
+        fields_changed=lambda vehicle_id, fields: False,
+    )
+    writes = []
+    sensor = MinVwEntity(vehicle, "mileage since refuel", False, coordinator)
+    sensor.async_write_ha_state = lambda: writes.append(sensor.state)
+
+    # Lookup pending, then found after a retry while the car is parked
+    sensor._handle_coordinator_update()
+    sensor._handle_coordinator_update()
+    assert writes == [None, 12.5]
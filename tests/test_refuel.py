@@ -0,0 +1,65 @@
+"""Tests of the refuel history."""
+
+from custom_components.connectedcars_io.minvw.refuel import (
+    MAX_REFUELS,
+    RefuelHistory,
+    tank_economy,
+)
+
+
+def _event(day, before, after, odometer=None):
+    return {
+        "time": f"2026-09-{day:02d}T10:00:00.000Z",
+        "litersBefore": before,
+        "litersAfter": after,
+        "odometer": odometer,
+    }
+
+
+def test_sorted_and_deduplicated():
+    history = RefuelHistory([_event(20, 10, 50), _event(5, 8, 50)])
+    assert not history.add(_event(5, 8, 50))
+    assert not history.add({"time": "2026-09-30T10:00:00.000Z"})
+    assert [event["time"][:10] for event in history.events] == [
+        "2026-09-05",
+        "2026-09-20",
+    ]
+    assert history.latest["time"].startswith("2026-09-20")
+
+
+def test_capped():
+    history = RefuelHistory()
+    for day in range(1, 31):
+        for hour in range(2):
+            history.add(
+                {
+                    "time": f"2026-09-{day:02d}T1{hour}:00:00.000Z",
+                    "litersAfter": 50,
+                }
+            )
+    assert len(history) == MAX_REFUELS
+    assert history.latest["time"] == "2026-09-30T11:00:00.000Z"
+
+
+def test_tanks():
+    history = RefuelHistory(
+        [_event(1, 10, 50, 1000), _event(15, 10, 50, 1600), _event(29, 5, 50, None)]
+    )
+    first, second = history.tanks()
+    assert first == {
+        "from": "2026-09-01T10:00:00.000Z",
+        "to": "2026-09-15T10:00:00.000Z",
+        "liters": 40,
+        "km": 600,
+        "km/l": 15.0,
+    }
+    # Odometer at the refuel not known yet
+    assert second["liters"] == 45
+    assert second["km"] is None
+    assert second["km/l"] is None
+
+
+def test_current_tank():
+    tank = tank_economy(_event(1, 10, 50, 1000), "2026-09-05T10:00:00.000Z", 30, 1300)
+    assert tank["liters"] == 20
+    assert tank["km/l"] == 15.0
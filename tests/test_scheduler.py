@@ -0,0 +1,43 @@
+"""Tests of the refresh scheduler."""
+
+from datetime import UTC, datetime, timedelta
+
+from custom_components.connectedcars_io.scheduler import SLOT_JITTER, RefreshScheduler
+
+PERIOD = timedelta(minutes=1)
+
+
+def _phase(scheduler, key):
+    return scheduler.next_slot(key, datetime(2026, 1, 1, tzinfo=UTC)).second
+
+
+def test_entries_spread_over_period():
+    scheduler = RefreshScheduler(PERIOD)
+    for key in "abcd":
+        scheduler.add(key)
+    phases = [scheduler._phases[key] for key in "abcd"]
+    for index, phase in enumerate(phases):
+        assert index * 15 <= phase <= index * 15 + SLOT_JITTER.total_seconds()
+
+
+def test_next_slot_keeps_phase():
+    scheduler = RefreshScheduler(PERIOD)
+    scheduler.add("a")
+    scheduler.add("b")
+    now = datetime.now(UTC)
+    phase = scheduler.next_slot("b", now).timestamp() % 60
+    for seconds in range(0, 600, 7):
+        earliest = now + timedelta(seconds=seconds)
+        slot = scheduler.next_slot("b", earliest)
+        assert earliest <= slot < earliest + PERIOD
+        assert abs(slot.timestamp() % 60 - phase) < 1e-3
+
+
+def test_remove_respreads():
+    scheduler = RefreshScheduler(PERIOD)
+    scheduler.add("a")
+    scheduler.add("b")
+    scheduler.remove("a")
+    assert list(scheduler._phases) == ["b"]
+    assert scheduler._phases["b"] <= SLOT_JITTER.total_seconds()
+    assert timedelta(0) <= scheduler.delay("b") < PERIOD
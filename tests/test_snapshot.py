@@ -0,0 +1,53 @@
+"""Tests of vehicle snapshots."""
+
+from custom_components.connectedcars_io.minvw.snapshot import VehicleSnapshot
+
+
+def _snapshot(*vehicles):
+    return VehicleSnapshot(
+        {"data": {"viewer": {"vehicles": [{"vehicle": v} for v in vehicles]}}}
+    )
+
+
+def test_lookup_and_lamps():
+    snapshot = _snapshot(
+        {
+            "id": "1",
+            "lampStates": [
+                {"type": "Engine", "enabled": True, "time": "t1"},
+                {"type": "Engine", "enabled": False, "time": "t0"},
+                {"type": "Oil", "enabled": "false", "time": "t2"},
+            ],
+        }
+    )
+    assert snapshot.vehicle("1")["id"] == "1"
+    assert snapshot.vehicle("2") is None
+    assert snapshot.lamps("1") == {"Engine": (True, "t1"), "Oil": (False, "t2")}
+    assert snapshot.lamp("1", "Oil") == (False, "t2")
+    assert snapshot.lamp("2", "Oil") is None
+
+
+def test_values():
+    snapshot = _snapshot({"id": "1", "odometer": {"odometer": 100, "time": "t0"}})
+    selectors = {"state": ["odometer", "odometer"], "updated": ["odometer", "time"]}
+    assert snapshot.values("1", selectors) == {"state": 100, "updated": "t0"}
+    assert snapshot.values("2", selectors) == {"state": None, "updated": None}
+
+
+def test_diff():
+    odometer = {"odometer": 100, "time": "t0"}
+    previous = _snapshot({"id": "1", "odometer": odometer, "name": "a"})
+    current = _snapshot(
+        {"id": "1", "odometer": dict(odometer), "name": "b", "fuelLevel": {}},
+        {"id": "2", "name": "c"},
+    )
+    assert current.diff(previous) == {
+        "1": frozenset({"name", "fuelLevel"}),
+        "2": frozenset({"id", "name"}),
+    }
+    assert current.diff(None)["1"] == frozenset({"id", "odometer", "name", "fuelLevel"})
+
+
+def test_diff_same_vehicle():
+    vehicle = {"id": "1", "name": "a"}
+    assert _snapshot(vehicle).diff(_snapshot(vehicle)) == {"1": frozenset()}
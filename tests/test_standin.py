@@ -0,0 +1,62 @@
+"""Tests of the stand-in's GraphQL subset."""
+
+import json
+
+import pytest
+import standin
+
+from .conftest import FIXTURES
+
+
+@pytest.fixture
+def fixture():
+    return standin.Fixture(json.loads((FIXTURES / "multi.json").read_text()))
+
+
+def test_viewer_vehicles(fixture):
+    result = fixture.execute("query { viewer { vehicles { vehicle { id name } } } }")
+    ids = [item["vehicle"]["id"] for item in result["data"]["viewer"]["vehicles"]]
+    assert ids == ["4001", "4002", "4003"]
+
+
+def test_aliased_vehicles(fixture):
+    result = fixture.execute(
+        "query Vehicles { v0: vehicle(id: 4001) { id } v1: vehicle(id: 9) { id } }"
+    )
+    assert result == {"data": {"v0": {"id": "4001"}, "v1": None}}
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["query Vehicles {\n\n}", "{ viewer { } }", "{ vehicle(id: 4001) { id odometer {} } }"],
+)
+def test_empty_selection_set_rejected(fixture, query):
+    with pytest.raises(ValueError, match="Expected Name"):
+        fixture.execute(query)
+
+
+def test_recorder_merges_aliased_vehicles(tmp_path):
+    recorder = standin.Recorder(tmp_path / "recorded.json")
+    trip = {"startTime": "2026-01-01T08:00:00.000Z", "mileage": 12.0}
+    later = {"startTime": "2026-01-02T08:00:00.000Z", "mileage": 3.0}
+    recorder.capture(
+        {"data": {"v0": {"id": "4001", "fuelLevel": {"liter": 20}}}},
+        "query Vehicles { v0: vehicle(id: 4001) { id fuelLevel { liter } } }",
+    )
+    recorder.capture(
+        {"data": {"vehicle": {"trips": {"items": [later]}}}},
+        'query Trips { vehicle(id: 4001) { trips(fromTime: "x", first: 1) '
+        "{ items { startTime mileage } } } }",
+    )
+    recorder.capture(
+        {"data": {"v0": {"trips": {"items": [trip]}, "d0": {"numberTrips": 1}}}},
+        "query { v0: vehicle(id: 4001) { trips { items { startTime } } "
+        "d0: totalTripStatistics { numberTrips } } }",
+    )
+    vehicles = json.loads((tmp_path / "recorded.json").read_text())["vehicles"]
+    assert len(vehicles) == 1
+    assert vehicles[0]["fuelLevel"] == {"liter": 20}
+    # Pages merged in order, statistics are computed from trips when served
+    assert vehicles[0]["trips"] == {"items": [trip, later]}
+    assert "d0" not in vehicles[0]
+    assert "totalTripStatistics" not in vehicles[0]
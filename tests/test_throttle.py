@@ -0,0 +1,81 @@
+"""Tests of rate limiting and circuit breaking."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from custom_components.connectedcars_io.minvw import CircuitOpenError
+from custom_components.connectedcars_io.minvw.throttle import (
+    BREAKER_BACKOFF,
+    BREAKER_THRESHOLD,
+    CircuitBreaker,
+    HostThrottle,
+    TokenBucket,
+)
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_THRESHOLD - 1):
+        breaker.failure(ValueError("boom"))
+        breaker.check()
+    assert breaker.state == "closed"
+
+    breaker.failure(ValueError("boom"))
+    assert breaker.state == "open"
+    assert breaker.last_failure == "boom"
+    delay = breaker.retry_after - datetime.now(UTC)
+    assert BREAKER_BACKOFF / 2 - timedelta(seconds=1) <= delay <= BREAKER_BACKOFF
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_backoff_doubles():
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_THRESHOLD + 2):
+        breaker.failure(ValueError())
+    delay = breaker.retry_after - datetime.now(UTC)
+    assert delay > BREAKER_BACKOFF * 2 - timedelta(seconds=1)
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_THRESHOLD):
+        breaker.failure(ValueError())
+    breaker.retry_after = datetime.now(UTC) - timedelta(seconds=1)
+    assert breaker.state == "half_open"
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_retry_after_honored_below_threshold():
+    breaker = CircuitBreaker()
+    breaker.failure(ValueError(), timedelta(minutes=5))
+    assert breaker.state == "open"
+    assert breaker.retry_after > datetime.now(UTC) + timedelta(minutes=4)
+
+
+def test_bucket_waits_when_empty():
+    async def take(bucket, count):
+        return sum([await bucket.acquire() for _ in range(count)])
+
+    assert asyncio.run(take(TokenBucket(None, 1), 10)) == 0
+    assert asyncio.run(take(TokenBucket(100.0, 2), 2)) == 0
+    assert asyncio.run(take(TokenBucket(100.0, 2), 4)) > 0.01
+
+
+def test_throttle_rejects_while_open():
+    throttle = HostThrottle("example.com", rate=None)
+    for _ in range(BREAKER_THRESHOLD):
+        throttle.failure(ValueError("down"))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(throttle.acquire())
+    diagnostics = throttle.diagnostics()
+    assert diagnostics["state"] == "open"
+    assert diagnostics["rejected"] == 1
+    assert diagnostics["failures"] == BREAKER_THRESHOLD
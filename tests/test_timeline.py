@@ -0,0 +1,51 @@
+"""Tests of the odometer timeline."""
+
+from custom_components.connectedcars_io.minvw.timeline import OdometerTimeline
+
+
+def test_exact_and_interpolated():
+    timeline = OdometerTimeline()
+    timeline.add("2026-10-01T10:00:00.000Z", 100)
+    timeline.add("2026-10-01T11:00:00.000Z", 160)
+    assert timeline.at("2026-10-01T10:00:00.000Z") == 100
+    assert timeline.at("2026-10-01T10:30:00.000Z") == 130
+
+
+def test_out_of_order_and_outside():
+    timeline = OdometerTimeline()
+    timeline.add("2026-10-01T11:00:00.000Z", 160)
+    timeline.add("2026-10-01T10:00:00.000Z", 100)
+    assert timeline.at("2026-10-01T10:15:00.000Z") == 115
+    assert timeline.at("2026-10-01T09:00:00.000Z") is None
+    assert timeline.at("2026-10-01T12:00:00.000Z") is None
+
+
+def test_gap_unknown_unless_parked():
+    timeline = OdometerTimeline()
+    timeline.add("2026-10-01T10:00:00.000Z", 100)
+    timeline.add("2026-10-01T20:00:00.000Z", 300)
+    assert timeline.at("2026-10-01T15:00:00.000Z") is None
+
+    timeline.add("2026-10-02T20:00:00.000Z", 300)
+    assert timeline.at("2026-10-02T08:00:00.000Z") == 300
+
+
+def test_parked_readings_extend_flat_end():
+    timeline = OdometerTimeline()
+    for hour in range(10, 20):
+        timeline.add(f"2026-10-01T{hour}:00:00.000Z", 100)
+    assert len(timeline) == 2
+    assert timeline.at("2026-10-01T15:00:00.000Z") == 100
+
+
+def test_trip_readings():
+    timeline = OdometerTimeline()
+    timeline.add_trip(
+        {
+            "startTime": "2026-10-01T10:00:00.000Z",
+            "endTime": "2026-10-01T10:20:00.000Z",
+            "startOdometer": 100,
+            "endOdometer": 120,
+        }
+    )
+    assert timeline.at("2026-10-01T10:10:00.000Z") == 110
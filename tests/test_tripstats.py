@@ -0,0 +1,63 @@
+"""Tests of daily trip statistics."""
+
+from datetime import UTC, date, datetime, timedelta
+
+from custom_components.connectedcars_io.minvw.tripstats import (
+    HISTORY_DAYS,
+    DayStatistics,
+    TripStatistics,
+)
+
+NOW = datetime(2026, 10, 18, 12, tzinfo=UTC)
+TODAY = NOW.date()
+
+
+def _filled():
+    stats = TripStatistics()
+    for day in stats.missing_days(NOW):
+        stats.update(day, DayStatistics(10.0, 20.0, 2, day.day), NOW)
+    return stats
+
+
+def test_backfill_then_only_recent_days():
+    stats = TripStatistics()
+    assert len(stats.missing_days(NOW)) == HISTORY_DAYS
+    stats = _filled()
+    # Yesterday settled in the morning, today is read until it settles
+    assert stats.missing_days(NOW) == [TODAY]
+    assert stats.missing_days(NOW + timedelta(hours=13)) == [
+        TODAY,
+        TODAY + timedelta(days=1),
+    ]
+
+
+def test_window_sums():
+    stats = _filled()
+    week = stats.window(TODAY - timedelta(days=6), TODAY)
+    assert week.mileage == 70.0
+    assert week.trips == 14
+    assert week.longest == max(
+        (TODAY - timedelta(days=offset)).day for offset in range(7)
+    )
+
+
+def test_window_with_missing_day():
+    stats = TripStatistics()
+    stats.update(TODAY, DayStatistics(1.0), NOW)
+    assert stats.window(TODAY, TODAY).mileage == 1.0
+    assert stats.window(TODAY - timedelta(days=1), TODAY) is None
+
+
+def test_old_days_forgotten():
+    stats = _filled()
+    later = NOW + timedelta(days=30)
+    stats.update(later.date(), DayStatistics(), later)
+    assert stats.window(date(2025, 10, 18), date(2025, 10, 18)) is None
+
+
+def test_export_restore():
+    stats = _filled()
+    restored = TripStatistics(stats.export())
+    assert restored.missing_days(NOW) == [TODAY]
+    week = restored.window(TODAY - timedelta(days=6), TODAY)
+    assert (week.mileage, week.trips) == (70.0, 14)
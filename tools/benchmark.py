@@ -0,0 +1,329 @@
+"""Benchmarks of the MinVW client and the entity update path.
+
+Synthetic fleets of 1, 10, 100 and 1,000 vehicles are served by the local
+stand-in server. For each fleet size the following are measured:
+
+    fetch                  snapshot read from the API (cold start, incl. login)
+    get_vehicle_instances  discovery from cached data
+    discovery (+params)    discovery incl. additional parameter queries
+    get_value              ten values of every vehicle
+    get_leads              leads of every vehicle
+    get_lampstatus         every lamp of every vehicle
+    <platform> cycle       refresh, then the coordinator update fanned out to
+                           all entities of a platform, vehicles with ignition
+                           on move between cycles (needs Home Assistant)
+
+Reported per operation: wall time (mean of the cycles), memory allocated
+(peak, traced in a separate run), time spent waiting on MinVW locks and
+requests issued per cycle.
+
+Usage:
+    python tools/benchmark.py [--sizes 1 10 100 1000] [--cycles 5] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).parent))
+
+import fleet  # noqa: E402
+import standin  # noqa: E402
+
+try:
+    sys.path.insert(0, str(ROOT))
+    from homeassistant.helpers import (  # noqa: E402
+        device_registry as dr,
+        entity_registry as er,
+    )
+
+    from custom_components.connectedcars_io import (  # noqa: E402
+        binary_sensor,
+        device_tracker,
+        sensor,
+    )
+    from custom_components.connectedcars_io.const import (  # noqa: E402
+        CONF_HEALTH_SENSITIVITY,
+        CONF_LAMP_ENTITIES,
+        DOMAIN,
+    )
+    from custom_components.connectedcars_io.coordinator import (  # noqa: E402
+        ConnectedCarsCoordinator,
+    )
+    from custom_components.connectedcars_io.minvw import MinVW  # noqa: E402
+    from custom_components.connectedcars_io.minvw.throttle import (  # noqa: E402
+        get_throttle,
+    )
+
+    PLATFORMS = {
+        "sensor": sensor,
+        "binary_sensor": binary_sensor,
+        "device_tracker": device_tracker,
+    }
+except ImportError:
+    # Home Assistant not installed, benchmark the client only
+    sys.path.insert(0, str(ROOT / "custom_components" / "connectedcars_io"))
+    from minvw import MinVW  # noqa: E402
+    from minvw.throttle import get_throttle  # noqa: E402
+
+    PLATFORMS = {}
+
+SELECTORS = [
+    ["odometer", "odometer"],
+    ["odometer", "time"],
+    ["fuelLevel", "liter"],
+    ["chargePercentage", "pct"],
+    ["position", "latitude"],
+    ["position", "longitude"],
+    ["position", "speed"],
+    ["ignition", "on"],
+    ["outdoorTemperatures", 0, "celsius"],
+    ["latestBatteryVoltage", "voltage"],
+]
+
+
+class TimedLock(asyncio.Lock):
+    """Lock recording time spent waiting to acquire it."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        super().__init__()
+        self.wait_time = 0.0
+
+    async def acquire(self):
+        """Acquire, recording the wait."""
+        start = time.perf_counter()
+        try:
+            return await super().acquire()
+        finally:
+            self.wait_time += time.perf_counter() - start
+
+
+class Coordinator:
+    """Coordinator without Home Assistant, updating as ConnectedCarsCoordinator."""
+
+    fields_changed = ConnectedCarsCoordinator.fields_changed if PLATFORMS else None
+
+    def __init__(self, client) -> None:
+        """Initialize."""
+        self.client = client
+        self.data = None
+        self._changes = None
+        self.last_update_success = True
+
+    async def refresh(self):
+        """Read vehicle data, recording the changes since the last refresh."""
+        data = await self.client.get_vehicle_data()
+        self._changes = data.diff(self.data) if self.data is not None else None
+        self.data = data
+
+
+class Bench:
+    """Benchmark of one fleet size."""
+
+    def __init__(self, size, cycles, latency) -> None:
+        """Initialize."""
+        self.size = size
+        self.cycles = cycles
+        self.latency = latency
+        self.results = []
+
+    async def run(self):
+        """Run all measurements."""
+        fixture = standin.Fixture(fleet.make_fleet(self.size), shift_time=False)
+        self.server = standin.StandIn(fixture, faults={"latency": self.latency})
+        runner = web.AppRunner(self.server.app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/"
+        # Measure the client, not the rate limit
+        get_throttle(url, rate=None)
+        self.client = MinVW(
+            "bench@example.com",
+            "secret",
+            "minvolkswagen",
+            base_url_auth=url,
+            base_url_graph=url,
+        )
+        self.locks = {"snapshot": TimedLock(), "token": TimedLock()}
+        self.client._lock_snapshot = self.locks["snapshot"]
+        self.client._auth._lock = self.locks["token"]
+
+        try:
+            await self.measure("fetch", self.fetch, cycles=1)
+            vehicles = await self.client.get_vehicle_instances()
+            ids = [vehicle["id"] for vehicle in vehicles]
+            await self.measure(
+                "get_vehicle_instances", self.client.get_vehicle_instances
+            )
+            if self.size <= 100:
+                await self.measure(
+                    "discovery (+params)",
+                    lambda: self.client.get_vehicle_instances(True),
+                    cycles=1,
+                )
+            await self.measure("get_value", lambda: self.get_values(ids))
+            await self.measure("get_leads", lambda: self.get_leads(ids))
+            await self.measure("get_lampstatus", lambda: self.get_lamps(vehicles))
+            for name, module in PLATFORMS.items():
+                platform = await self.platform_entities(module)
+                await self.measure(
+                    f"{name} cycle ({len(platform[1])})",
+                    lambda platform=platform: self.platform_cycle(*platform),
+                )
+        finally:
+            await self.client.close()
+            await runner.cleanup()
+
+    async def fetch(self):
+        """Read snapshot from the API."""
+        self.client.expire_data()
+        await self.client.get_vehicle_data()
+
+    async def get_values(self, ids):
+        """Read values of every vehicle."""
+        for vehicle_id in ids:
+            for selector in SELECTORS:
+                await self.client.get_value(vehicle_id, selector)
+
+    async def get_leads(self, ids):
+        """Read leads of every vehicle."""
+        for vehicle_id in ids:
+            await self.client.get_leads(vehicle_id)
+
+    async def get_lamps(self, vehicles):
+        """Read every lamp of every vehicle."""
+        for vehicle in vehicles:
+            for lamp in vehicle["lampStates"]:
+                await self.client.get_lampstatus(vehicle["id"], lamp)
+
+    async def platform_entities(self, module):
+        """Set up a platform, collecting its entities."""
+        coordinator = Coordinator(self.client)
+        await coordinator.refresh()
+        vehicles = await self.client.get_vehicle_instances(self.size <= 100)
+        entry = SimpleNamespace(entry_id="bench", options={}, data={})
+        hass = SimpleNamespace(
+            data={
+                DOMAIN: {
+                    "bench": {
+                        "coordinator": coordinator,
+                        "connectedcarsclient": self.client,
+                        "vehicles": vehicles,
+                        CONF_HEALTH_SENSITIVITY: "medium",
+                        CONF_LAMP_ENTITIES: "both",
+                    }
+                }
+            }
+        )
+        entities = []
+        try:
+            await module.async_setup_entry(hass, entry, entities.extend)
+        except KeyError as err:
+            # Registry cleanup after adding entities needs a running Home Assistant
+            if not entities or err.args[0] not in (
+                dr.DATA_REGISTRY,
+                er.DATA_REGISTRY,
+            ):
+                raise
+
+        # Lookups are scheduled as tasks, state writes are not measured
+        tasks = []
+        entity_hass = SimpleNamespace(data=hass.data, async_create_task=tasks.append)
+        for entity in entities:
+            entity.hass = entity_hass
+            entity.async_write_ha_state = lambda: None
+            entity._update_state()
+        return coordinator, entities, tasks
+
+    def drive(self):
+        """Move vehicles with ignition on, as reported between refreshes."""
+        for vehicle in self.server.fixture.vehicles.values():
+            if vehicle["ignition"]["on"]:
+                position = vehicle["position"]
+                vehicle["position"] = {
+                    **position,
+                    "latitude": round(position["latitude"] + 0.001, 5),
+                }
+
+    async def platform_cycle(self, coordinator, entities, tasks):
+        """One coordinator refresh, updating entities whose fields changed."""
+        self.drive()
+        self.client.expire_data()
+        await coordinator.refresh()
+        for entity in entities:
+            entity._handle_coordinator_update()
+        await asyncio.gather(*tasks)
+        tasks.clear()
+
+    async def measure(self, name, func, cycles=None):
+        """Measure wall time, allocations, lock waits and requests of func."""
+        cycles = cycles or self.cycles
+        for lock in self.locks.values():
+            lock.wait_time = 0.0
+        stats = dict(self.server.stats)
+
+        start = time.perf_counter()
+        for _ in range(cycles):
+            await func()
+        wall = (time.perf_counter() - start) / cycles
+
+        requests = (
+            self.server.stats["graphql"]
+            + self.server.stats["auth"]
+            - stats["graphql"]
+            - stats["auth"]
+        ) / cycles
+        lock_wait = sum(lock.wait_time for lock in self.locks.values()) / cycles
+
+        tracemalloc.start()
+        await func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.results.append((name, wall, peak, lock_wait, requests))
+
+
+def report(size, results):
+    """Print results of a fleet size."""
+    print(f"\n{size} vehicle(s)")
+    print(
+        f"  {'operation':<28}{'wall ms':>10}{'alloc KiB':>12}"
+        f"{'lock ms':>10}{'requests':>10}"
+    )
+    for name, wall, peak, lock_wait, requests in results:
+        print(
+            f"  {name:<28}{wall * 1000:>10.2f}{peak / 1024:>12.1f}"
+            f"{lock_wait * 1000:>10.2f}{requests:>10.1f}"
+        )
+
+
+async def main():
+    """Run benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="stand-in latency in seconds"
+    )
+    args = parser.parse_args()
+
+    if not PLATFORMS:
+        print("Home Assistant not installed, platform cycles are skipped")
+    for size in args.sizes:
+        bench = Bench(size, args.cycles, args.latency)
+        await bench.run()
+        report(size, bench.results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
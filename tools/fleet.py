@@ -0,0 +1,107 @@
+"""Synthetic connectedcars.io fleets for benchmarks and the stand-in server.
+
+Vehicles are cloned from the recorded fixtures, with their own ids, positions,
+lamp states and leads. Trip history is shared between clones to keep large
+fleets cheap to generate.
+"""
+
+from datetime import UTC, datetime, timedelta
+import json
+from pathlib import Path
+import random
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+LAMP_TYPES = [
+    "abs",
+    "adblue",
+    "airbag",
+    "battery",
+    "brake_pad",
+    "coolant",
+    "engine",
+    "engine_oil",
+    "esp",
+    "glow_plug",
+    "hv_battery",
+    "oil_level",
+    "particulate_filter",
+    "service",
+    "tire_pressure",
+    "washer_fluid",
+]
+
+
+def _format_time(value):
+    return value.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def load_templates():
+    """Load vehicles of the single car fixtures as templates."""
+    templates = []
+    for name in ("ice", "ev"):
+        with open(FIXTURES / f"{name}.json", encoding="utf-8") as file:
+            templates.extend(json.load(file)["vehicles"])
+    return templates
+
+
+def make_vehicle(template, index, rng, recorded):
+    """Clone a template vehicle with its own identity and state."""
+    vehicle = dict(template)
+    vehicle["id"] = str(100000 + index)
+    vehicle["vin"] = f"WVWZZZ{index:011d}"
+    vehicle["licensePlate"] = f"XX{index:05d}"[:7]
+
+    driving = rng.random() < 0.1
+    vehicle["ignition"] = {"on": driving, "time": _format_time(recorded)}
+    vehicle["position"] = {
+        "latitude": round(55.0 + rng.uniform(0, 2.5), 5),
+        "longitude": round(8.5 + rng.uniform(0, 4.0), 5),
+        "speed": rng.randint(20, 110) if driving else 0,
+        "direction": rng.randint(0, 359),
+        "time": _format_time(recorded),
+    }
+
+    lamp_types = rng.sample(LAMP_TYPES, rng.randint(8, len(LAMP_TYPES)))
+    enabled = set(rng.sample(lamp_types, rng.choice((0, 0, 0, 1, 2))))
+    vehicle["lampStates"] = [
+        {
+            "type": lamp,
+            "time": _format_time(recorded - timedelta(days=rng.randint(1, 400))),
+            "enabled": lamp in enabled,
+        }
+        for lamp in lamp_types
+    ]
+
+    # Leads are cloned whole, their context depends on the type
+    template_leads = template.get("leads") or []
+    leads = []
+    for _ in range(rng.choice((0, 0, 1, 2, 4)) if template_leads else 0):
+        lead = dict(rng.choice(template_leads))
+        created = recorded - timedelta(days=rng.randint(1, 90))
+        lead.update(
+            {
+                "createdTime": _format_time(created),
+                "updatedTime": _format_time(created + timedelta(days=1)),
+            }
+        )
+        leads.append(lead)
+    vehicle["leads"] = leads
+    vehicle["health"] = {"ok": not leads}
+    return vehicle
+
+
+def make_fleet(count, seed=0):
+    """Create a fixture with count vehicles."""
+    rng = random.Random(seed)
+    recorded = datetime.now(UTC).replace(microsecond=0)
+    templates = load_templates()
+    vehicles = [
+        make_vehicle(templates[index % len(templates)], index, rng, recorded)
+        for index in range(count)
+    ]
+    return {
+        "description": f"Synthetic fleet of {count} vehicles",
+        "recorded": _format_time(recorded),
+        "vehicles": vehicles,
+    }
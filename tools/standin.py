@@ -0,0 +1,621 @@
+"""Local stand-in for the connectedcars.io auth and GraphQL APIs.
+
+Serves recorded fixtures (see tools/fixtures) on the two endpoints used by MinVW:
+
+    POST /auth/login/email/password
+    POST /graphql
+
+Queries are answered from the fixture by a small GraphQL subset interpreter,
+supporting the viewer query, aliased vehicle(id:) queries and the arguments used
+by MinVW (trips, totalTripStatistics, refuelEvents, limits).
+
+Faults can be injected from the command line or at runtime:
+
+    POST /_standin/faults   {"latency": 0.3, "status": 429, "status_rate": 0.2,
+                             "malformed_rate": 0.1, "token_ttl": 60}
+    POST /_standin/expire-tokens
+    GET  /_standin/stats
+
+Record mode proxies to the real APIs and captures vehicle data into a fixture,
+redacting credentials, tokens, VIN, license plate and precise positions.
+
+Usage:
+    python tools/standin.py --fixture tools/fixtures/multi.json --port 8080
+    python tools/standin.py --record tools/fixtures/mine.json
+
+Point MinVW at it with base_url_auth/base_url_graph = "http://127.0.0.1:8080/".
+"""
+
+import argparse
+import asyncio
+import copy
+from datetime import UTC, datetime, timedelta
+import hashlib
+import json
+import logging
+import random
+import re
+import secrets
+
+from aiohttp import ClientSession, web
+
+_LOGGER = logging.getLogger("standin")
+
+UPSTREAM_AUTH = "https://auth-api.connectedcars.io/"
+UPSTREAM_GRAPH = "https://api.connectedcars.io/"
+
+ISO_TIME = re.compile(r"^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(\.\d+)?(Z|[+-]\d\d:\d\d)$")
+
+
+# GraphQL subset
+
+
+class Field:
+    """Field of a GraphQL selection set."""
+
+    def __init__(self, name, alias=None, args=None, selection=None) -> None:
+        """Initialize."""
+        self.name = name
+        self.key = alias or name
+        self.args = args or {}
+        self.selection = selection
+
+
+_TOKEN = re.compile(
+    r'\s*(?:(?P<spread>\.\.\.)|(?P<string>"(?:[^"\\]|\\.)*")'
+    r"|(?P<number>-?\d+(?:\.\d+)?)|(?P<name>[_A-Za-z][_0-9A-Za-z]*)"
+    r"|(?P<punct>[{}()\[\]:!$=@])|(?P<comma>,))"
+)
+
+
+class _Parser:
+    """Parser for the subset of GraphQL documents sent by MinVW."""
+
+    def __init__(self, text) -> None:
+        self.tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = _TOKEN.match(text, pos)
+            if match is None:
+                raise ValueError(f"Unexpected character at {pos}: {text[pos:pos + 20]}")
+            pos = match.end()
+            if match.lastgroup != "comma":
+                self.tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        token = self.peek()
+        if value is not None and token[1] != value:
+            raise ValueError(f"Expected {value}, got {token[1]}")
+        self.pos += 1
+        return token
+
+    def document(self):
+        # Operation type and name are optional
+        if self.peek()[1] in ("query", "mutation"):
+            self.take()
+            if self.peek()[0] == "name":
+                self.take()
+        return self.selection_set()
+
+    def selection_set(self):
+        fields = []
+        self.take("{")
+        if self.peek()[1] == "}":
+            # Empty selection sets are invalid GraphQL, rejected by the real API
+            raise ValueError('Syntax Error: Expected Name, found "}".')
+        while self.peek()[1] != "}":
+            if self.peek()[0] == "spread":
+                # Inline fragment, fields are merged into the parent selection
+                self.take()
+                self.take("on")
+                self.take()
+                fields.extend(self.selection_set())
+                continue
+            name = self.take()[1]
+            alias = None
+            if self.peek()[1] == ":":
+                self.take()
+                alias, name = name, self.take()[1]
+            args = self.arguments() if self.peek()[1] == "(" else {}
+            selection = self.selection_set() if self.peek()[1] == "{" else None
+            fields.append(Field(name, alias, args, selection))
+        self.take("}")
+        return fields
+
+    def arguments(self):
+        args = {}
+        self.take("(")
+        while self.peek()[1] != ")":
+            name = self.take()[1]
+            self.take(":")
+            args[name] = self.value()
+        self.take(")")
+        return args
+
+    def value(self):
+        kind, value = self.take()
+        if kind == "string":
+            return json.loads(value)
+        if kind == "number":
+            return float(value) if "." in value else int(value)
+        if value == "[":
+            items = []
+            while self.peek()[1] != "]":
+                items.append(self.value())
+            self.take("]")
+            return items
+        if value == "{":
+            obj = {}
+            while self.peek()[1] != "}":
+                key = self.take()[1]
+                self.take(":")
+                obj[key] = self.value()
+            self.take("}")
+            return obj
+        if value in ("true", "false"):
+            return value == "true"
+        if value == "null":
+            return None
+        return value  # Enum value
+
+
+def parse_query(text):
+    """Parse a GraphQL document into its top level fields."""
+    return _Parser(text).document()
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _format_time(value):
+    return value.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _limit(items, args):
+    if "limit" in args:
+        return items[: args["limit"]]
+    return items
+
+
+def _trips(vehicle, args):
+    """Trips from a time, first or last n."""
+    items = sorted(
+        (vehicle.get("trips") or {}).get("items") or [], key=lambda t: t["startTime"]
+    )
+    if "fromTime" in args:
+        from_time = _parse_time(args["fromTime"])
+        items = [t for t in items if _parse_time(t["startTime"]) >= from_time]
+    if "first" in args:
+        items = items[: args["first"]]
+    if "last" in args:
+        items = items[-args["last"] :]
+    return {"items": items}
+
+
+def _trip_statistics(vehicle, args):
+    """Trip statistics of a period, computed from the trips of the fixture."""
+    period = args.get("period") or {}
+    first = _parse_time(period["first"]) if "first" in period else None
+    last = _parse_time(period["last"]) if "last" in period else None
+    trips = [
+        t
+        for t in (vehicle.get("trips") or {}).get("items") or []
+        if (first is None or _parse_time(t["startTime"]) >= first)
+        and (last is None or _parse_time(t["startTime"]) < last)
+    ]
+    return {
+        "mileageInKm": sum(t["mileage"] for t in trips),
+        "driveDurationInMinutes": sum(t.get("duration", 0) for t in trips) / 60,
+        "numberTrips": len(trips),
+        "longestMileageInKm": max((t["mileage"] for t in trips), default=0),
+    }
+
+
+def _ordered(key):
+    def resolve(vehicle, args):
+        items = sorted(
+            vehicle.get(key) or [],
+            key=lambda item: item["time"],
+            reverse=args.get("order", "DESC") == "DESC",
+        )
+        return _limit(items, args)
+
+    return resolve
+
+
+# Fields with arguments, computed from the fixture
+RESOLVERS = {
+    "trips": _trips,
+    "totalTripStatistics": _trip_statistics,
+    "refuelEvents": _ordered("refuelEvents"),
+    "serverCalcGpsOdometers": _ordered("serverCalcGpsOdometers"),
+    "outdoorTemperatures": lambda vehicle, args: _limit(
+        vehicle.get("outdoorTemperatures") or [], args
+    ),
+}
+
+
+def _select(value, selection):
+    if selection is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [_select(item, selection) for item in value]
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for field in selection:
+        if field.name in value:
+            result[field.key] = _select(value[field.name], field.selection)
+    return result
+
+
+def resolve_vehicle(vehicle, selection):
+    """Resolve a selection on a fixture vehicle."""
+    result = {}
+    for field in selection:
+        if field.name in RESOLVERS:
+            value = RESOLVERS[field.name](vehicle, field.args)
+        else:
+            value = vehicle.get(field.name)
+        result[field.key] = _select(value, field.selection)
+    return result
+
+
+class Fixture:
+    """Vehicle data served by the stand-in."""
+
+    def __init__(self, data, shift_time=True) -> None:
+        """Initialize, optionally shifting recorded times to end now."""
+        self.description = data.get("description", "")
+        vehicles = copy.deepcopy(data["vehicles"])
+        if shift_time and "recorded" in data:
+            offset = datetime.now(UTC) - _parse_time(data["recorded"])
+            vehicles = _shift_times(vehicles, offset)
+        self.vehicles = {str(vehicle["id"]): vehicle for vehicle in vehicles}
+
+    def execute(self, query):
+        """Execute a query, returning the GraphQL response."""
+        result = {}
+        for field in parse_query(query):
+            if field.name == "viewer":
+                result[field.key] = self._viewer(field.selection)
+            elif field.name == "vehicle":
+                vehicle = self.vehicles.get(str(field.args.get("id")))
+                result[field.key] = (
+                    None if vehicle is None else resolve_vehicle(vehicle, field.selection)
+                )
+            else:
+                return {"errors": [{"message": f"Unknown field {field.name}"}]}
+        return {"data": result}
+
+    def _viewer(self, selection):
+        result = {}
+        for field in selection:
+            if field.name == "vehicles":
+                vehicle_field = next(
+                    (f for f in field.selection if f.name == "vehicle"), None
+                )
+                result[field.key] = [
+                    {}
+                    if vehicle_field is None
+                    else {
+                        vehicle_field.key: resolve_vehicle(
+                            vehicle, vehicle_field.selection
+                        )
+                    }
+                    for vehicle in self.vehicles.values()
+                ]
+        return result
+
+
+def _shift_times(value, offset):
+    if isinstance(value, dict):
+        return {key: _shift_times(item, offset) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_shift_times(item, offset) for item in value]
+    if isinstance(value, str) and ISO_TIME.match(value):
+        return _format_time(_parse_time(value) + offset)
+    return value
+
+
+# Recording
+
+
+# Fields served computed from other fields, e.g. trip statistics from trips
+COMPUTED_FIELDS = ("totalTripStatistics",)
+
+
+class Recorder:
+    """Capture vehicle data from upstream responses into a redacted fixture."""
+
+    def __init__(self, path) -> None:
+        """Initialize."""
+        self.path = path
+        self.vehicles = {}
+
+    def capture(self, response, query=None):
+        """Merge vehicles found in a GraphQL response to a query.
+
+        Vehicles read by id, also aliased (v0: vehicle(id: ...)), are merged by
+        that id even when it is not selected. Aliased fields are recorded by
+        their name, trips are added to those recorded before.
+        """
+        data = (response or {}).get("data") or {}
+        fields = {}
+        if query is not None:
+            try:
+                fields = {field.key: field for field in parse_query(query)}
+            except ValueError as err:
+                _LOGGER.warning("Unable to parse recorded query: %s", err)
+        for key, value in data.items():
+            field = fields.get(key)
+            if key == "viewer" or (isinstance(value, dict) and "vehicles" in value):
+                for item in (value or {}).get("vehicles") or []:
+                    self._merge((item or {}).get("vehicle"))
+            elif isinstance(value, dict) and field is not None and field.name == "vehicle":
+                self._merge(
+                    {"id": str(field.args.get("id")), **_unalias(value, field.selection)}
+                )
+            elif isinstance(value, dict):
+                self._merge(value)
+        self.save()
+
+    def _merge(self, vehicle):
+        if not vehicle or "id" not in vehicle:
+            return
+        redacted = redact(vehicle)
+        recorded = self.vehicles.setdefault(redacted["id"], {})
+        trips = redacted.pop("trips", None)
+        recorded.update(redacted)
+        if trips and trips.get("items"):
+            # Pages of trips, keyed by start time
+            items = {
+                trip["startTime"]: trip
+                for trip in (recorded.get("trips") or {}).get("items", [])
+                + trips["items"]
+            }
+            recorded["trips"] = {"items": [items[key] for key in sorted(items)]}
+
+    def save(self):
+        """Write the fixture."""
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "description": "Recorded with tools/standin.py, redacted",
+                    "recorded": _format_time(datetime.now(UTC)),
+                    "vehicles": list(self.vehicles.values()),
+                },
+                file,
+                indent=1,
+            )
+            file.write("\n")
+
+
+def _unalias(value, selection):
+    """Key values of a selection by field name, dropping computed fields."""
+    return {
+        field.name: value[field.key]
+        for field in selection
+        if field.key in value and field.name not in COMPUTED_FIELDS
+    }
+
+
+def _pseudonym(value, length, alphabet="0123456789"):
+    digest = hashlib.sha256(str(value).encode()).digest()
+    return "".join(alphabet[b % len(alphabet)] for b in digest[:length])
+
+
+def redact(value, key=None):
+    """Redact personal data, keeping values stable between recordings."""
+    if isinstance(value, dict):
+        return {k: redact(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(item, key) for item in value]
+    if value is None:
+        return None
+    if key == "id":
+        return _pseudonym(value, 6)
+    if key == "vin":
+        return f"WVWZZZ{_pseudonym(value, 11, '0123456789ABCDEFGHJKLMNPRSTUVWXYZ')}"
+    if key == "licensePlate":
+        return f"XX{_pseudonym(value, 5)}"
+    if key is not None and ("atitude" in key or "ongitude" in key):
+        # Roughly 1 km precision
+        return round(float(value), 2)
+    if key in ("email", "name") and isinstance(value, str) and "@" in value:
+        return "redacted@example.com"
+    return value
+
+
+# Server
+
+
+class StandIn:
+    """The stand-in server."""
+
+    def __init__(
+        self, fixture=None, recorder=None, faults=None, email=None, password=None
+    ) -> None:
+        """Initialize."""
+        self.fixture = fixture
+        self.recorder = recorder
+        self.faults = {
+            "latency": 0.0,
+            "jitter": 0.0,
+            "status": None,
+            "status_rate": 0.0,
+            "malformed_rate": 0.0,
+            "token_ttl": 3600,
+            **(faults or {}),
+        }
+        self.email = email
+        self.password = password
+        self.tokens = {}
+        self.stats = {"auth": 0, "graphql": 0, "faults": 0, "unauthorized": 0}
+        self._session = None
+
+    def app(self):
+        """Create the aiohttp application."""
+        app = web.Application()
+        app.router.add_post("/auth/login/email/password", self.handle_auth)
+        app.router.add_post("/graphql", self.handle_graphql)
+        app.router.add_post("/_standin/faults", self.handle_faults)
+        app.router.add_post("/_standin/expire-tokens", self.handle_expire_tokens)
+        app.router.add_get("/_standin/stats", self.handle_stats)
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+    async def _cleanup(self, app):
+        if self._session is not None:
+            await self._session.close()
+
+    async def _inject_faults(self):
+        """Delay, and maybe replace the response by an error."""
+        delay = self.faults["latency"] + random.uniform(0, self.faults["jitter"])
+        if delay > 0:
+            await asyncio.sleep(delay)
+        status = self.faults["status"]
+        if status and random.random() < self.faults["status_rate"]:
+            self.stats["faults"] += 1
+            headers = {"Retry-After": "30"} if status == 429 else None
+            return web.json_response(
+                {"error": "Injected", "message": f"Injected HTTP {status}"},
+                status=status,
+                headers=headers,
+            )
+        if random.random() < self.faults["malformed_rate"]:
+            self.stats["faults"] += 1
+            return web.Response(
+                text='{"data": {"viewer": ', content_type="application/json"
+            )
+        return None
+
+    async def handle_auth(self, request):
+        """Log in with email and password."""
+        self.stats["auth"] += 1
+        if (fault := await self._inject_faults()) is not None:
+            return fault
+        body = await request.json()
+        if self.recorder is not None:
+            return await self._proxy(request, UPSTREAM_AUTH, body, capture=False)
+        if self.email is not None and body.get("email") != self.email:
+            return web.json_response(
+                {"error": "Bad request", "message": "Email is incorrect"}, status=400
+            )
+        if self.password is not None and body.get("password") != self.password:
+            return web.json_response(
+                {"error": "Bad request", "message": "Incorrect password"}, status=400
+            )
+        token = secrets.token_hex(24)
+        ttl = int(self.faults["token_ttl"])
+        self.tokens[token] = datetime.now(UTC) + timedelta(seconds=ttl)
+        return web.json_response({"token": token, "expires": ttl})
+
+    async def handle_graphql(self, request):
+        """Answer a GraphQL query."""
+        self.stats["graphql"] += 1
+        if (fault := await self._inject_faults()) is not None:
+            return fault
+        body = await request.json()
+        if self.recorder is not None:
+            return await self._proxy(request, UPSTREAM_GRAPH, body, capture=True)
+
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        expires = self.tokens.get(token)
+        if expires is None or datetime.now(UTC) > expires:
+            self.stats["unauthorized"] += 1
+            return web.json_response({"error": "Unauthorized"}, status=401)
+        try:
+            return web.json_response(self.fixture.execute(body["query"]))
+        except (KeyError, ValueError) as err:
+            return web.json_response({"errors": [{"message": str(err)}]}, status=400)
+
+    async def _proxy(self, request, upstream, body, capture):
+        if self._session is None:
+            self._session = ClientSession()
+        headers = {
+            key: value
+            for key, value in request.headers.items()
+            if key.lower()
+            in ("content-type", "accept", "authorization", "x-organization-namespace")
+        }
+        async with self._session.post(
+            upstream + request.path.lstrip("/"), json=body, headers=headers
+        ) as response:
+            text = await response.text()
+        if capture and response.ok:
+            try:
+                self.recorder.capture(json.loads(text), body.get("query"))
+            except ValueError:
+                _LOGGER.warning("Unable to record non-JSON response")
+        return web.Response(
+            text=text, status=response.status, content_type="application/json"
+        )
+
+    async def handle_faults(self, request):
+        """Change injected faults at runtime."""
+        self.faults.update(await request.json())
+        return web.json_response(self.faults)
+
+    async def handle_expire_tokens(self, request):
+        """Expire all issued tokens, next queries are rejected with 401."""
+        self.tokens.clear()
+        return web.json_response({"expired": True})
+
+    async def handle_stats(self, request):
+        """Number of requests served."""
+        return web.json_response(self.stats)
+
+
+def main():
+    """Run the stand-in server."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fixture", help="fixture file to serve")
+    source.add_argument("--record", help="proxy upstream and record into this file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--no-shift", action="store_true", help="serve times as recorded")
+    parser.add_argument("--email", help="only accept this email")
+    parser.add_argument("--password", help="only accept this password")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--status", type=int, help="inject HTTP status, e.g. 401, 429, 500")
+    parser.add_argument("--status-rate", type=float, default=1.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--token-ttl", type=int, default=3600, help="seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fixture = None
+    recorder = None
+    if args.fixture:
+        with open(args.fixture, encoding="utf-8") as file:
+            fixture = Fixture(json.load(file), shift_time=not args.no_shift)
+    else:
+        recorder = Recorder(args.record)
+    standin = StandIn(
+        fixture,
+        recorder,
+        faults={
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "status": args.status,
+            "status_rate": args.status_rate if args.status else 0.0,
+            "malformed_rate": args.malformed_rate,
+            "token_ttl": args.token_ttl,
+        },
+        email=args.email,
+        password=args.password,
+    )
+    web.run_app(standin.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()